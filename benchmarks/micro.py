@@ -0,0 +1,247 @@
+"""
+micro-benchmarks of the parsing hot paths with fixed synthetic fixtures
+
+run `python -m benchmarks.micro --save results.json` to record the ops/sec and peak memory of a release and
+`python -m benchmarks.micro --baseline results.json` to fail if a change regressed beyond the thresholds
+"""
+
+import gc
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from dataclasses import asdict, dataclass
+from json import dump, load
+from platform import python_version
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
+
+from delphi_epidata._covidcast import CovidcastDataSources
+from delphi_epidata._model import EpiRange, format_list
+from delphi_epidata._parse import parse_api_date, parse_api_dates, parse_api_week
+from delphi_epidata._weeks import date_range, epiweek_range
+from delphi_epidata.request import Epidata
+
+DEFAULT_ROWS = 1_000_000
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.2
+# growth of the peak memory below this many bytes is never considered a regression
+MEMORY_SLACK = 2**20
+
+
+@dataclass(frozen=True)
+class MicroBenchmark:
+    """
+    a function processing `units` items per run, e.g. rows or values
+    """
+
+    name: str
+    run: Callable[[], Any]
+    units: int
+
+
+@dataclass(frozen=True)
+class MicroResult:
+    """
+    best time of a benchmark along with its throughput and peak traced memory
+    """
+
+    name: str
+    units: int
+    seconds: float
+    ops_per_sec: float
+    peak_memory: int
+
+
+def covidcast_rows(rows: int) -> List[Dict[str, Any]]:
+    """
+    deterministic covidcast rows covering a year of 3200 counties
+    """
+    days = [int(d) for d in date_range(20200101, 20201231)]
+    geos = [f"{i:05d}" for i in range(1000, 4200)]
+    return [
+        {
+            "source": "src",
+            "signal": "sig",
+            "geo_type": "county",
+            "geo_value": geos[i % len(geos)],
+            "time_type": "day",
+            "time_value": days[i % len(days)],
+            "issue": days[i % len(days)],
+            "lag": i % 7,
+            "value": i * 0.25,
+            "stderr": None if i % 3 else i * 0.01,
+            "sample_size": i % 500,
+            "direction": None,
+            "missing_value": 0,
+            "missing_stderr": 5 if i % 3 else 0,
+            "missing_sample_size": 5 if i % 3 else 0,
+        }
+        for i in range(rows)
+    ]
+
+
+def covidcast_meta(sources: int = 30, signals: int = 40) -> List[Dict[str, Any]]:
+    """
+    covidcast/meta document about the size of the real one
+    """
+    geo_types = ("county", "hrr", "msa", "state", "hhs", "nation")
+    return [
+        {
+            "source": f"source{s}",
+            "db_source": f"source{s}",
+            "name": f"Source {s}",
+            "description": "description " * 20,
+            "reference_signal": "signal0",
+            "license": "CC BY",
+            "link": [{"alt": "docs", "href": f"https://example.com/{s}"}] * 2,
+            "signals": [
+                {
+                    "source": f"source{s}",
+                    "signal": f"signal{i}",
+                    "signal_basename": f"signal{i // 2}",
+                    "name": f"Signal {i}",
+                    "active": i % 5 != 0,
+                    "short_description": "short description",
+                    "description": "description " * 30,
+                    "time_label": "Date",
+                    "value_label": "Value",
+                    "format": "percent",
+                    "category": "public",
+                    "high_values_are": "bad",
+                    "is_smoothed": i % 2 == 0,
+                    "is_weighted": i % 4 == 0,
+                    "link": [{"alt": "docs", "href": f"https://example.com/{s}/{i}"}],
+                    "geo_types": {g: {"min": 0, "max": 100, "mean": 10.5, "stdev": 2.5} for g in geo_types},
+                }
+                for i in range(signals)
+            ],
+        }
+        for s in range(sources)
+    ]
+
+
+def create_benchmarks(rows: int) -> List[MicroBenchmark]:
+    """
+    the benchmarks with fixtures of the given number of rows
+    """
+    call = Epidata.covidcast("src", "sig", "day", "county", EpiRange(20200101, 20201231), "*")
+    data = covidcast_rows(rows)
+    dates = [r["time_value"] for r in data]
+    weeks = [int(w) for w in epiweek_range(201001, 202052)]
+    weeks = [weeks[i % len(weeks)] for i in range(rows)]
+    values = [v for i in range(rows // 10) for v in (i, f"{i}", EpiRange(i, i + 10))][: rows // 10]
+    meta = covidcast_meta()
+
+    def parse_dates() -> None:
+        parse_api_date.cache_clear()
+        for value in dates:
+            parse_api_date(value)
+
+    def parse_weeks() -> None:
+        parse_api_week.cache_clear()
+        for value in weeks:
+            parse_api_week(value)
+
+    return [
+        # pylint: disable=protected-access
+        MicroBenchmark("parse_row", lambda: [call._parse_row(row) for row in data], rows),
+        MicroBenchmark("as_df", lambda: call._as_df(data), rows),
+        MicroBenchmark("format_list", lambda: format_list(values), len(values)),
+        MicroBenchmark("parse_api_date", parse_dates, rows),
+        MicroBenchmark("parse_api_week", parse_weeks, rows),
+        MicroBenchmark("parse_api_dates", lambda: parse_api_dates(dates), rows),
+        MicroBenchmark("covidcast_sources_create", lambda: CovidcastDataSources.create(meta, dict), 1),
+    ]
+
+
+def measure(benchmark: MicroBenchmark, repeat: int = DEFAULT_REPEAT) -> MicroResult:
+    """
+    best time of `repeat` runs and the peak memory allocated by a separate traced run
+    """
+    times: List[float] = []
+    for _ in range(repeat):
+        gc.collect()
+        start = perf_counter()
+        benchmark.run()
+        times.append(perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        benchmark.run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    seconds = min(times)
+    return MicroResult(benchmark.name, benchmark.units, seconds, benchmark.units / seconds, peak)
+
+
+def regressions(
+    results: Sequence[MicroResult],
+    baseline: Mapping[str, Mapping[str, Any]],
+    threshold: float = DEFAULT_THRESHOLD,
+    memory_threshold: float = DEFAULT_THRESHOLD,
+) -> List[str]:
+    """
+    descriptions of the results whose throughput dropped or whose peak memory grew beyond the thresholds
+    """
+    found: List[str] = []
+    for result in results:
+        base = baseline.get(result.name)
+        if base is None:
+            continue
+        if result.ops_per_sec < base["ops_per_sec"] * (1 - threshold):
+            found.append(f"{result.name}: {result.ops_per_sec:,.0f} ops/sec, baseline {base['ops_per_sec']:,.0f}")
+        if result.peak_memory > base["peak_memory"] * (1 + memory_threshold) + MEMORY_SLACK:
+            found.append(
+                f"{result.name}: {result.peak_memory / 2**20:,.1f} MB peak memory, "
+                + f"baseline {base['peak_memory'] / 2**20:,.1f} MB"
+            )
+    return found
+
+
+def _report(results: Sequence[MicroResult], baseline: Mapping[str, Mapping[str, Any]]) -> str:
+    lines = [f"{'benchmark':<26} {'ops/sec':>14} {'best (s)':>10} {'peak (MB)':>10} {'vs baseline':>12}"]
+    for r in results:
+        base = baseline.get(r.name)
+        change = f"{r.ops_per_sec / base['ops_per_sec'] - 1:+.1%}" if base else ""
+        lines.append(
+            f"{r.name:<26} {r.ops_per_sec:>14,.0f} {r.seconds:>10.4f} {r.peak_memory / 2**20:>10.1f} {change:>12}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="number of rows of the fixtures")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="number of timed runs per benchmark")
+    parser.add_argument("--only", nargs="*", help="names of the benchmarks to run")
+    parser.add_argument("--save", help="file to write the results to as JSON")
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="tolerated throughput drop")
+    parser.add_argument("--memory-threshold", type=float, default=DEFAULT_THRESHOLD, help="tolerated memory growth")
+    args = parser.parse_args(argv)
+
+    baseline: Dict[str, Dict[str, Any]] = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            saved = load(f)
+        if saved["settings"]["rows"] != args.rows:
+            # the throughput of e.g. the memoized parsers depends on the size of the fixtures
+            print(f"baseline was recorded with --rows {saved['settings']['rows']}", file=sys.stderr)
+            return 2
+        baseline = {r["name"]: r for r in saved["results"]}
+    benchmarks = [b for b in create_benchmarks(args.rows) if not args.only or b.name in args.only]
+    results = [measure(b, args.repeat) for b in benchmarks]
+    print(_report(results, baseline))
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            settings = {"rows": args.rows, "repeat": args.repeat, "python": python_version()}
+            dump({"settings": settings, "results": [asdict(r) for r in results]}, f, indent=2)
+    found = regressions(results, baseline, args.threshold, args.memory_threshold)
+    for regression in found:
+        print(f"regression: {regression}", file=sys.stderr)
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
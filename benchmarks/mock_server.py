@@ -0,0 +1,189 @@
+import csv
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from json import dumps
+from random import Random
+from threading import Lock, Thread
+from time import sleep
+from typing import Any, Callable, Dict, Final, List, Optional, Sequence, Tuple, Type
+from urllib.parse import parse_qs, urlparse
+
+from epiweeks import Week
+
+from delphi_epidata._model import EpidataFieldInfo, EpidataFieldType
+from delphi_epidata.request import EpiDataCall, Epidata, EpiRange
+
+# example calls, whose field infos define the rows served for each endpoint
+ENDPOINT_CALLS: Final[Dict[str, Callable[[], EpiDataCall]]] = {
+    "covidcast": lambda: Epidata.covidcast("src", "sig", "day", "county", EpiRange(20200101, 20200102), "*"),
+    "fluview": lambda: Epidata.fluview("nat", EpiRange(202001, 202010)),
+    "covid_hosp_state_timeseries": lambda: Epidata.covid_hosp_state_timeseries("ca", EpiRange(20200101, 20200102)),
+    "covid_hosp_facility": lambda: Epidata.covid_hosp_facility("1", "202001-202002"),
+}
+
+_FIRST_DAY: Final = date(2020, 1, 1)
+
+
+def _value(info: EpidataFieldInfo, i: int) -> Any:  # pylint: disable=too-many-return-statements
+    if info.type == EpidataFieldType.int:
+        return i
+    if info.type == EpidataFieldType.float:
+        return None if i % 11 == 0 else i * 0.25
+    if info.type == EpidataFieldType.bool:
+        return i % 2
+    if info.type in (EpidataFieldType.date, EpidataFieldType.date_or_epiweek):
+        return int((_FIRST_DAY + timedelta(days=i % 1000)).strftime("%Y%m%d"))
+    if info.type == EpidataFieldType.epiweek:
+        return int((Week(2020, 1) + i % 200).cdcformat())
+    if info.type == EpidataFieldType.categorical and info.categories:
+        return info.categories[i % len(info.categories)]
+    return f"{info.name}{i % 50:02d}"
+
+
+def synthetic_rows(meta: Sequence[EpidataFieldInfo], rows: int) -> List[Dict[str, Any]]:
+    """
+    deterministic rows with a value for each of the given fields
+    """
+    return [{info.name: _value(info, i) for info in meta} for i in range(rows)]
+
+
+def render(rows: List[Dict[str, Any]], format_type: Optional[str]) -> Tuple[bytes, str]:
+    """
+    body and content type of a response with the given rows in the given format
+    """
+    if format_type == "json":
+        return dumps(rows).encode("utf-8"), "application/json"
+    if format_type == "jsonl":
+        return "\n".join(dumps(row) for row in rows).encode("utf-8"), "text/plain"
+    if format_type == "csv":
+        out = StringIO()
+        writer = csv.writer(out, lineterminator="\n")
+        if rows:
+            writer.writerow(rows[0].keys())
+        writer.writerows(["" if v is None else v for v in row.values()] for row in rows)
+        return out.getvalue().encode("utf-8"), "text/csv"
+    classic = {"result": 1 if rows else -2, "message": "success" if rows else "no results", "epidata": rows}
+    return dumps(classic).encode("utf-8"), "application/json"
+
+
+class MockEpidataServer:
+    """
+    local stand-in for the Epidata API serving synthetic rows, such that the client can be benchmarked offline
+
+    every request to one of the `ENDPOINT_CALLS` endpoints returns `rows` rows in the requested format
+    (classic, json, jsonl, or csv) after waiting `latency` seconds. A random `error_rate` fraction of the
+    requests fails with `error_status` instead. Bodies are rendered once per endpoint and format, such that
+    the server hardly affects the measured throughput of the client.
+    """
+
+    rows: Final[int]
+    latency: Final[float]
+    error_rate: Final[float]
+    error_status: Final[int]
+    requests: int
+    errors: int
+
+    def __init__(
+        self,
+        rows: int = 1000,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: int = 0,
+    ) -> None:
+        self.rows = rows
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self.errors = 0
+        self._random = Random(seed)
+        self._lock = Lock()
+        self._bodies: Dict[Tuple[str, Optional[str]], Tuple[bytes, str]] = {}
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """
+        base url to use instead of the Epidata API
+        """
+        host, port = self._server.server_address[:2]
+        return f"http://{host!s}:{port}/"
+
+    def start(self) -> "MockEpidataServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockEpidataServer":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def body(self, endpoint: str, format_type: Optional[str]) -> Tuple[bytes, str]:
+        """
+        cached response body and content type of the given endpoint and format
+        """
+        key = (endpoint, format_type)
+        with self._lock:
+            if key not in self._bodies:
+                rows = synthetic_rows(ENDPOINT_CALLS[endpoint]().meta, self.rows)
+                self._bodies[key] = render(rows, format_type)
+            return self._bodies[key]
+
+    def _fails(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            return failed
+
+    def _handler(self) -> Type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """
+            serves the cached bodies of the mock server
+            """
+
+            protocol_version = "HTTP/1.1"
+
+            def _respond(self, status: int, body: bytes, content_type: str = "text/plain") -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _serve(self, query: str) -> None:
+                if server.latency:
+                    sleep(server.latency)
+                endpoint = urlparse(self.path).path.strip("/")
+                if endpoint not in ENDPOINT_CALLS:
+                    self._respond(404, b"unknown endpoint")
+                    return
+                if server._fails():  # pylint: disable=protected-access
+                    self._respond(server.error_status, b"injected error")
+                    return
+                format_type = parse_qs(query).get("format", [None])[0]
+                self._respond(200, *server.body(endpoint, format_type))
+
+            def do_GET(self) -> None:  # pylint: disable=invalid-name
+                self._serve(urlparse(self.path).query)
+
+            def do_POST(self) -> None:  # pylint: disable=invalid-name
+                length = int(self.headers.get("Content-Length") or 0)
+                self._serve(self.rfile.read(length).decode("utf-8"))
+
+            def log_message(self, *args: Any) -> None:  # pylint: disable=arguments-differ
+                pass
+
+        return Handler
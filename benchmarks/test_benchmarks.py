@@ -0,0 +1,103 @@
+# pylint: disable=redefined-outer-name
+from typing import Iterator, List
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from delphi_epidata.async_request import EpiDataAsyncCall, EpiDataAsyncContext
+from delphi_epidata.request import NO_RETRY, EpiDataCall, EpiDataContext, EpiRange
+
+from .mock_server import MockEpidataServer
+
+ROWS = 20_000
+BATCH_CALLS = 20
+
+
+@pytest.fixture(scope="module")
+def server() -> Iterator[MockEpidataServer]:
+    with MockEpidataServer(rows=ROWS) as s:
+        yield s
+
+
+@pytest.fixture(scope="module")
+def batch_server() -> Iterator[MockEpidataServer]:
+    with MockEpidataServer(rows=ROWS // BATCH_CALLS, latency=0.005) as s:
+        yield s
+
+
+@pytest.fixture
+def covidcast(server: MockEpidataServer) -> Iterator[EpiDataCall]:
+    with EpiDataContext(server.url, retry_policy=NO_RETRY) as ctx:
+        yield ctx.covidcast("src", "sig", "day", "county", EpiRange(20200101, 20201231), "*")
+
+
+def _async_calls(server: MockEpidataServer) -> List[EpiDataAsyncCall]:
+    ctx = EpiDataAsyncContext(server.url, retry_policy=NO_RETRY)
+    return [ctx.covidcast("src", f"sig{i}", "day", "county", 20200101, "*") for i in range(BATCH_CALLS)]
+
+
+def test_classic(benchmark: BenchmarkFixture, covidcast: EpiDataCall) -> None:
+    assert len(benchmark(covidcast.classic)["epidata"]) == ROWS
+
+
+def test_json(benchmark: BenchmarkFixture, covidcast: EpiDataCall) -> None:
+    assert len(benchmark(covidcast.json)) == ROWS
+
+
+def test_df(benchmark: BenchmarkFixture, covidcast: EpiDataCall) -> None:
+    assert len(benchmark(covidcast.df)) == ROWS
+
+
+def test_df_csv(benchmark: BenchmarkFixture, covidcast: EpiDataCall) -> None:
+    assert len(benchmark(covidcast.df, use_csv=True)) == ROWS
+
+
+def test_iter(benchmark: BenchmarkFixture, covidcast: EpiDataCall) -> None:
+    assert benchmark(lambda: sum(1 for _ in covidcast.iter())) == ROWS
+
+
+def test_iter_batches(benchmark: BenchmarkFixture, covidcast: EpiDataCall) -> None:
+    assert benchmark(lambda: sum(len(df) for df in covidcast.iter_batches())) == ROWS
+
+
+def test_csv(benchmark: BenchmarkFixture, covidcast: EpiDataCall) -> None:
+    assert benchmark(covidcast.csv).count("\n") == ROWS + 1
+
+
+@pytest.mark.parametrize("endpoint", ["fluview", "covid_hosp_state_timeseries", "covid_hosp_facility"])
+def test_endpoint_df(benchmark: BenchmarkFixture, server: MockEpidataServer, endpoint: str) -> None:
+    with EpiDataContext(server.url, retry_policy=NO_RETRY) as ctx:
+        calls = {
+            "fluview": lambda: ctx.fluview("nat", EpiRange(201001, 202052)),
+            "covid_hosp_state_timeseries": lambda: ctx.covid_hosp_state_timeseries("ca", EpiRange(20200101, 20201231)),
+            "covid_hosp_facility": lambda: ctx.covid_hosp_facility("1", "202001-202052"),
+        }
+        call = calls[endpoint]()
+        assert len(benchmark(call.df)) == ROWS
+
+
+def test_async_all_json(benchmark: BenchmarkFixture, batch_server: MockEpidataServer) -> None:
+    calls = _async_calls(batch_server)
+    results = benchmark(EpiDataAsyncContext(batch_server.url).all_json, calls)
+    assert sum(len(r) for r in results if not isinstance(r, Exception)) == ROWS
+
+
+def test_async_all_df(benchmark: BenchmarkFixture, batch_server: MockEpidataServer) -> None:
+    calls = _async_calls(batch_server)
+    results = benchmark(EpiDataAsyncContext(batch_server.url).all_df, calls)
+    assert sum(len(r) for r in results if not isinstance(r, Exception)) == ROWS
+
+
+def test_async_all_csv(benchmark: BenchmarkFixture, batch_server: MockEpidataServer) -> None:
+    calls = _async_calls(batch_server)
+    results = benchmark(EpiDataAsyncContext(batch_server.url).all_csv, calls)
+    assert all(isinstance(r, str) for r in results)
+
+
+def test_error_injection() -> None:
+    with MockEpidataServer(rows=10, error_rate=0.5) as s, EpiDataContext(s.url, retry_policy=NO_RETRY) as ctx:
+        call = ctx.fluview("nat", 202001)
+        results = ctx.all_json([call] * 40, batch_size=4)
+        failures = sum(isinstance(r, Exception) for r in results)
+        assert failures == s.errors > 0
+        assert s.requests == 40
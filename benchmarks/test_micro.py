@@ -0,0 +1,38 @@
+from json import dump, load
+from pathlib import Path
+
+from .micro import MicroResult, create_benchmarks, main, measure, regressions
+
+
+def test_measure() -> None:
+    benchmark = next(b for b in create_benchmarks(1000) if b.name == "parse_row")
+    result = measure(benchmark, repeat=2)
+    assert result.units == 1000
+    assert result.ops_per_sec > 0 and result.peak_memory > 0
+
+
+def test_baseline(tmp_path: Path) -> None:
+    results = tmp_path / "results.json"
+    assert main(["--rows", "1000", "--repeat", "1", "--save", str(results)]) == 0
+    with open(results, encoding="utf-8") as f:
+        saved = load(f)
+    assert {r["name"] for r in saved["results"]} >= {"parse_row", "as_df", "format_list", "covidcast_sources_create"}
+
+    for r in saved["results"]:
+        r["ops_per_sec"] *= 100
+    faster = tmp_path / "faster.json"
+    with open(faster, "w", encoding="utf-8") as f:
+        dump(saved, f)
+    assert main(["--rows", "1000", "--repeat", "1", "--only", "format_list", "--baseline", str(faster)]) == 1
+    assert main(["--rows", "2000", "--repeat", "1", "--only", "format_list", "--baseline", str(faster)]) == 2
+
+
+def test_regressions() -> None:
+    result = MicroResult("as_df", 1000, 0.01, 100_000, 10 * 2**20)
+    baseline = {"as_df": {"ops_per_sec": 100_000, "units": 1000, "peak_memory": 10 * 2**20}}
+    assert not regressions([result], baseline)
+    assert len(regressions([result], {"as_df": {**baseline["as_df"], "ops_per_sec": 200_000}})) == 1
+    assert len(regressions([result], {"as_df": {**baseline["as_df"], "peak_memory": 5 * 2**20}})) == 1
+    # small absolute growth is tolerated
+    small = MicroResult("as_df", 1000, 0.01, 100_000, 2**19)
+    assert not regressions([small], {"as_df": {**baseline["as_df"], "peak_memory": 2**18}})
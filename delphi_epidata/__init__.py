@@ -19,8 +19,13 @@ from ._covidcast import (
     WebLink,
     DataSignalGeoStatistics,
     CovidcastDataSources,
+    CovidcastMetaIndex,
     GeoType,
     TimeType,
 )
+from ._cache import EpiDataCache
+from ._rate_limit import RateLimiter
+from ._retry import RetryPolicy, NO_RETRY
+from ._single_flight import SingleFlight
 
 __author__ = "Delphi Group"
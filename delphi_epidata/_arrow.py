@@ -0,0 +1,101 @@
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable, List, Optional, Sequence, Union
+
+from ._model import _DATE_PARSERS, EpidataFieldInfo, EpidataFieldType
+from ._parse import fields_to_predicate
+
+if TYPE_CHECKING:
+    import pyarrow
+
+
+def _import_pyarrow() -> Any:
+    try:
+        import pyarrow  # pylint: disable=import-outside-toplevel
+        import pyarrow.csv  # pylint: disable=import-outside-toplevel,unused-import
+    except ImportError as e:
+        raise ImportError("pyarrow is required for Arrow and Parquet output: pip install delphi_epidata[arrow]") from e
+    return pyarrow
+
+
+def _field_type(info: EpidataFieldInfo, disable_date_parsing: Optional[bool] = False) -> Any:
+    pa = _import_pyarrow()
+    if info.type == EpidataFieldType.categorical:
+        return pa.dictionary(pa.int32(), pa.string())
+    if info.type == EpidataFieldType.int:
+        return pa.int64()
+    if info.type == EpidataFieldType.float:
+        return pa.float64()
+    if info.type == EpidataFieldType.bool:
+        return pa.bool_()
+    if info.type in _DATE_PARSERS:
+        return pa.int64() if disable_date_parsing else pa.date32()
+    return pa.string()
+
+
+def arrow_schema(
+    meta: Sequence[EpidataFieldInfo],
+    fields: Optional[Iterable[str]] = None,
+    disable_date_parsing: Optional[bool] = False,
+) -> "pyarrow.Schema":
+    """
+    Arrow schema of the given fields: categoricals as dictionary columns, dates and epiweeks as date32
+    """
+    pa = _import_pyarrow()
+    pred = fields_to_predicate(fields)
+    return pa.schema([pa.field(info.name, _field_type(info, disable_date_parsing)) for info in meta if pred(info.name)])
+
+
+def csv_as_arrow(
+    content: bytes,
+    meta: Sequence[EpidataFieldInfo],
+    fields: Optional[Iterable[str]] = None,
+    disable_date_parsing: Optional[bool] = False,
+) -> "pyarrow.Table":
+    """
+    reads a CSV response into an Arrow table with the schema derived from the field infos
+    """
+    pa = _import_pyarrow()
+    schema = arrow_schema(meta, fields, disable_date_parsing)
+    if not content.strip():
+        return schema.empty_table()
+    # dates and epiweeks are read as their integer representation and converted afterwards
+    read_types = {f.name: pa.int64() if pa.types.is_date(f.type) else f.type for f in schema}
+    table = pa.csv.read_csv(
+        pa.py_buffer(content),
+        convert_options=pa.csv.ConvertOptions(
+            column_types=read_types,
+            include_columns=schema.names or None,
+            include_missing_columns=True,
+            strings_can_be_null=True,
+        ),
+    )
+    if disable_date_parsing:
+        return table
+    columns: List[Any] = []
+    by_name = {info.name: info for info in meta}
+    for name in table.column_names:
+        column = table.column(name)
+        info = by_name.get(name)
+        if info is not None and info.type in _DATE_PARSERS:
+            dates = _DATE_PARSERS[info.type](column.to_numpy(zero_copy_only=False))
+            column = pa.array(dates, type=pa.date32(), from_pandas=True)
+        columns.append(column)
+    return pa.table(columns, names=table.column_names)
+
+
+def concat_arrow(tables: Sequence["pyarrow.Table"]) -> "pyarrow.Table":
+    """
+    concatenates the tables of the chunks of a call, unifying their dictionaries
+    """
+    pa = _import_pyarrow()
+    return pa.concat_tables(tables).unify_dictionaries()
+
+
+def write_parquet(table: "pyarrow.Table", path: Union[str, Path]) -> None:
+    """
+    writes the given table as a Parquet file
+    """
+    _import_pyarrow()
+    import pyarrow.parquet  # pylint: disable=import-outside-toplevel
+
+    pyarrow.parquet.write_table(table, str(path))
@@ -0,0 +1,395 @@
+import sqlite3
+import zlib
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from datetime import timedelta
+from hashlib import sha256
+from json import dumps, loads
+from pathlib import Path
+from threading import Lock
+from time import time
+from typing import Any, Dict, Final, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+from ._model import (
+    AEpiDataCall,
+    EpiInterval,
+    from_intervals,
+    merge_intervals,
+    subtract_intervals,
+    to_intervals,
+    to_ordinal,
+)
+
+DEFAULT_CACHE_DIR: Final = Path.home() / ".cache" / "delphi_epidata"
+
+
+def reports_success(body: bytes) -> bool:
+    """
+    whether a response body can be cached, i.e. it does not report an error by a `result` other than 1
+
+    bodies in formats without such an envelope, e.g. rows in JSON or CSV format, always can
+    """
+    if not body.lstrip().startswith(b"{"):
+        return True
+    try:
+        doc = loads(body)
+    except ValueError:
+        # multiple rows in JSONL format
+        return True
+    return not isinstance(doc, dict) or "result" not in doc or doc["result"] == 1
+
+
+@dataclass(frozen=True)
+class CachedMeta:
+    """
+    raw covidcast meta document along with the time it was fetched and its validators
+    """
+
+    body: bytes
+    fetched: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def is_fresh(self, ttl: Optional[timedelta]) -> bool:
+        """
+        whether the document can be used without asking the server, documents without a ttl are always revalidated
+        """
+        return ttl is not None and self.fetched + ttl.total_seconds() >= time()
+
+    def revalidation_headers(self) -> Dict[str, str]:
+        """
+        headers of a conditional request answered by 304 Not Modified if the document did not change
+        """
+        headers: Dict[str, str] = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class EpiDataCache:
+    """
+    opt-in persistent cache of raw API responses stored compressed in a SQLite database
+
+    entries expire after `ttl` and the least recently used ones are evicted
+    once the stored bodies exceed `max_size` bytes. Immutable entries, i.e. responses
+    to calls pinned to the past via `as_of` or `issues`, never expire and are only
+    evicted after all mutable ones.
+
+    with `covidcast_ranges` enabled, covidcast rows are in addition stored per
+    (source, signal, geo_type, geo_value) series along with the time ranges they cover,
+    such that requests for overlapping ranges only fetch the missing parts.
+
+    the covidcast meta document used by `CovidcastEpidata` is kept separately. It is used as is
+    for `meta_ttl` and afterwards revalidated by a conditional request using its ETag and
+    Last-Modified headers, such that it is only downloaded again once it changed.
+    """
+
+    path: Final[Path]
+    ttl: Final[Optional[timedelta]]
+    meta_ttl: Final[Optional[timedelta]]
+    max_size: Final[int]
+    covidcast_ranges: Final[bool]
+    _lock: Final[Lock]
+
+    def __init__(
+        self,
+        directory: Union[None, str, Path] = None,
+        ttl: Optional[timedelta] = timedelta(days=1),
+        max_size: int = 512 * 1024 * 1024,
+        covidcast_ranges: bool = False,
+        meta_ttl: Optional[timedelta] = timedelta(hours=1),
+    ) -> None:
+        directory = Path(directory) if directory else DEFAULT_CACHE_DIR
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path = directory / "responses.sqlite"
+        self.ttl = ttl
+        self.meta_ttl = meta_ttl
+        self.max_size = max_size
+        self.covidcast_ranges = covidcast_ranges
+        self._lock = Lock()
+        with self._transaction() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    body BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL,
+                    expires REAL,
+                    immutable INTEGER NOT NULL DEFAULT 0
+                )""")
+            db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (immutable, accessed)")
+            db.execute("""CREATE TABLE IF NOT EXISTS covidcast_segments (
+                    series TEXT NOT NULL,
+                    start INTEGER NOT NULL,
+                    end INTEGER NOT NULL,
+                    body BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    accessed REAL NOT NULL,
+                    expires REAL,
+                    immutable INTEGER NOT NULL DEFAULT 0
+                )""")
+            db.execute("CREATE INDEX IF NOT EXISTS covidcast_segments_series ON covidcast_segments (series)")
+            db.execute("""CREATE TABLE IF NOT EXISTS covidcast_meta (
+                    url TEXT PRIMARY KEY,
+                    body BLOB NOT NULL,
+                    fetched REAL NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT
+                )""")
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock, closing(sqlite3.connect(str(self.path), timeout=30)) as db:
+            with db:
+                yield db
+
+    @staticmethod
+    def key(url: str, params: Mapping[str, str]) -> str:
+        """
+        canonical hash of a request, independent of the order of its parameters
+        """
+        canonical = dumps([url, sorted(params.items())], separators=(",", ":"))
+        return sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        returns the cached response body or None if missing or expired
+        """
+        now = time()
+        with self._transaction() as db:
+            row = db.execute("SELECT body, expires FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            body, expires = row
+            if expires is not None and expires < now:
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        return zlib.decompress(body)
+
+    def put(self, key: str, body: bytes, immutable: bool = False) -> None:
+        """
+        stores the given response body and evicts the least recently used entries if the cache grew too large
+        """
+        now = time()
+        expires = now + self.ttl.total_seconds() if self.ttl is not None and not immutable else None
+        compressed = zlib.compress(body)
+        with self._transaction() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, body, size, created, accessed, expires, immutable) "
+                + "VALUES (?,?,?,?,?,?,?)",
+                (key, compressed, len(compressed), now, now, expires, int(immutable)),
+            )
+            self._evict(db, now)
+
+    def _evict(self, db: sqlite3.Connection, now: float) -> None:
+        db.execute("DELETE FROM responses WHERE expires IS NOT NULL AND expires < ?", (now,))
+        db.execute("DELETE FROM covidcast_segments WHERE expires IS NOT NULL AND expires < ?", (now,))
+        (total,) = db.execute("""SELECT (SELECT COALESCE(SUM(size), 0) FROM responses)
+            + (SELECT COALESCE(SUM(size), 0) FROM covidcast_segments)""").fetchone()
+        if total <= self.max_size:
+            return
+        to_delete: Dict[str, List[Tuple[int]]] = {"responses": [], "covidcast_segments": []}
+        entries = db.execute("""SELECT 'responses', rowid, size, immutable, accessed FROM responses
+            UNION ALL SELECT 'covidcast_segments', rowid, size, immutable, accessed FROM covidcast_segments
+            ORDER BY immutable, accessed""")
+        for table, rowid, size, _, _ in entries:
+            if total <= self.max_size:
+                break
+            to_delete[table].append((rowid,))
+            total -= size
+        db.executemany("DELETE FROM responses WHERE rowid = ?", to_delete["responses"])
+        db.executemany("DELETE FROM covidcast_segments WHERE rowid = ?", to_delete["covidcast_segments"])
+
+    def covidcast_coverage(self, series: str) -> List[EpiInterval]:
+        """
+        time ranges of the given covidcast series that are cached and not expired
+        """
+        with self._transaction() as db:
+            intervals = db.execute(
+                "SELECT start, end FROM covidcast_segments WHERE series = ? AND (expires IS NULL OR expires >= ?)",
+                (series, time()),
+            ).fetchall()
+        return merge_intervals(intervals)
+
+    def covidcast_rows(self, series: str, intervals: Sequence[EpiInterval], time_type: str) -> List[Dict[str, Any]]:
+        """
+        cached rows of the given covidcast series within the given time ranges, newer segments take precedence
+        """
+        now = time()
+        with self._transaction() as db:
+            segments = db.execute(
+                """SELECT rowid, start, end, body FROM covidcast_segments
+                WHERE series = ? AND (expires IS NULL OR expires >= ?) ORDER BY rowid""",
+                (series, now),
+            ).fetchall()
+            rows: Dict[Tuple[int, Any], Dict[str, Any]] = {}
+            used: List[Tuple[float, int]] = []
+            for rowid, start, end, body in segments:
+                if not any(start <= i_end and i_start <= end for i_start, i_end in intervals):
+                    continue
+                used.append((now, rowid))
+                for row in loads(zlib.decompress(body)):
+                    t = to_ordinal(row["time_value"], time_type)
+                    if any(i_start <= t <= i_end for i_start, i_end in intervals):
+                        rows[(t, row.get("issue"))] = row
+            db.executemany("UPDATE covidcast_segments SET accessed = ? WHERE rowid = ?", used)
+        return [rows[k] for k in sorted(rows, key=lambda k: (k[0], k[1] or 0))]
+
+    def put_covidcast_segment(
+        self, series: str, interval: EpiInterval, rows: Sequence[Mapping[str, Any]], immutable: bool = False
+    ) -> None:
+        """
+        stores the rows of the given covidcast series that were fetched for the given time range
+        """
+        now = time()
+        expires = now + self.ttl.total_seconds() if self.ttl is not None and not immutable else None
+        compressed = zlib.compress(dumps(rows).encode("utf-8"))
+        with self._transaction() as db:
+            db.execute(
+                "INSERT INTO covidcast_segments (series, start, end, body, size, accessed, expires, immutable) "
+                + "VALUES (?,?,?,?,?,?,?,?)",
+                (series, interval[0], interval[1], compressed, len(compressed), now, expires, int(immutable)),
+            )
+            self._evict(db, now)
+
+    def get_meta(self, url: str) -> Optional[CachedMeta]:
+        """
+        returns the covidcast meta document last fetched from the given url, regardless of its age
+        """
+        with self._transaction() as db:
+            row = db.execute(
+                "SELECT body, fetched, etag, last_modified FROM covidcast_meta WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        body, fetched, etag, last_modified = row
+        return CachedMeta(zlib.decompress(body), fetched, etag, last_modified)
+
+    def put_meta(self, url: str, body: bytes, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """
+        stores the covidcast meta document fetched from the given url
+        """
+        with self._transaction() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO covidcast_meta (url, body, fetched, etag, last_modified) VALUES (?,?,?,?,?)",
+                (url, zlib.compress(body), time(), etag, last_modified),
+            )
+
+    def refresh_meta(self, url: str) -> None:
+        """
+        marks the stored covidcast meta document as fetched now, after the server reported that it did not change
+        """
+        with self._transaction() as db:
+            db.execute("UPDATE covidcast_meta SET fetched = ? WHERE url = ?", (time(), url))
+
+    def clear(self) -> None:
+        """
+        removes all cached responses
+        """
+        with self._transaction() as db:
+            db.execute("DELETE FROM responses")
+            db.execute("DELETE FROM covidcast_segments")
+            db.execute("DELETE FROM covidcast_meta")
+
+
+class CovidcastRangePlan:
+    """
+    plans a covidcast call against the time ranges already cached per series, such that only the gaps are fetched
+    """
+
+    _cache: Final[EpiDataCache]
+    _time_type: Final[str]
+    _requested: Final[List[EpiInterval]]
+    _series: Final[Dict[Tuple[str, str], str]]
+    _immutable: Final[bool]
+    gaps: Final[List[Tuple[str, List[str], List[EpiInterval]]]]
+
+    def __init__(
+        self,
+        cache: EpiDataCache,
+        params: Mapping[str, str],
+        requested: List[EpiInterval],
+        immutable: bool,
+    ) -> None:
+        self._cache = cache
+        self._time_type = params["time_type"]
+        self._requested = requested
+        self._immutable = immutable
+        variant = [params.get(k) for k in ("data_source", "time_type", "geo_type", "as_of", "issues", "lag")]
+        self._series = {
+            (signal, geo_value): dumps([*variant, signal, geo_value])
+            for signal in params["signals"].split(",")
+            for geo_value in params["geo_values"].lower().split(",")
+        }
+        gaps_by_missing: Dict[Tuple[str, Tuple[EpiInterval, ...]], List[str]] = {}
+        for (signal, geo_value), series in self._series.items():
+            missing = subtract_intervals(requested, cache.covidcast_coverage(series))
+            if missing:
+                gaps_by_missing.setdefault((signal, tuple(missing)), []).append(geo_value)
+        self.gaps = [(signal, geo_values, list(missing)) for (signal, missing), geo_values in gaps_by_missing.items()]
+
+    @staticmethod
+    def create(call: AEpiDataCall, cache: EpiDataCache) -> Optional["CovidcastRangePlan"]:
+        """
+        creates a plan for the given call
+
+        returns None unless it is a covidcast call with explicit signals, geo values and time ranges
+        """
+        # pylint: disable=protected-access
+        if call._endpoint.strip("/") != "covidcast":
+            return None
+        params = call._formatted_paramters()
+        if any(k not in params for k in ("data_source", "signals", "time_type", "geo_type", "geo_values")):
+            return None
+        if "*" in params["geo_values"].split(",") or "*" in params["signals"].split(","):
+            return None
+        requested = to_intervals(call._params["time_values"], params["time_type"])
+        if not requested:
+            return None
+        return CovidcastRangePlan(cache, params, requested, call.is_immutable())
+
+    def gap_params(self, call: AEpiDataCall) -> List[Tuple[Tuple[str, List[str], List[EpiInterval]], Dict[str, Any]]]:
+        """
+        parameters of the calls fetching the missing parts, along with the gap they fill
+        """
+        # pylint: disable=protected-access
+        return [
+            (
+                gap,
+                {
+                    **call._params,
+                    "signals": gap[0],
+                    "geo_values": gap[1],
+                    "time_values": from_intervals(gap[2], self._time_type),
+                },
+            )
+            for gap in self.gaps
+        ]
+
+    def store(self, gap: Tuple[str, List[str], List[EpiInterval]], rows: Iterable[Mapping[str, Any]]) -> None:
+        """
+        stores the rows fetched for the given gap
+        """
+        signal, geo_values, intervals = gap
+        by_geo: Dict[str, List[Mapping[str, Any]]] = {g: [] for g in geo_values}
+        for row in rows:
+            by_geo.setdefault(str(row["geo_value"]).lower(), []).append(row)
+        for geo_value in geo_values:
+            series = self._series[(signal, geo_value)]
+            geo_rows = by_geo[geo_value]
+            for start, end in intervals:
+                segment = [r for r in geo_rows if start <= to_ordinal(r["time_value"], self._time_type) <= end]
+                self._cache.put_covidcast_segment(series, (start, end), segment, self._immutable)
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """
+        stitches the cached rows of all series of the call
+        """
+        rows: List[Dict[str, Any]] = []
+        for series in self._series.values():
+            rows.extend(self._cache.covidcast_rows(series, self._requested, self._time_type))
+        rows.sort(key=lambda r: (r["signal"], to_ordinal(r["time_value"], self._time_type), r["geo_value"]))
+        return rows
@@ -7,3 +7,15 @@ __version__: Final = "1.0.0"
 HTTP_HEADERS: Final = {"User-Agent": f"delphi_epidata/{__version__}"}
 
 BASE_URL: Final = "https://delphi.cmu.edu/epidata/"
+
+# number of keep-alive connections kept per host by a context's connection pool
+DEFAULT_POOL_SIZE: Final = 10
+
+# number of rows per data frame yielded by `iter_batches`
+DEFAULT_BATCH_ROWS: Final = 10_000
+
+# number of bytes read at once from streamed responses
+STREAM_CHUNK_SIZE: Final = 64 * 1024
+
+# requests whose encoded URL would be longer are sent as POST with the parameters in the body
+MAX_URL_LENGTH: Final = 2048
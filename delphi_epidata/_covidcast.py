@@ -1,8 +1,9 @@
-from dataclasses import Field, InitVar, dataclass, field, fields
+from dataclasses import Field, dataclass, field, fields
 from typing import (
     Any,
     Callable,
     Dict,
+    FrozenSet,
     Generic,
     Iterable,
     List,
@@ -13,24 +14,43 @@ from typing import (
     Sequence,
     Tuple,
     Union,
+    cast,
     overload,
     get_args,
 )
 from functools import cached_property
 from pandas import DataFrame
+from ._parse import fields_to_predicate
 from ._model import (
+    EpiInterval,
+    EpiRange,
     EpiRangeLike,
+    CALL_SELF,
     CALL_TYPE,
     EpidataFieldInfo,
     EpidataFieldType,
     EpiRangeParam,
     InvalidArgumentException,
+    format_list,
+    from_intervals,
+    intersect_intervals,
+    to_intervals,
 )
 
 
 GeoType = Literal["nation", "msa", "hrr", "hhs", "state", "county"]
 TimeType = Literal["day", "week"]
 
+# approximate number of locations per geo type, used when no covidcast metadata is available
+GEO_TYPE_LOCATIONS: Dict[str, int] = {
+    "nation": 1,
+    "hhs": 10,
+    "state": 60,
+    "hrr": 306,
+    "msa": 392,
+    "county": 3300,
+}
+
 
 @dataclass
 class WebLink:
@@ -38,6 +58,8 @@ class WebLink:
     represents a web link
     """
 
+    __slots__ = ("alt", "href")
+
     alt: str
     href: str
 
@@ -48,13 +70,15 @@ class DataSignalGeoStatistics:
     COVIDcast signal statistics
     """
 
+    __slots__ = ("min", "max", "mean", "stdev")
+
     min: float
     max: float
     mean: float
     stdev: float
 
 
-def _limit_fields(data: Dict[str, Any], class_fields: Tuple[Field, ...]) -> Dict[str, Any]:
+def _limit_fields(data: Mapping[str, Any], class_fields: Tuple[Field, ...]) -> Dict[str, Any]:
     field_names = {f.name for f in class_fields}
     return {k: v for k, v in data.items() if k in field_names}
 
@@ -83,12 +107,199 @@ def define_covidcast_fields() -> List[EpidataFieldInfo]:
     ]
 
 
-@dataclass
+class CovidcastMetaIndex:
+    """
+    lookup of the `covidcast_meta` endpoint rows by data source, signal, time type, and geo type
+    """
+
+    _rows: Dict[Tuple[str, str, str, str], Mapping[str, Any]]
+    _signals: FrozenSet[Tuple[str, str, str]]
+
+    def __init__(self, rows: Iterable[Mapping[str, Any]]) -> None:
+        self._rows = {
+            (str(r["data_source"]), str(r["signal"]), str(r["time_type"]), str(r["geo_type"])): r for r in rows
+        }
+        self._signals = frozenset(key[:3] for key in self._rows)
+
+    def get(self, data_source: str, signal: str, time_type: str, geo_type: str) -> Optional[Mapping[str, Any]]:
+        return self._rows.get((data_source, signal, time_type, geo_type))
+
+    def has_signal(self, data_source: str, signal: str, time_type: str) -> bool:
+        """
+        whether the signal is described at any geo type
+        """
+        return (data_source, signal, time_type) in self._signals
+
+    def num_locations(self, data_source: str, signal: str, time_type: str, geo_type: str) -> Optional[int]:
+        row = self.get(data_source, signal, time_type, geo_type)
+        if row is None or row.get("num_locations") is None:
+            return GEO_TYPE_LOCATIONS.get(geo_type)
+        return int(row["num_locations"])
+
+
+def covidcast_num_locations(params: Mapping[str, str], meta: Optional[CovidcastMetaIndex] = None) -> Optional[int]:
+    """
+    number of locations of the given formatted covidcast parameters, the maximum among all requested signals
+    """
+    if "geo_type" not in params:
+        return None
+    if meta is None:
+        return GEO_TYPE_LOCATIONS.get(params["geo_type"])
+    counts = [
+        meta.num_locations(params.get("data_source", ""), signal, params.get("time_type", "day"), params["geo_type"])
+        for signal in params.get("signals", "").split(",")
+    ]
+    known = [c for c in counts if c is not None]
+    return max(known) if known else None
+
+
+def prune_covidcast_params(
+    params: Mapping[str, Union[None, EpiRangeLike, Iterable[EpiRangeLike]]], meta: CovidcastMetaIndex
+) -> Optional[Mapping[str, Union[None, EpiRangeLike, Iterable[EpiRangeLike]]]]:
+    """
+    restricts the parameters of a covidcast call to the signals available at its geo type and clips
+    its time values to their `min_time` to `max_time` range according to the covidcast metadata
+
+    signals missing in the metadata are kept as is. Returns None if nothing is left to request.
+    """
+    data_source, geo_type = params.get("data_source"), params.get("geo_type")
+    signals = params.get("signals")
+    if not isinstance(data_source, str) or not isinstance(geo_type, str) or signals is None:
+        return params
+    signal_names = format_list(signals).split(",")
+    if "*" in signal_names:
+        return params
+    time_type = str(params.get("time_type") or "day")
+    kept: List[str] = []
+    windows: Optional[List[EpiInterval]] = []
+    for signal in signal_names:
+        row = meta.get(data_source, signal, time_type, geo_type)
+        if row is None and meta.has_signal(data_source, signal, time_type):
+            # not available at this geo type
+            continue
+        kept.append(signal)
+        if row is None or row.get("min_time") is None or row.get("max_time") is None:
+            windows = None
+        elif windows is not None:
+            windows.extend(to_intervals(EpiRange(row["min_time"], row["max_time"]), time_type) or [])
+    if not kept:
+        return None
+    pruned = dict(params)
+    if len(kept) < len(signal_names):
+        pruned["signals"] = kept
+    requested = to_intervals(params["time_values"], time_type) if params.get("time_values") is not None else None
+    if requested is not None and windows is not None:
+        remaining = intersect_intervals(requested, windows)
+        if not remaining:
+            return None
+        if remaining != requested:
+            pruned["time_values"] = from_intervals(remaining, time_type)
+    return pruned if pruned != params else params
+
+
+def merge_covidcast_calls(
+    calls: Sequence[CALL_SELF],
+) -> Tuple[List[CALL_SELF], List[Tuple[int, Optional[FrozenSet[str]]]]]:
+    """
+    merges covidcast calls that only differ in their signals into a single call requesting all of them
+
+    returns the merged calls along with the index of the merged call of each given call and the signals
+    to pick from its result, None if the result belongs to the given call alone
+    """
+    merged: List[CALL_SELF] = []
+    picks: List[Tuple[int, Optional[FrozenSet[str]]]] = []
+    groups: Dict[Tuple[Any, ...], Tuple[int, List[str]]] = {}
+    # pylint: disable=protected-access
+    for call in calls:
+        params = call._formatted_paramters()
+        signals = params.get("signals", "*").split(",")
+        if call._endpoint.strip("/") != "covidcast" or "*" in signals:
+            picks.append((len(merged), None))
+            merged.append(call)
+            continue
+        key = (call._base_url, *sorted((k, v) for k, v in params.items() if k != "signals"))
+        if key not in groups:
+            groups[key] = (len(merged), [])
+            merged.append(call)
+        index, group_signals = groups[key]
+        group_signals.extend(s for s in signals if s not in group_signals)
+        picks.append((index, frozenset(signals)))
+    for index, group_signals in groups.values():
+        call = merged[index]
+        if len(group_signals) > len(call._formatted_paramters()["signals"].split(",")):
+            merged[index] = call._with_params({**call._params, "signals": group_signals})
+    return merged, picks
+
+
+def fields_with_signal(field_names: Optional[Iterable[str]]) -> Optional[List[str]]:
+    """
+    the given fields ensuring that the signal is included, such that merged results can be split again
+    """
+    if field_names is None:
+        return None
+    with_signal = [f for f in field_names if f != "-signal"]
+    if any(not f.startswith("-") for f in with_signal) and "signal" not in with_signal:
+        with_signal.append("signal")
+    return with_signal
+
+
+def pick_covidcast_rows(
+    rows: List[Dict[str, Any]], signals: Optional[FrozenSet[str]], field_names: Optional[Iterable[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    rows of the given signals within the result of a merged call, restricted to the originally requested fields
+    """
+    if signals is None:
+        return rows
+    keep_signal = fields_to_predicate(field_names)("signal")
+    picked = [r for r in rows if r.get("signal") in signals]
+    return picked if keep_signal else [{k: v for k, v in r.items() if k != "signal"} for r in picked]
+
+
+def pick_covidcast_df(
+    df: DataFrame, signals: Optional[FrozenSet[str]], field_names: Optional[Iterable[str]] = None
+) -> DataFrame:
+    """
+    rows of the given signals within the data frame of a merged call, restricted to the originally requested fields
+    """
+    if signals is None:
+        return df
+    picked = df[df["signal"].isin(signals)].reset_index(drop=True)
+    return picked if fields_to_predicate(field_names)("signal") else picked.drop(columns="signal")
+
+
+@dataclass(init=False)
 class DataSignal(Generic[CALL_TYPE]):
     """
     represents a COVIDcast data signal
     """
 
+    # the defaults are set in __init__, since class level defaults conflict with __slots__
+    __slots__ = (
+        "_create_call",
+        "source",
+        "signal",
+        "signal_basename",
+        "name",
+        "active",
+        "short_description",
+        "description",
+        "time_label",
+        "value_label",
+        "format",
+        "category",
+        "high_values_are",
+        "is_smoothed",
+        "is_weighted",
+        "is_cumulative",
+        "has_stderr",
+        "has_sample_size",
+        "link",
+        "compute_from_base",
+        "time_type",
+        "geo_types",
+    )
+
     _create_call: Callable[[Mapping[str, Union[None, EpiRangeLike, Iterable[EpiRangeLike]]]], CALL_TYPE]
 
     source: str
@@ -100,30 +311,76 @@ class DataSignal(Generic[CALL_TYPE]):
     description: str
     time_label: str
     value_label: str
-    format: Literal["per100k", "percent", "fraction", "count", "raw"] = "raw"
-    category: Literal["early", "public", "late", "other"] = "other"
-    high_values_are: Literal["good", "bad", "neutral"] = "neutral"
-    is_smoothed: bool = False
-    is_weighted: bool = False
-    is_cumulative: bool = False
-    has_stderr: bool = False
-    has_sample_size: bool = False
-    link: Sequence[WebLink] = field(default_factory=list)
-    compute_from_base: bool = False
-    time_type: TimeType = "day"
-
-    geo_types: Dict[GeoType, DataSignalGeoStatistics] = field(default_factory=dict)
-
-    def __post_init__(self) -> None:
-        self.link = [WebLink(alt=l["alt"], href=l["href"]) if isinstance(l, dict) else l for l in self.link]
+    format: Literal["per100k", "percent", "fraction", "count", "raw"]
+    category: Literal["early", "public", "late", "other"]
+    high_values_are: Literal["good", "bad", "neutral"]
+    is_smoothed: bool
+    is_weighted: bool
+    is_cumulative: bool
+    has_stderr: bool
+    has_sample_size: bool
+    link: Sequence[WebLink]
+    compute_from_base: bool
+    time_type: TimeType
+
+    geo_types: Dict[GeoType, DataSignalGeoStatistics]
+
+    def __init__(
+        self,
+        _create_call: Callable[[Mapping[str, Union[None, EpiRangeLike, Iterable[EpiRangeLike]]]], CALL_TYPE],
+        source: str,
+        signal: str,
+        signal_basename: str,
+        name: str,
+        active: bool,
+        short_description: str,
+        description: str,
+        time_label: str,
+        value_label: str,
+        format: Literal["per100k", "percent", "fraction", "count", "raw"] = "raw",  # pylint: disable=redefined-builtin
+        category: Literal["early", "public", "late", "other"] = "other",
+        high_values_are: Literal["good", "bad", "neutral"] = "neutral",
+        is_smoothed: bool = False,
+        is_weighted: bool = False,
+        is_cumulative: bool = False,
+        has_stderr: bool = False,
+        has_sample_size: bool = False,
+        link: Iterable[Union[WebLink, Mapping[str, str]]] = (),
+        compute_from_base: bool = False,
+        time_type: TimeType = "day",
+        geo_types: Optional[Mapping[GeoType, Union[DataSignalGeoStatistics, Mapping[str, float]]]] = None,
+    ) -> None:
+        self._create_call = _create_call
+        self.source = source
+        self.signal = signal
+        self.signal_basename = signal_basename
+        self.name = name
+        self.active = active
+        self.short_description = short_description
+        self.description = description
+        self.time_label = time_label
+        self.value_label = value_label
+        self.format = format
+        self.category = category
+        self.high_values_are = high_values_are
+        self.is_smoothed = is_smoothed
+        self.is_weighted = is_weighted
+        self.is_cumulative = is_cumulative
+        self.has_stderr = has_stderr
+        self.has_sample_size = has_sample_size
+        self.link = [WebLink(alt=l["alt"], href=l["href"]) if isinstance(l, Mapping) else l for l in link]
+        self.compute_from_base = compute_from_base
+        self.time_type = time_type
         stats_fields = fields(DataSignalGeoStatistics)
         self.geo_types = {
-            k: DataSignalGeoStatistics(**_limit_fields(l, stats_fields)) if isinstance(l, dict) else l
-            for k, l in self.geo_types.items()
+            k: DataSignalGeoStatistics(**_limit_fields(l, stats_fields)) if isinstance(l, Mapping) else l
+            for k, l in (geo_types or {}).items()
         }
 
     @staticmethod
     def to_df(signals: Iterable["DataSignal"]) -> DataFrame:
+        # iterated twice, for the rows and for the geo types
+        signals = list(signals)
         df = DataFrame(
             signals,
             columns=[
@@ -195,34 +452,140 @@ class DataSignal(Generic[CALL_TYPE]):
         return self.call(geo_type, geo_values, time_values, as_of, issues, lag)
 
 
-@dataclass
+def _signal_key(entry: Union[Mapping[str, Any], DataSignal]) -> Tuple[str, str]:
+    if isinstance(entry, DataSignal):
+        return entry.key
+    return (str(entry["source"]), str(entry["signal"]))
+
+
+class _LazySignals(Sequence[DataSignal[CALL_TYPE]]):
+    """
+    signals of a data source indexed by name, which are only created from their metadata once accessed
+    """
+
+    __slots__ = ("_entries", "_create_call", "_by_name")
+
+    _entries: List[Union[Mapping[str, Any], DataSignal[CALL_TYPE]]]
+    _create_call: Callable[[Mapping[str, Union[None, EpiRangeLike, Iterable[EpiRangeLike]]]], CALL_TYPE]
+    _by_name: Dict[str, int]
+
+    def __init__(
+        self,
+        entries: Iterable[Union[Mapping[str, Any], DataSignal[CALL_TYPE]]],
+        create_call: Callable[[Mapping[str, Union[None, EpiRangeLike, Iterable[EpiRangeLike]]]], CALL_TYPE],
+    ) -> None:
+        self._entries = list(entries)
+        self._create_call = create_call
+        self._by_name = {}
+        for i, entry in enumerate(self._entries):
+            self._by_name.setdefault(_signal_key(entry)[1], i)
+
+    def _materialize(self, index: int) -> DataSignal[CALL_TYPE]:
+        entry = self._entries[index]
+        if not isinstance(entry, DataSignal):
+            entry = self._entries[index] = DataSignal(
+                _create_call=self._create_call, **_limit_fields(entry, fields(DataSignal))
+            )
+        return entry
+
+    @property
+    def keys(self) -> List[Tuple[str, str]]:
+        """
+        (source, signal) keys of all signals without creating them
+        """
+        return [_signal_key(e) for e in self._entries]
+
+    def get(self, signal: str) -> Optional[DataSignal[CALL_TYPE]]:
+        index = self._by_name.get(signal)
+        return None if index is None else self._materialize(index)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @overload
+    def __getitem__(self, index: int) -> DataSignal[CALL_TYPE]:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[DataSignal[CALL_TYPE]]:
+        ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[DataSignal[CALL_TYPE], List[DataSignal[CALL_TYPE]]]:
+        if isinstance(index, slice):
+            return [self._materialize(i) for i in range(len(self._entries))[index]]
+        return self._materialize(range(len(self._entries))[index])
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Sequence) and list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+@dataclass(init=False)
 class DataSource(Generic[CALL_TYPE]):
     """
     represents a COVIDcast data source
     """
 
-    _create_call: InitVar[Callable[[Mapping[str, Union[None, EpiRangeLike, Iterable[EpiRangeLike]]]], CALL_TYPE]]
+    # the defaults are set in __init__, since class level defaults conflict with __slots__
+    __slots__ = (
+        "source",
+        "db_source",
+        "name",
+        "description",
+        "reference_signal",
+        "license",
+        "link",
+        "dua",
+        "signals",
+        "_signal_df",
+    )
 
     source: str
     db_source: str
     name: str
     description: str
     reference_signal: str
-    license: Optional[str] = None
-    link: Sequence[WebLink] = field(default_factory=list)
-    dua: Optional[str] = None
+    license: Optional[str]
+    link: Sequence[WebLink]
+    dua: Optional[str]
 
-    signals: Sequence[DataSignal] = field(default_factory=list)
+    signals: Sequence[DataSignal]
 
-    def __post_init__(
-        self, _create_call: Callable[[Mapping[str, Union[None, EpiRangeLike, Iterable[EpiRangeLike]]]], CALL_TYPE]
+    def __init__(
+        self,
+        _create_call: Callable[[Mapping[str, Union[None, EpiRangeLike, Iterable[EpiRangeLike]]]], CALL_TYPE],
+        source: str,
+        db_source: str,
+        name: str,
+        description: str,
+        reference_signal: str,
+        license: Optional[str] = None,  # pylint: disable=redefined-builtin
+        link: Iterable[Union[WebLink, Mapping[str, str]]] = (),
+        dua: Optional[str] = None,
+        signals: Iterable[Union[Mapping[str, Any], DataSignal[CALL_TYPE]]] = (),
     ) -> None:
-        self.link = [WebLink(alt=l["alt"], href=l["href"]) if isinstance(l, dict) else l for l in self.link]
-        signal_fields = fields(DataSignal)
-        self.signals = [
-            DataSignal(_create_call=_create_call, **_limit_fields(s, signal_fields)) if isinstance(s, dict) else s
-            for s in self.signals
-        ]
+        self.source = source
+        self.db_source = db_source
+        self.name = name
+        self.description = description
+        self.reference_signal = reference_signal
+        self.license = license
+        self.link = [WebLink(alt=l["alt"], href=l["href"]) if isinstance(l, Mapping) else l for l in link]
+        self.dua = dua
+        # signals are only created once looked up, most jobs just use a few of them
+        self.signals = _LazySignals(signals, _create_call)
+        self._signal_df: Optional[DataFrame] = None
+
+    @property
+    def signal_keys(self) -> List[Tuple[str, str]]:
+        """
+        (source, signal) keys of all signals of this source
+        """
+        if isinstance(self.signals, _LazySignals):
+            return self.signals.keys
+        return [s.key for s in self.signals]
 
     @staticmethod
     def to_df(sources: Iterable["DataSource"]) -> DataFrame:
@@ -230,15 +593,19 @@ class DataSource(Generic[CALL_TYPE]):
             sources,
             columns=["source", "name", "description", "reference_signal", "license", "dua"],
         )
-        df["signals"] = [",".join(ss.signal for ss in s.signals) for s in sources]
+        df["signals"] = [",".join(signal for _, signal in s.signal_keys) for s in sources]
         return df.set_index("source")
 
     def get_signal(self, signal: str) -> Optional[DataSignal]:
+        if isinstance(self.signals, _LazySignals):
+            return self.signals.get(signal)
         return next((s for s in self.signals if s.signal == signal), None)
 
-    @cached_property
+    @property
     def signal_df(self) -> DataFrame:
-        return DataSignal.to_df(self.signals)
+        if self._signal_df is None:
+            self._signal_df = DataSignal.to_df(self.signals)
+        return self._signal_df
 
 
 @dataclass
@@ -249,7 +616,7 @@ class CovidcastDataSources(Generic[CALL_TYPE]):
 
     sources: Sequence[DataSource[CALL_TYPE]]
     _source_by_name: Dict[str, DataSource[CALL_TYPE]] = field(init=False, default_factory=dict)
-    _signals_by_key: OrderedDict[Tuple[str, str], DataSignal[CALL_TYPE]] = field(
+    _signals_by_key: OrderedDict[Tuple[str, str], Tuple[DataSource[CALL_TYPE], str]] = field(
         init=False, default_factory=OrderedDict
     )
 
@@ -257,9 +624,10 @@ class CovidcastDataSources(Generic[CALL_TYPE]):
 
     def __post_init__(self) -> None:
         self._source_by_name = {s.source: s for s in self.sources}
+        # index the signals by key without creating them
         for source in self.sources:
-            for signal in source.signals:
-                self._signals_by_key[signal.key] = signal
+            for key in source.signal_keys:
+                self._signals_by_key[key] = (source, key[1])
 
     def get_source(self, source: str) -> Optional[DataSource[CALL_TYPE]]:
         return self._source_by_name.get(source)
@@ -302,8 +670,8 @@ class CovidcastDataSources(Generic[CALL_TYPE]):
         return DataSource.to_df(self.sources)
 
     @property
-    def signals(self) -> Iterable[DataSignal[CALL_TYPE]]:
-        return self._signals_by_key.values()
+    def signals(self) -> List[DataSignal[CALL_TYPE]]:
+        return [cast(DataSignal[CALL_TYPE], s.get_signal(signal)) for s, signal in self._signals_by_key.values()]
 
     @cached_property
     def signal_df(self) -> DataFrame:
@@ -379,7 +747,8 @@ class CovidcastDataSources(Generic[CALL_TYPE]):
         return DataSignal.to_df(self.signals)
 
     def get_signal(self, source: str, signal: str) -> Optional[DataSignal[CALL_TYPE]]:
-        return self._signals_by_key.get((source, signal))
+        entry = self._signals_by_key.get((source, signal))
+        return entry[0].get_signal(entry[1]) if entry else None
 
     @property
     def signal_names(self) -> Iterable[Tuple[str, str]]:
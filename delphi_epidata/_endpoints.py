@@ -332,7 +332,6 @@ class AEpiDataEndpoints(ABC, Generic[CALL_TYPE]):
                 EpidataFieldInfo("state", EpidataFieldType.text),
                 EpidataFieldInfo("issue", EpidataFieldType.date),
                 EpidataFieldInfo("date", EpidataFieldType.date),
-                EpidataFieldInfo("issue", EpidataFieldType.date),
                 EpidataFieldInfo("critical_staffing_shortage_today_yes", EpidataFieldType.bool),
                 EpidataFieldInfo("critical_staffing_shortage_today_no", EpidataFieldType.bool),
                 EpidataFieldInfo("critical_staffing_shortage_today_not_reported", EpidataFieldType.bool),
@@ -1,9 +1,14 @@
+from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from enum import Enum
-from datetime import date
+from functools import lru_cache
+from datetime import date, datetime
+from io import BytesIO
+from json import loads
 from urllib.parse import urlencode
 from typing import (
     Any,
+    Callable,
     Dict,
     Final,
     Generic,
@@ -19,9 +24,26 @@ from typing import (
     cast,
 )
 from epiweeks import Week
-from pandas import DataFrame, CategoricalDtype
-
-from ._parse import parse_api_date, parse_api_week, parse_api_date_or_week, fields_to_predicate
+import numpy as np
+from pandas import DataFrame, CategoricalDtype, Series, read_csv
+
+from ._weeks import (
+    dates_to_epiweeks,
+    dates_to_yyyymmdd,
+    epiweeks_to_dates,
+    from_ordinals,
+    to_ordinals,
+    yyyymmdd_to_dates,
+)
+from ._parse import (
+    parse_api_date,
+    parse_api_week,
+    parse_api_date_or_week,
+    parse_api_dates,
+    parse_api_weeks,
+    parse_api_dates_or_weeks,
+    fields_to_predicate,
+)
 
 EpiDateLike = Union[int, str, date, Week]
 EpiRangeDict = TypedDict("EpiRangeDict", {"from": EpiDateLike, "to": EpiDateLike})
@@ -56,6 +78,55 @@ def format_list(values: Union[EpiRangeLike, Iterable[EpiRangeLike]]) -> str:
     return ",".join([format_item(value) for value in list_values])
 
 
+def _last_day(d: EpiDateLike) -> Optional[date]:
+    """
+    last day covered by a date or epiweek value, None if it is not a concrete day or week (e.g. `*`)
+    """
+    if isinstance(d, date):
+        return d
+    if isinstance(d, Week):
+        return d.enddate()
+    v = str(d)
+    if not v.isdigit():
+        return None
+    if len(v) == 6:
+        return Week.fromstring(v).enddate()
+    if len(v) == 8:
+        return datetime.strptime(v, "%Y%m%d").date()
+    return None
+
+
+def _last_day_of_range(value: EpiRangeLike) -> Optional[date]:
+    ends: Sequence[EpiDateLike]
+    if isinstance(value, EpiRange):
+        ends = [value.start, value.end]
+    elif isinstance(value, dict) and "from" in value and "to" in value:
+        ends = [value["from"], value["to"]]
+    elif isinstance(value, str) and "-" in value:
+        ends = value.split("-", 1)
+    else:
+        ends = [value]
+    days = [_last_day(v) for v in ends]
+    if any(d is None for d in days):
+        return None
+    return max(days)
+
+
+def is_past(values: Union[EpiRangeLike, Iterable[EpiRangeLike]], today: Optional[date] = None) -> bool:
+    """
+    whether all given dates, epiweeks and ranges lie completely before today
+    """
+    today = today or date.today()
+    list_values = cast(List[EpiRangeLike], list(values) if isinstance(values, (list, tuple, set)) else [values])
+    if not list_values:
+        return False
+    for value in list_values:
+        last = _last_day_of_range(value)
+        if last is None or last >= today:
+            return False
+    return True
+
+
 EPI_RANGE_TYPE = TypeVar("EPI_RANGE_TYPE", int, date, str, Week)
 
 
@@ -81,6 +152,189 @@ class EpiRange(Generic[EPI_RANGE_TYPE]):
         return f"{format_date(self.start)}-{format_date(self.end)}"
 
 
+# parameters holding dates or epiweeks, which are sent as compressed ranges
+RANGE_PARAMETERS: Final = frozenset({"dates", "epiweeks", "issues", "publication_dates", "time_values"})
+
+# inclusive range of consecutive days or weeks, counted as ordinal numbers
+EpiInterval = Tuple[int, int]
+
+
+def to_ordinal(value: EpiDateLike, time_type: str = "day") -> int:
+    """
+    converts a date or epiweek to its day (time_type `day`) or week (time_type `week`) ordinal number
+    """
+    if isinstance(value, Week):
+        d = value.startdate()
+    elif isinstance(value, date):
+        d = value
+    else:
+        v = str(value)
+        d = Week.fromstring(v).startdate() if len(v) == 6 else datetime.strptime(v, "%Y%m%d").date()
+    if time_type == "week":
+        # epiweeks start on a Sunday whose ordinal is always a multiple of 7
+        return d.toordinal() // 7
+    return d.toordinal()
+
+
+def from_ordinal(ordinal: int, time_type: str = "day") -> int:
+    """
+    converts a day or week ordinal number back to its API representation (YYYYMMDD or YYYYWW)
+    """
+    if time_type == "week":
+        return int(Week.fromdate(date.fromordinal(ordinal * 7)).cdcformat())
+    return int(date.fromordinal(ordinal).strftime("%Y%m%d"))
+
+
+def merge_intervals(intervals: Iterable[EpiInterval]) -> List[EpiInterval]:
+    """
+    sorts the given intervals and merges overlapping or adjacent ones
+    """
+    merged: List[EpiInterval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(intervals: Iterable[EpiInterval], to_remove: Iterable[EpiInterval]) -> List[EpiInterval]:
+    """
+    computes the parts of the given intervals that are not covered by any of the intervals to remove
+    """
+    remaining = merge_intervals(intervals)
+    for r_start, r_end in merge_intervals(to_remove):
+        next_remaining: List[EpiInterval] = []
+        for start, end in remaining:
+            if r_end < start or r_start > end:
+                next_remaining.append((start, end))
+                continue
+            if start < r_start:
+                next_remaining.append((start, r_start - 1))
+            if r_end < end:
+                next_remaining.append((r_end + 1, end))
+        remaining = next_remaining
+    return remaining
+
+
+def intersect_intervals(intervals: Iterable[EpiInterval], other: Iterable[EpiInterval]) -> List[EpiInterval]:
+    """
+    computes the parts of the given intervals that are covered by the other intervals
+    """
+    merged = merge_intervals(intervals)
+    return subtract_intervals(merged, subtract_intervals(merged, other))
+
+
+def to_intervals(
+    values: Union[EpiRangeLike, Iterable[EpiRangeLike]], time_type: str = "day"
+) -> Optional[List[EpiInterval]]:
+    """
+    converts dates, epiweeks and ranges to merged ordinal intervals, None if they contain wildcards
+
+    raises a ValueError for invalid dates or epiweeks
+    """
+    list_values = values if isinstance(values, (list, tuple, set)) else [values]
+    if list_values and all(isinstance(v, int) and not isinstance(v, bool) for v in list_values):
+        # plain YYYYMMDD dates or YYYYWW epiweeks, converted at once
+        ints = cast(List[int], list(list_values))
+        dates = epiweeks_to_dates(ints) if time_type == "week" else yyyymmdd_to_dates(ints)
+        if np.isnat(dates).any():
+            invalid = [v for v, d in zip(ints, np.isnat(dates)) if d]
+            raise ValueError(f"invalid {'epiweeks' if time_type == 'week' else 'dates'}: {invalid}")
+        ordinals = to_ordinals(dates)
+        if time_type == "week":
+            ordinals = ordinals // 7
+        return merge_intervals((int(o), int(o)) for o in np.unique(ordinals))
+    intervals: List[EpiInterval] = []
+    for value in list_values:
+        ends: Sequence[EpiDateLike]
+        if isinstance(value, EpiRange):
+            ends = [value.start, value.end]
+        elif isinstance(value, dict) and "from" in value and "to" in value:
+            ends = [value["from"], value["to"]]
+        elif isinstance(value, str) and "-" in value:
+            ends = value.split("-", 1)
+        else:
+            ends = [cast(EpiDateLike, value)] * 2
+        if not all(isinstance(v, (date, Week)) or str(v).isdigit() for v in ends):
+            return None
+        start, end = sorted(to_ordinal(v, time_type) for v in ends)
+        intervals.append((start, end))
+    return merge_intervals(intervals)
+
+
+def count_intervals(intervals: Iterable[EpiInterval]) -> int:
+    """
+    number of days or weeks covered by the given intervals
+    """
+    return sum(end - start + 1 for start, end in intervals)
+
+
+def chunk_intervals(intervals: Iterable[EpiInterval], size: int) -> List[List[EpiInterval]]:
+    """
+    splits the given intervals into chunks covering at most `size` days or weeks each
+    """
+    chunks: List[List[EpiInterval]] = [[]]
+    remaining = size
+    for start, end in intervals:
+        while start <= end:
+            if remaining == 0:
+                chunks.append([])
+                remaining = size
+            chunk_end = min(end, start + remaining - 1)
+            chunks[-1].append((start, chunk_end))
+            remaining -= chunk_end - start + 1
+            start = chunk_end + 1
+    return [c for c in chunks if c]
+
+
+def from_intervals(intervals: Iterable[EpiInterval], time_type: str = "day") -> List[EpiRange[int]]:
+    """
+    converts ordinal intervals back to API ranges
+    """
+    bounds = np.array(list(intervals), dtype=np.int64).reshape(-1, 2)
+    if time_type == "week":
+        values = dates_to_epiweeks(from_ordinals(bounds * 7))
+    else:
+        values = dates_to_yyyymmdd(from_ordinals(bounds))
+    return [EpiRange(int(start), int(end)) for start, end in values]
+
+
+def _time_type_of(value: EpiRangeLike) -> Optional[str]:
+    if isinstance(value, EpiRange):
+        return _time_type_of(value.start)
+    if isinstance(value, dict):
+        return _time_type_of(value["from"]) if "from" in value else None
+    if isinstance(value, Week):
+        return "week"
+    if isinstance(value, date):
+        return "day"
+    v = str(value).split("-", 1)[0]
+    if not v.isdigit():
+        return None
+    return {6: "week", 8: "day"}.get(len(v))
+
+
+def format_range_list(values: Union[EpiRangeLike, Iterable[EpiRangeLike]]) -> str:
+    """
+    turns a list of dates or epiweeks into the shortest equivalent comma-separated string
+    by sorting and deduplicating them and merging consecutive ones into ranges
+    """
+    list_values = cast(List[EpiRangeLike], list(values) if isinstance(values, (list, tuple, set)) else [values])
+    time_types = {_time_type_of(v) for v in list_values}
+    if len(time_types) != 1 or None in time_types:
+        return format_list(values)
+    time_type = time_types.pop()
+    try:
+        intervals = to_intervals(list_values, time_type)
+    except ValueError:
+        # e.g. a week 53 of a year with 52 weeks or February 31, send them as given and leave it to the API
+        return format_list(values)
+    if intervals is None:
+        return format_list(values)
+    return ",".join(str(r.start) if r.start == r.end else str(r) for r in from_intervals(intervals, time_type))
+
+
 EpiDataResponse = TypedDict("EpiDataResponse", {"result": int, "message": str, "epidata": List})
 
 
@@ -100,6 +354,17 @@ class EpiDataFormatType(str, Enum):
     jsonl = "jsonl"
 
 
+def empty_response_body(format_type: Optional[EpiDataFormatType] = None) -> bytes:
+    """
+    body of a response without any rows in the given format
+    """
+    if format_type in (EpiDataFormatType.csv, EpiDataFormatType.jsonl):
+        return b""
+    if format_type == EpiDataFormatType.json:
+        return b"[]"
+    return b'{"result": -2, "message": "no results", "epidata": []}'
+
+
 class InvalidArgumentException(Exception):
     """
     exception for an invalid argument
@@ -139,7 +404,51 @@ class EpidataFieldInfo:
     categories: Final[Sequence[str]] = field(default_factory=list)
 
 
+_DATE_PARSERS: Final[Mapping[EpidataFieldType, Callable[[Iterable[Union[str, int, float, None]]], Any]]] = {
+    EpidataFieldType.date: parse_api_dates,
+    EpidataFieldType.epiweek: parse_api_weeks,
+    EpidataFieldType.date_or_epiweek: parse_api_dates_or_weeks,
+}
+
+_VALUE_PARSERS: Final[Mapping[EpidataFieldType, Callable[[Any], Any]]] = {
+    EpidataFieldType.date: parse_api_date,
+    EpidataFieldType.epiweek: parse_api_week,
+    EpidataFieldType.date_or_epiweek: parse_api_date_or_week,
+    EpidataFieldType.bool: bool,
+}
+
+RowParser = Callable[[Mapping[str, Union[str, float, int, None]]], Mapping[str, Union[str, float, int, date, None]]]
+
+
+@lru_cache(maxsize=128)
+def compile_row_parser(
+    schema: Tuple[Tuple[str, EpidataFieldType], ...], disable_date_parsing: bool = False
+) -> RowParser:
+    """
+    creates a function converting the date, epiweek and bool values of rows with the given (name, type) schema,
+    all other values are passed through untouched
+    """
+    converters = tuple(
+        (name, _VALUE_PARSERS[field_type])
+        for name, field_type in schema
+        if field_type == EpidataFieldType.bool or (field_type in _VALUE_PARSERS and not disable_date_parsing)
+    )
+    if not converters:
+        return lambda row: row
+
+    def parse_row(row: Mapping[str, Union[str, float, int, None]]) -> Mapping[str, Union[str, float, int, date, None]]:
+        parsed: Dict[str, Union[str, float, int, date, None]] = dict(row)
+        for name, convert in converters:
+            value = parsed.get(name)
+            if value is not None:
+                parsed[name] = convert(value)
+        return parsed
+
+    return parse_row
+
+
 CALL_TYPE = TypeVar("CALL_TYPE")
+CALL_SELF = TypeVar("CALL_SELF", bound="AEpiDataCall")
 
 
 def add_endpoint_to_url(url: str, endpoint: str) -> str:
@@ -149,7 +458,14 @@ def add_endpoint_to_url(url: str, endpoint: str) -> str:
     return url
 
 
-class AEpiDataCall:
+def is_url_too_long(url: str, params: Mapping[str, str], max_length: int) -> bool:
+    """
+    whether the URL with the given parameters encoded as query string would exceed the given length
+    """
+    return len(url) + 1 + len(urlencode(params)) > max_length
+
+
+class AEpiDataCall(ABC):
     """
     base epidata call class
     """
@@ -159,6 +475,7 @@ class AEpiDataCall:
     _params: Final[Mapping[str, Union[None, EpiRangeLike, Iterable[EpiRangeLike]]]]
     meta: Final[Sequence[EpidataFieldInfo]]
     meta_by_name: Final[Mapping[str, EpidataFieldInfo]]
+    _schema: Final[Tuple[Tuple[str, EpidataFieldType], ...]]
     only_supports_classic: Final[bool]
 
     def __init__(
@@ -175,6 +492,7 @@ class AEpiDataCall:
         self.only_supports_classic = only_supports_classic
         self.meta = meta or []
         self.meta_by_name = {k.name: k for k in self.meta}
+        self._schema = tuple((k.name, k.type) for k in self.meta)
 
     def _verify_parameters(self) -> None:
         # hook for verifying parameters before sending
@@ -191,7 +509,11 @@ class AEpiDataCall:
             all_params["format"] = format_type
         if fields:
             all_params["fields"] = fields
-        return {k: format_list(v) for k, v in all_params.items() if v is not None}
+        return {
+            k: format_range_list(v) if k in RANGE_PARAMETERS else format_list(v)
+            for k, v in all_params.items()
+            if v is not None
+        }
 
     def request_arguments(
         self, format_type: Optional[EpiDataFormatType] = None, fields: Optional[Iterable[str]] = None
@@ -224,34 +546,114 @@ class AEpiDataCall:
             return f"{u}?{query}"
         return u
 
+    @abstractmethod
+    def _with_params(
+        self: CALL_SELF, params: Mapping[str, Union[None, EpiRangeLike, Iterable[EpiRangeLike]]]
+    ) -> CALL_SELF:
+        """
+        creates a copy of this call with the given parameters replaced
+        """
+
+    def estimate_rows(self, num_locations: Optional[int] = None) -> Optional[int]:
+        """
+        estimates the number of rows returned by a covidcast-like call, None if it cannot be estimated
+
+        `num_locations` is used for `*` geo values, e.g. as reported by the `covidcast_meta` endpoint
+        """
+        if self._params.get("time_values") is None or self._params.get("geo_values") is None:
+            return None
+        time_type = str(self._params.get("time_type") or "day")
+        try:
+            time_intervals = to_intervals(self._params["time_values"], time_type)
+            issue_intervals = (
+                to_intervals(self._params["issues"], time_type) if self._params.get("issues") is not None else None
+            )
+        except ValueError:
+            # invalid dates or epiweeks are left for the API to report
+            return None
+        if not time_intervals:
+            return None
+        geo_values = format_list(self._params["geo_values"]).split(",")
+        n_geos = num_locations if "*" in geo_values else len(geo_values)
+        if n_geos is None:
+            return None
+        n_signals = len(format_list(self._params["signals"]).split(",")) if self._params.get("signals") else 1
+        n_issues = count_intervals(issue_intervals) if issue_intervals else 1
+        return n_signals * n_geos * count_intervals(time_intervals) * n_issues
+
+    def split(self: CALL_SELF, max_rows: int, num_locations: Optional[int] = None) -> List[CALL_SELF]:
+        """
+        splits this call along its time values and if needed its geo values into calls returning at most
+        `max_rows` rows each according to `estimate_rows`
+        """
+        rows = self.estimate_rows(num_locations)
+        if rows is None or rows <= max_rows:
+            return [self]
+        time_type = str(self._params.get("time_type") or "day")
+        time_intervals = to_intervals(self._params["time_values"], time_type) or []
+        rows_per_time = max(1, rows // count_intervals(time_intervals))
+        geo_chunks: List[Union[None, EpiRangeLike, Iterable[EpiRangeLike]]] = [self._params["geo_values"]]
+        geo_values = format_list(self._params["geo_values"]).split(",")
+        if rows_per_time > max_rows and "*" not in geo_values:
+            rows_per_geo = max(1, rows_per_time // len(geo_values))
+            geos_per_chunk = max(1, max_rows // rows_per_geo)
+            geo_chunks = [geo_values[i : i + geos_per_chunk] for i in range(0, len(geo_values), geos_per_chunk)]
+            rows_per_time = rows_per_geo * geos_per_chunk
+        times_per_chunk = max(1, max_rows // rows_per_time)
+        return [
+            self._with_params(
+                {**self._params, "time_values": from_intervals(time_chunk, time_type), "geo_values": geo_chunk}
+            )
+            for time_chunk in chunk_intervals(time_intervals, times_per_chunk)
+            for geo_chunk in geo_chunks
+        ]
+
+    def is_immutable(self, today: Optional[date] = None) -> bool:
+        """
+        whether the result of this call can no longer change, i.e. it is pinned by `as_of` or `issues` to the past
+        """
+        as_of = self._params.get("as_of")
+        if as_of is not None and is_past(as_of, today):
+            return True
+        issues = self._params.get("issues")
+        return issues is not None and is_past(issues, today)
+
     def __repr__(self) -> str:
         return f"EpiDataCall(endpoint={self._endpoint}, params={self._formatted_paramters()})"
 
     def __str__(self) -> str:
         return self.request_url()
 
-    def _parse_value(
-        self, key: str, value: Union[str, float, int, None], disable_date_parsing: Optional[bool] = False
-    ) -> Union[str, float, int, date, None]:
-        meta = self.meta_by_name.get(key)
-        if not meta or value is None:
-            return value
-        if meta.type == EpidataFieldType.date_or_epiweek and not disable_date_parsing:
-            return parse_api_date_or_week(value)
-        if meta.type == EpidataFieldType.date and not disable_date_parsing:
-            return parse_api_date(value)
-        if meta.type == EpidataFieldType.epiweek and not disable_date_parsing:
-            return parse_api_week(value)
-        if meta.type == EpidataFieldType.bool:
-            return bool(value)
-        return value
+    def _row_parser(self, disable_date_parsing: Optional[bool] = False) -> RowParser:
+        """
+        row conversion function of this call's fields, compiled once per schema
+        """
+        return compile_row_parser(self._schema, bool(disable_date_parsing))
 
     def _parse_row(
         self, row: Mapping[str, Union[str, float, int, None]], disable_date_parsing: Optional[bool] = False
     ) -> Mapping[str, Union[str, float, int, date, None]]:
         if not self.meta:
             return row
-        return {k: self._parse_value(k, v, disable_date_parsing) for k, v in row.items()}
+        return self._row_parser(disable_date_parsing)(row)
+
+    @staticmethod
+    def _parse_date_columns(
+        df: DataFrame, date_columns: Iterable[EpidataFieldInfo], disable_date_parsing: Optional[bool] = False
+    ) -> DataFrame:
+        """
+        converts the given date and epiweek columns column-wise
+        """
+        for info in date_columns:
+            column = df[info.name]
+            if disable_date_parsing:
+                df[info.name] = column.astype(int)
+            elif isinstance(column.loc[column.first_valid_index()], date):
+                # rows with already parsed dates
+                df[info.name] = column.astype("datetime64[ns]")
+            else:
+                df[info.name] = Series(_DATE_PARSERS[info.type](column), index=df.index).astype("datetime64[ns]")
+        return df
 
     def _as_df(
         self,
@@ -262,8 +664,57 @@ class AEpiDataCall:
         pred = fields_to_predicate(fields)
         columns: List[str] = [info.name for info in self.meta if pred(info.name)]
         df = DataFrame(rows, columns=columns or None)
+        return self._convert_df(df, fields, disable_date_parsing)
+
+    def _jsonl_as_df(
+        self,
+        lines: Sequence[bytes],
+        fields: Optional[Iterable[str]] = None,
+        disable_date_parsing: Optional[bool] = False,
+    ) -> DataFrame:
+        """
+        parses a batch of JSONL lines at once and converts it column-wise into a data frame
+        """
+        rows = loads(b"[" + b",".join(lines) + b"]")
+        return self._as_df(rows, fields, disable_date_parsing)
+
+    def _csv_as_df(
+        self,
+        content: bytes,
+        fields: Optional[Iterable[str]] = None,
+        disable_date_parsing: Optional[bool] = False,
+    ) -> DataFrame:
+        """
+        reads a CSV response with the C parser, using the field types to avoid inferring them
+        """
+        pred = fields_to_predicate(fields)
+        columns: List[str] = [info.name for info in self.meta if pred(info.name)]
+        if not content.strip():
+            return self._convert_df(DataFrame(columns=columns or None), fields, disable_date_parsing)
+        read_types: Dict[str, Any] = {}
+        for info in self.meta:
+            if info.type in (EpidataFieldType.text, EpidataFieldType.categorical):
+                # keep e.g. leading zeros of FIPS codes
+                read_types[info.name] = str
+            elif info.type == EpidataFieldType.float:
+                read_types[info.name] = float
+        df = read_csv(BytesIO(content), dtype=read_types, engine="c")
+        if columns:
+            df = df.reindex(columns=columns)
+        return self._convert_df(df, fields, disable_date_parsing)
 
+    def _convert_df(
+        self,
+        df: DataFrame,
+        fields: Optional[Iterable[str]] = None,
+        disable_date_parsing: Optional[bool] = False,
+    ) -> DataFrame:
+        """
+        converts the columns of the given data frame to the types of their fields
+        """
+        pred = fields_to_predicate(fields)
         data_types: Dict[str, Any] = {}
+        date_columns: List[EpidataFieldInfo] = []
         for info in self.meta:
             if not pred(info.name) or df[info.name].isnull().values.all():
                 continue
@@ -273,12 +724,14 @@ class AEpiDataCall:
                 data_types[info.name] = CategoricalDtype(categories=info.categories or None, ordered=True)
             elif info.type == EpidataFieldType.int:
                 data_types[info.name] = int
-            elif info.type in (EpidataFieldType.date, EpidataFieldType.epiweek, EpidataFieldType.date_or_epiweek):
-                data_types[info.name] = int if disable_date_parsing else "datetime64"
+            elif info.type in _DATE_PARSERS:
+                date_columns.append(info)
             elif info.type == EpidataFieldType.float:
                 data_types[info.name] = float
             else:
                 data_types[info.name] = str
         if data_types:
             df = df.astype(data_types)
+        if date_columns:
+            df = self._parse_date_columns(df, date_columns, disable_date_parsing)
         return df
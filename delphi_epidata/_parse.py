@@ -1,10 +1,19 @@
-from typing import Callable, Iterable, Optional, Set, cast
+from functools import lru_cache
+from typing import Callable, Final, Iterable, Optional, Set, cast
 
 from typing import Union
 from datetime import date, datetime
 from epiweeks import Week
+import numpy as np
+from pandas import Series, to_numeric
 
+from ._weeks import epiweeks_to_dates, yyyymmdd_to_dates
 
+# number of distinct values remembered per parse function, covering decades of days and weeks
+PARSE_CACHE_SIZE: Final = 16384
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
 def parse_api_date(value: Union[str, int, float, None]) -> Optional[date]:
     if value is None:
         return value
@@ -12,12 +21,14 @@ def parse_api_date(value: Union[str, int, float, None]) -> Optional[date]:
     return datetime.strptime(v, "%Y%m%d").date()
 
 
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
 def parse_api_week(value: Union[str, int, float, None]) -> Optional[date]:
     if value is None:
         return None
     return cast(date, Week.fromstring(str(value)).startdate())
 
 
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
 def parse_api_date_or_week(value: Union[str, int, float, None]) -> Optional[date]:
     if value is None:
         return None
@@ -29,6 +40,46 @@ def parse_api_date_or_week(value: Union[str, int, float, None]) -> Optional[date
     return d
 
 
+def _parse_ints(
+    values: Iterable[Union[str, int, float, None]], convert: Callable[[np.ndarray], np.ndarray]
+) -> np.ndarray:
+    """
+    converts the values as int64 array with the given function to datetime64[D] values, NaT for missing values
+
+    raises a ValueError for values that are not missing but invalid, like the per value parsers do
+    """
+    s = Series(values)
+    arr = to_numeric(s, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    valid = ~np.isnan(arr)
+    r = convert(np.where(valid, arr, 0).astype(np.int64))
+    r[~valid] = np.datetime64("NaT")
+    invalid = np.isnat(r) & s.notna().to_numpy()
+    if invalid.any():
+        raise ValueError(f"invalid dates or epiweeks: {s[invalid].tolist()}")
+    return r
+
+
+def parse_api_dates(values: Iterable[Union[str, int, float, None]]) -> np.ndarray:
+    """
+    vectorized version of `parse_api_date` returning a datetime64[D] array with NaT for missing values
+    """
+    return _parse_ints(values, yyyymmdd_to_dates)
+
+
+def parse_api_weeks(values: Iterable[Union[str, int, float, None]]) -> np.ndarray:
+    """
+    vectorized version of `parse_api_week` returning a datetime64[D] array with NaT for missing values
+    """
+    return _parse_ints(values, epiweeks_to_dates)
+
+
+def parse_api_dates_or_weeks(values: Iterable[Union[str, int, float, None]]) -> np.ndarray:
+    """
+    vectorized version of `parse_api_date_or_week` returning a datetime64[D] array with NaT for missing values
+    """
+    return _parse_ints(values, lambda v: np.where(v < 1000000, epiweeks_to_dates(v), yyyymmdd_to_dates(v)))
+
+
 def fields_to_predicate(fields: Optional[Iterable[str]] = None) -> Callable[[str], bool]:
     if not fields:
         return lambda _: True
@@ -0,0 +1,168 @@
+from asyncio import AbstractEventLoop, Future, get_running_loop, sleep as async_sleep
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from threading import Condition, RLock
+from time import monotonic
+from typing import AsyncIterator, Callable, Dict, Final, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+
+@dataclass
+class _HostState:
+    """
+    token bucket and number of requests in flight of a single host, along with the coroutines waiting for a slot
+    """
+
+    rate: float
+    tokens: float
+    updated: float
+    in_flight: int = 0
+    waiters: List[Tuple[AbstractEventLoop, "Future[None]"]] = field(default_factory=list)
+
+
+def _wake(waiter: "Future[None]") -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+@dataclass
+class RatePermit:
+    """
+    permission to send a single request, the status of its response feeds the adaptive rate
+    """
+
+    status: Optional[int] = None
+
+
+class RateLimiter:
+    """
+    client-side token bucket rate limiter shared by all calls of a context
+
+    limits each host to `rate` requests per second with bursts of up to `burst` requests and, if given,
+    to `max_concurrent` requests in flight. In adaptive mode the rate of a host is halved whenever it
+    responds with 429 Too Many Requests, down to `min_rate`, and increased again by about `increase`
+    requests per second every second while requests succeed, up to `rate`. Time is measured by `clock`.
+    """
+
+    rate: Final[float]
+    burst: Final[float]
+    max_concurrent: Final[Optional[int]]
+    adaptive: Final[bool]
+    min_rate: Final[float]
+    increase: Final[float]
+    _clock: Final[Callable[[], float]]
+    _hosts: Final[Dict[str, _HostState]]
+    _lock: Final[RLock]
+    _slot_freed: Final[Condition]
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        burst: Optional[int] = None,
+        max_concurrent: Optional[int] = None,
+        adaptive: bool = False,
+        min_rate: float = 0.5,
+        increase: float = 1.0,
+        clock: Callable[[], float] = monotonic,
+    ) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = float(burst) if burst else max(1.0, rate)
+        self.max_concurrent = max_concurrent
+        self.adaptive = adaptive
+        self.min_rate = min(min_rate, rate)
+        self.increase = increase
+        self._clock = clock
+        self._hosts = {}
+        self._lock = RLock()
+        self._slot_freed = Condition(self._lock)
+
+    def current_rate(self, url: str) -> float:
+        """
+        current rate of requests per second allowed for the host of the given url
+        """
+        with self._lock:
+            state = self._hosts.get(urlparse(url).netloc)
+            return state.rate if state else self.rate
+
+    def _try_acquire(self, host: str) -> Optional[float]:
+        """
+        takes a token and a slot if available and returns 0, otherwise the number of seconds to wait for a token
+        or None if all slots are taken
+        """
+        with self._lock:
+            now = self._clock()
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = _HostState(self.rate, self.burst, now)
+            state.tokens = min(self.burst, state.tokens + (now - state.updated) * state.rate)
+            state.updated = now
+            if self.max_concurrent is not None and state.in_flight >= self.max_concurrent:
+                return None
+            if state.tokens < 1:
+                return (1 - state.tokens) / state.rate
+            state.tokens -= 1
+            state.in_flight += 1
+            return 0
+
+    def _release(self, host: str, status: Optional[int]) -> None:
+        with self._lock:
+            state = self._hosts[host]
+            state.in_flight -= 1
+            # wakes up everyone waiting for a slot, who try to take it again
+            self._slot_freed.notify_all()
+            waiters, state.waiters = state.waiters, []
+            for loop, waiter in waiters:
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(_wake, waiter)
+            if not self.adaptive or status is None:
+                return
+            if status == 429:
+                state.rate = max(self.min_rate, state.rate / 2)
+                state.tokens = min(state.tokens, 0.0)
+            elif status < 400:
+                state.rate = min(self.rate, state.rate + self.increase / state.rate)
+
+    @contextmanager
+    def limit(self, url: str) -> Iterator[RatePermit]:
+        """
+        blocks until a request to the given url may be sent
+        """
+        host = urlparse(url).netloc
+        with self._slot_freed:
+            wait = self._try_acquire(host)
+            while wait != 0:
+                # returns early once a slot is freed
+                self._slot_freed.wait(wait)
+                wait = self._try_acquire(host)
+        permit = RatePermit()
+        try:
+            yield permit
+        finally:
+            self._release(host, permit.status)
+
+    @asynccontextmanager
+    async def limit_async(self, url: str) -> AsyncIterator[RatePermit]:
+        """
+        waits without blocking the event loop until a request to the given url may be sent
+        """
+        host = urlparse(url).netloc
+        loop = get_running_loop()
+        while True:
+            with self._lock:
+                wait = self._try_acquire(host)
+                if wait is None:
+                    slot_freed: "Future[None]" = loop.create_future()
+                    self._hosts[host].waiters.append((loop, slot_freed))
+            if wait == 0:
+                break
+            if wait is None:
+                await slot_freed
+            else:
+                await async_sleep(wait)
+        permit = RatePermit()
+        try:
+            yield permit
+        finally:
+            self._release(host, permit.status)
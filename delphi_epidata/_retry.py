@@ -0,0 +1,108 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Final, FrozenSet, Optional, Tuple, Type, cast
+
+from tenacity import (
+    AsyncRetrying,
+    RetryCallState,
+    Retrying,
+    retry_if_exception_type,
+    retry_if_result,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+RETRY_STATUSES: Final[FrozenSet[int]] = frozenset({429, 500, 502, 503, 504})
+
+
+def parse_retry_after(value: Optional[str], now: Optional[datetime] = None) -> Optional[float]:
+    """
+    number of seconds to wait according to a `Retry-After` header given either in seconds or as an HTTP date
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        at = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+    return max(0.0, (at - (now or datetime.now(timezone.utc))).total_seconds())
+
+
+def _status(response: Any) -> Optional[int]:
+    # requests and aiohttp name the status code differently
+    status = getattr(response, "status_code", None)
+    return cast(Optional[int], status if status is not None else getattr(response, "status", None))
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    retry policy shared by the sync and async transports
+
+    failed attempts are retried after an exponential backoff with full jitter, starting at `backoff` seconds
+    and capped at `max_wait` seconds. Responses with one of the `retry_statuses` and connection errors are
+    retried, a `Retry-After` header of such a response is honored up to `max_wait` seconds. Once all
+    `max_attempts` are used up, the last response is returned or the last connection error raised.
+    """
+
+    max_attempts: int = 3
+    backoff: float = 0.5
+    max_wait: float = 60.0
+    retry_statuses: FrozenSet[int] = RETRY_STATUSES
+
+    def _should_retry(self, response: Any) -> bool:
+        return _status(response) in self.retry_statuses
+
+    def _wait(self, retry_state: RetryCallState) -> float:
+        wait = wait_random_exponential(multiplier=self.backoff, max=self.max_wait)(retry_state)
+        outcome = retry_state.outcome
+        if outcome is not None and not outcome.failed:
+            headers = getattr(outcome.result(), "headers", None) or {}
+            retry_after = parse_retry_after(headers.get("Retry-After"))
+            if retry_after is not None:
+                wait = max(wait, min(retry_after, self.max_wait))
+        return wait
+
+    @staticmethod
+    def _release(retry_state: RetryCallState) -> None:
+        outcome = retry_state.outcome
+        if outcome is not None and not outcome.failed:
+            outcome.result().close()
+
+    @staticmethod
+    def _last_outcome(retry_state: RetryCallState) -> Any:
+        # returns the last response or raises the last error
+        assert retry_state.outcome is not None
+        return retry_state.outcome.result()
+
+    def _arguments(self, errors: Tuple[Type[BaseException], ...]) -> Any:
+        return dict(
+            stop=stop_after_attempt(self.max_attempts),
+            wait=self._wait,
+            retry=retry_if_exception_type(errors) | retry_if_result(self._should_retry),
+            before_sleep=self._release,
+            retry_error_callback=self._last_outcome,
+        )
+
+    def retrying(self, errors: Tuple[Type[BaseException], ...]) -> Retrying:
+        """
+        tenacity controller retrying the given transport errors
+        """
+        return Retrying(**self._arguments(errors))
+
+    def async_retrying(self, errors: Tuple[Type[BaseException], ...]) -> AsyncRetrying:
+        """
+        asyncio tenacity controller retrying the given transport errors
+        """
+        return AsyncRetrying(**self._arguments(errors))
+
+
+DEFAULT_RETRY_POLICY: Final = RetryPolicy()
+
+NO_RETRY: Final = RetryPolicy(max_attempts=1)
@@ -0,0 +1,81 @@
+from asyncio import AbstractEventLoop, CancelledError, Future as AsyncFuture, get_running_loop, shield
+from concurrent.futures import Future
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Final, Hashable, Tuple, TypeVar, cast
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    coalesces identical concurrent requests, such that only the first one is executed
+    and all others waiting for it share its result or error
+
+    works for threads via `do` and for coroutines of the same event loop via `do_async`. If the leading
+    coroutine is cancelled, a waiting one runs the request instead.
+    Nothing is kept once a request finished, use an `EpiDataCache` to reuse results later on.
+    """
+
+    _lock: Final[Lock]
+    _calls: Final[Dict[Hashable, "Future[Any]"]]
+    _tasks: Final[Dict[Tuple[AbstractEventLoop, Hashable], "AsyncFuture[Any]"]]
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._calls = {}
+        self._tasks = {}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """
+        runs the given function unless a call with the same key is in flight, whose result is returned
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if future is None:
+                future = self._calls[key] = Future()
+        if not leader:
+            return cast(T, future.result())
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        awaits the given coroutine function unless a call with the same key is in flight, whose result is returned
+        """
+        loop = get_running_loop()
+        loop_key = (loop, key)
+        future = self._tasks.get(loop_key)
+        while future is not None:
+            try:
+                # shielded such that a cancelled follower does not cancel the shared call
+                return cast(T, await shield(future))
+            except CancelledError:
+                if not future.cancelled():
+                    # this follower was cancelled itself
+                    raise
+            # the leader was cancelled, the first follower to resume takes over
+            future = self._tasks.get(loop_key)
+        future = self._tasks[loop_key] = loop.create_future()
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result
+        except CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # mark the error as retrieved in case no one else is waiting for it
+            future.exception()
+            raise
+        finally:
+            del self._tasks[loop_key]
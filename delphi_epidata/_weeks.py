@@ -0,0 +1,107 @@
+from typing import Final, Iterable, Union, cast
+
+import numpy as np
+
+# proleptic Gregorian ordinal (`date.toordinal`) of 1970-01-01, the epoch of datetime64
+EPOCH_ORDINAL: Final = 719163
+
+ArrayLike = Union[np.ndarray, Iterable[int]]
+
+
+def _epiweek_one_starts(years: np.ndarray) -> np.ndarray:
+    """
+    start dates (Sundays) of the first epiweek of the given years
+    """
+    jan1 = (np.asarray(years, dtype=np.int64) - 1970).astype("datetime64[Y]").astype("datetime64[D]")
+    # 0 = Sunday, 1970-01-01 was a Thursday
+    weekday = (jan1.astype(np.int64) + 4) % 7
+    # the first epiweek is the first week (starting on Sunday) with at least four days in the year
+    return cast(
+        np.ndarray, jan1 - weekday.astype("timedelta64[D]") + np.where(weekday > 3, 7, 0).astype("timedelta64[D]")
+    )
+
+
+def week_start_dates(years: ArrayLike, weeks: ArrayLike) -> np.ndarray:
+    """
+    start dates (Sundays) of the given epiweek years and week numbers as datetime64[D] array
+    """
+    weeks = np.asarray(weeks, dtype=np.int64)
+    return cast(np.ndarray, _epiweek_one_starts(np.asarray(years)) + ((weeks - 1) * 7).astype("timedelta64[D]"))
+
+
+def epiweeks_to_dates(epiweeks: ArrayLike) -> np.ndarray:
+    """
+    start dates of the given YYYYWW epiweeks as datetime64[D] array, NaT for invalid ones like week 53 of 2021
+    """
+    v = np.asarray(epiweeks, dtype=np.int64)
+    r = week_start_dates(v // 100, v % 100)
+    # out of range weeks roll over into another year, which converting them back reveals
+    r[dates_to_epiweeks(r) != v] = np.datetime64("NaT")
+    return r
+
+
+def dates_to_epiweeks(dates: np.ndarray) -> np.ndarray:
+    """
+    YYYYWW epiweeks containing the given datetime64 dates as int64 array
+    """
+    days = np.asarray(dates, dtype="datetime64[D]")
+    sundays = days - ((days.astype(np.int64) + 4) % 7).astype("timedelta64[D]")
+    # an epiweek belongs to the year its Wednesday falls into
+    years = (sundays + np.timedelta64(3, "D")).astype("datetime64[Y]").astype(np.int64) + 1970
+    weeks = (sundays - _epiweek_one_starts(years)).astype(np.int64) // 7 + 1
+    return cast(np.ndarray, years * 100 + weeks)
+
+
+def yyyymmdd_to_dates(values: ArrayLike) -> np.ndarray:
+    """
+    YYYYMMDD integers as datetime64[D] array, NaT for invalid ones like 20210231
+    """
+    v = np.asarray(values, dtype=np.int64)
+    months_since_epoch = (v // 10000 - 1970) * 12 + v // 100 % 100 - 1
+    first_of_month = months_since_epoch.astype("datetime64[M]").astype("datetime64[D]")
+    r = cast(np.ndarray, first_of_month + (v % 100 - 1).astype("timedelta64[D]"))
+    # out of range months and days roll over into the following ones, which converting them back reveals
+    r[dates_to_yyyymmdd(r) != v] = np.datetime64("NaT")
+    return r
+
+
+def dates_to_yyyymmdd(dates: np.ndarray) -> np.ndarray:
+    """
+    datetime64 dates as YYYYMMDD int64 array
+    """
+    days = np.asarray(dates, dtype="datetime64[D]")
+    months = days.astype("datetime64[M]")
+    years = months.astype("datetime64[Y]")
+    month = (months - years).astype(np.int64) + 1
+    day = (days - months).astype(np.int64) + 1
+    return cast(np.ndarray, (years.astype(np.int64) + 1970) * 10000 + month * 100 + day)
+
+
+def to_ordinals(dates: np.ndarray) -> np.ndarray:
+    """
+    datetime64 dates as proleptic Gregorian ordinals, matching `date.toordinal`
+    """
+    return cast(np.ndarray, np.asarray(dates, dtype="datetime64[D]").astype(np.int64) + EPOCH_ORDINAL)
+
+
+def from_ordinals(ordinals: ArrayLike) -> np.ndarray:
+    """
+    proleptic Gregorian ordinals as datetime64[D] array
+    """
+    return (np.asarray(ordinals, dtype=np.int64) - EPOCH_ORDINAL).astype("datetime64[D]")
+
+
+def epiweek_range(start: int, end: int) -> np.ndarray:
+    """
+    all YYYYWW epiweeks from start to end inclusive as int64 array
+    """
+    first, last = epiweeks_to_dates([start, end])
+    return dates_to_epiweeks(np.arange(first, last + np.timedelta64(1, "D"), 7))
+
+
+def date_range(start: int, end: int) -> np.ndarray:
+    """
+    all YYYYMMDD dates from start to end inclusive as int64 array
+    """
+    first, last = yyyymmdd_to_dates([start, end])
+    return dates_to_yyyymmdd(np.arange(first, last + np.timedelta64(1, "D")))
@@ -1,8 +1,12 @@
 from datetime import date
+from pathlib import Path
 from typing import (
+    TYPE_CHECKING,
+    Any,
     AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
     Callable,
-    Coroutine,
     Dict,
     Final,
     Iterable,
@@ -10,14 +14,26 @@ from typing import (
     Mapping,
     Optional,
     Sequence,
+    Set,
+    Tuple,
+    TypeVar,
     Union,
     cast,
 )
 from json import loads
 
-from asyncio import get_event_loop, gather
-from aiohttp import TCPConnector, ClientSession, ClientResponse
-from pandas import DataFrame
+from asyncio import (
+    FIRST_COMPLETED,
+    Future,
+    TimeoutError as AsyncTimeoutError,
+    ensure_future,
+    gather,
+    get_running_loop,
+    run,
+    wait,
+)
+from aiohttp import TCPConnector, ClientConnectionError, ClientPayloadError, ClientSession, ClientResponse
+from pandas import DataFrame, concat
 
 from ._model import (
     EpiRangeLike,
@@ -28,26 +44,125 @@ from ._model import (
     EpidataFieldInfo,
     OnlySupportsClassicFormatException,
     add_endpoint_to_url,
+    empty_response_body,
+    is_url_too_long,
 )
+from ._arrow import concat_arrow, csv_as_arrow, write_parquet
+from ._cache import CovidcastRangePlan, EpiDataCache, reports_success
+from ._rate_limit import RateLimiter
+from ._single_flight import SingleFlight
+from ._retry import DEFAULT_RETRY_POLICY, NO_RETRY, RetryPolicy
 from ._endpoints import AEpiDataEndpoints
-from ._constants import HTTP_HEADERS, BASE_URL
-from ._covidcast import CovidcastDataSources, define_covidcast_fields
+from ._constants import HTTP_HEADERS, BASE_URL, DEFAULT_BATCH_ROWS, MAX_URL_LENGTH, STREAM_CHUNK_SIZE
+from ._parse import fields_to_predicate
+from ._covidcast import (
+    CovidcastDataSources,
+    CovidcastMetaIndex,
+    covidcast_num_locations,
+    define_covidcast_fields,
+    fields_with_signal,
+    merge_covidcast_calls,
+    pick_covidcast_df,
+    pick_covidcast_rows,
+    prune_covidcast_params,
+)
+
+if TYPE_CHECKING:
+    import pyarrow
+
+T = TypeVar("T")
+
+# errors of a request that are worth retrying
+_TRANSIENT_ERRORS: Final = (ClientConnectionError, ClientPayloadError, AsyncTimeoutError)
 
 
 async def _async_request(
-    url: str, params: Mapping[str, str], session: Optional[ClientSession] = None
+    url: str,
+    params: Mapping[str, str],
+    session: Optional[ClientSession] = None,
+    retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+    rate_limiter: Optional[RateLimiter] = None,
+    max_url_length: int = MAX_URL_LENGTH,
+    headers: Optional[Mapping[str, str]] = None,
 ) -> ClientResponse:
-    async def call_impl(s: ClientSession) -> ClientResponse:
-        res = await s.get(url, params=params, headers=HTTP_HEADERS)
+    post = is_url_too_long(url, params, max_url_length)
+    all_headers = {**HTTP_HEADERS, **headers} if headers else HTTP_HEADERS
+
+    async def send(s: ClientSession) -> ClientResponse:
+        if post:
+            return await s.post(url, data=params, headers=all_headers)
+        res = await s.get(url, params=params, headers=all_headers)
         if res.status == 414:
-            return await s.post(url, params=params, headers=HTTP_HEADERS)
+            res.release()
+            return await s.post(url, data=params, headers=all_headers)
         return res
 
-    if session:
-        return await call_impl(session)
+    async def call_impl(s: ClientSession) -> ClientResponse:
+        if rate_limiter is None:
+            return await send(s)
+        async with rate_limiter.limit_async(url) as permit:
+            res = await send(s)
+            permit.status = res.status
+            return res
+
+    async def request() -> ClientResponse:
+        if session:
+            return await call_impl(session)
+        async with ClientSession() as s:
+            return await call_impl(s)
+
+    return cast(ClientResponse, await retry_policy.async_retrying(_TRANSIENT_ERRORS)(request))
+
+
+async def _in_thread(fn: Callable[..., T], *args: Any) -> T:
+    """
+    runs a blocking function, e.g. reading or writing the cache, in the default executor instead of the event loop
+    """
+    return await get_running_loop().run_in_executor(None, fn, *args)
+
+
+class _CachedClientResponse:
+    """
+    stand-in for a successful client response whose body was served from the cache
+    """
+
+    status: Final = 200
+
+    def __init__(self, body: bytes) -> None:
+        self._body = body
+
+    def raise_for_status(self) -> None:
+        pass
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self) -> str:
+        return self._body.decode("utf-8")
+
+    async def json(self) -> Any:
+        return loads(self._body)
+
+    @property
+    def content(self) -> "_CachedContent":
+        return _CachedContent(self._body)
+
+
+class _CachedContent:
+    """
+    stand-in for the content stream of a cached response
+    """
+
+    def __init__(self, body: bytes) -> None:
+        self._body = body
 
-    async with ClientSession() as s:
-        return await call_impl(s)
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for line in self._body.splitlines(keepends=True):
+            yield line
+
+    async def iter_chunked(self, n: int) -> AsyncIterator[bytes]:
+        for i in range(0, len(self._body), n):
+            yield self._body[i : i + n]
 
 
 class EpiDataAsyncCall(AEpiDataCall):
@@ -56,6 +171,14 @@ class EpiDataAsyncCall(AEpiDataCall):
     """
 
     _session: Final[Optional[ClientSession]]
+    _cache: Final[Optional[EpiDataCache]]
+    _max_rows: Final[Optional[int]]
+    _covidcast_meta: Final[Optional[CovidcastMetaIndex]]
+    _retry_policy: Final[RetryPolicy]
+    _rate_limiter: Final[Optional[RateLimiter]]
+    _single_flight: Final[Optional[SingleFlight]]
+    _max_url_length: Final[int]
+    _prune: Final[bool]
 
     def __init__(
         self,
@@ -65,23 +188,141 @@ class EpiDataAsyncCall(AEpiDataCall):
         params: Mapping[str, Union[None, EpiRangeLike, Iterable[EpiRangeLike]]],
         meta: Optional[Sequence[EpidataFieldInfo]] = None,
         only_supports_classic: bool = False,
+        cache: Optional[EpiDataCache] = None,
+        max_rows: Optional[int] = None,
+        covidcast_meta: Optional[CovidcastMetaIndex] = None,
+        retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+        rate_limiter: Optional[RateLimiter] = None,
+        single_flight: Optional[SingleFlight] = None,
+        max_url_length: int = MAX_URL_LENGTH,
+        prune: bool = False,
     ) -> None:
         super().__init__(base_url, endpoint, params, meta, only_supports_classic)
         self._session = session
+        self._cache = cache
+        self._max_rows = max_rows
+        self._covidcast_meta = covidcast_meta
+        self._retry_policy = retry_policy
+        self._rate_limiter = rate_limiter
+        self._single_flight = single_flight
+        self._max_url_length = max_url_length
+        self._prune = prune
+
+    def _replace(self, **changes: Any) -> "EpiDataAsyncCall":
+        args: Dict[str, Any] = dict(
+            base_url=self._base_url,
+            session=self._session,
+            endpoint=self._endpoint,
+            params=self._params,
+            meta=self.meta,
+            only_supports_classic=self.only_supports_classic,
+            cache=self._cache,
+            max_rows=self._max_rows,
+            covidcast_meta=self._covidcast_meta,
+            retry_policy=self._retry_policy,
+            rate_limiter=self._rate_limiter,
+            single_flight=self._single_flight,
+            max_url_length=self._max_url_length,
+            prune=self._prune,
+        )
+        args.update(changes)
+        return EpiDataAsyncCall(**args)
 
     def with_base_url(self, base_url: str) -> "EpiDataAsyncCall":
-        return EpiDataAsyncCall(base_url, self._session, self._endpoint, self._params)
+        return self._replace(base_url=base_url)
 
     def with_session(self, session: ClientSession) -> "EpiDataAsyncCall":
-        return EpiDataAsyncCall(self._base_url, session, self._endpoint, self._params)
+        return self._replace(session=session)
+
+    def with_cache(self, cache: Optional[EpiDataCache]) -> "EpiDataAsyncCall":
+        return self._replace(cache=cache)
+
+    def with_retry_policy(self, retry_policy: RetryPolicy) -> "EpiDataAsyncCall":
+        return self._replace(retry_policy=retry_policy)
+
+    def with_rate_limiter(self, rate_limiter: Optional[RateLimiter]) -> "EpiDataAsyncCall":
+        return self._replace(rate_limiter=rate_limiter)
+
+    def with_single_flight(self, single_flight: Optional[SingleFlight]) -> "EpiDataAsyncCall":
+        return self._replace(single_flight=single_flight)
+
+    def with_max_url_length(self, max_url_length: int) -> "EpiDataAsyncCall":
+        return self._replace(max_url_length=max_url_length)
+
+    def with_max_rows(
+        self, max_rows: Optional[int], covidcast_meta: Optional[CovidcastMetaIndex] = None
+    ) -> "EpiDataAsyncCall":
+        return self._replace(max_rows=max_rows, covidcast_meta=covidcast_meta or self._covidcast_meta)
+
+    def with_pruning(
+        self, prune: bool = True, covidcast_meta: Optional[CovidcastMetaIndex] = None
+    ) -> "EpiDataAsyncCall":
+        return self._replace(prune=prune, covidcast_meta=covidcast_meta or self._covidcast_meta)
+
+    def _with_params(
+        self, params: Mapping[str, Union[None, EpiRangeLike, Iterable[EpiRangeLike]]]
+    ) -> "EpiDataAsyncCall":
+        return self._replace(params=params)
+
+    def _pruned(self) -> Optional["EpiDataAsyncCall"]:
+        """
+        this call restricted to what the covidcast metadata says is available, None if nothing is
+        """
+        if not self._prune or not self._covidcast_meta or self._endpoint.strip("/") != "covidcast":
+            return self
+        params = prune_covidcast_params(self._params, self._covidcast_meta)
+        if params is None or params is self._params:
+            return None if params is None else self
+        return self._with_params(params)
+
+    def _split_calls(self) -> List["EpiDataAsyncCall"]:
+        call = self._pruned()
+        if not self._max_rows or call is None:
+            # a call with nothing left to request is answered by `_call` without a request
+            return [self]
+        # pylint: disable=protected-access
+        num_locations = covidcast_num_locations(call._formatted_paramters(), self._covidcast_meta)
+        return call.split(self._max_rows, num_locations)
+
+    async def _request(self, url: str, params: Mapping[str, str]) -> ClientResponse:
+        return await _async_request(
+            url, params, self._session, self._retry_policy, self._rate_limiter, self._max_url_length
+        )
 
     async def _call(
         self,
         format_type: Optional[EpiDataFormatType] = None,
         fields: Optional[Iterable[str]] = None,
     ) -> ClientResponse:
-        url, params = self.request_arguments(format_type, fields)
-        return await _async_request(url, params, self._session)
+        call = self._pruned()
+        if call is None:
+            # according to the covidcast metadata there is nothing to request
+            return cast(ClientResponse, _CachedClientResponse(empty_response_body(format_type)))
+        url, params = call.request_arguments(format_type, fields)
+        if format_type == EpiDataFormatType.jsonl:
+            # streamed responses are consumed line by line and can neither be cached nor shared
+            return await self._request(url, params)
+        if self._single_flight:
+            return await self._single_flight.do_async((url, *sorted(params.items())), lambda: self._fetch(url, params))
+        return await self._fetch(url, params)
+
+    async def _fetch(self, url: str, params: Mapping[str, str]) -> ClientResponse:
+        if not self._cache:
+            res = await self._request(url, params)
+            if self._single_flight:
+                # read the body while the response is shared by all waiting callers
+                await res.read()
+            return res
+        key = self._cache.key(url, params)
+        body = await _in_thread(self._cache.get, key)
+        if body is not None:
+            return cast(ClientResponse, _CachedClientResponse(body))
+        res = await self._request(url, params)
+        if res.status == 200:
+            body = await res.read()
+            if reports_success(body):
+                await _in_thread(self._cache.put, key, body, self.is_immutable())
+        return res
 
     async def classic(
         self, fields: Optional[Iterable[str]] = None, disable_date_parsing: Optional[bool] = False
@@ -93,7 +334,8 @@ class EpiDataAsyncCall(AEpiDataCall):
             r = cast(EpiDataResponse, await response.json())
             epidata = r.get("epidata")
             if epidata and isinstance(epidata, list) and len(epidata) > 0 and isinstance(epidata[0], dict):
-                r["epidata"] = [self._parse_row(row, disable_date_parsing=disable_date_parsing) for row in epidata]
+                parse_row = self._row_parser(disable_date_parsing)
+                r["epidata"] = [parse_row(row) for row in epidata]
             return r
         except Exception as e:  # pylint: disable=broad-except
             return {"result": 0, "message": f"error: {e}", "epidata": []}
@@ -108,26 +350,117 @@ class EpiDataAsyncCall(AEpiDataCall):
         self, fields: Optional[Iterable[str]] = None, disable_date_parsing: Optional[bool] = False
     ) -> List[Mapping[str, Union[str, int, float, date, None]]]:
         """Request and parse epidata in JSON format"""
+        if self._single_flight:
+            url, params = self.request_arguments(EpiDataFormatType.json, fields)
+            key = ("json", url, *sorted(params.items()), disable_date_parsing)
+            rows = await self._single_flight.do_async(key, lambda: self._json(fields, disable_date_parsing))
+            # copies of the shared rows, whose values are immutable
+            return [dict(row) for row in rows]
+        return await self._json(fields, disable_date_parsing)
+
+    async def _json(
+        self, fields: Optional[Iterable[str]] = None, disable_date_parsing: Optional[bool] = False
+    ) -> List[Mapping[str, Union[str, int, float, date, None]]]:
         self._verify_parameters()
         if self.only_supports_classic:
             raise OnlySupportsClassicFormatException()
+        chunks = self._split_calls()
+        if len(chunks) > 1:
+            # pylint: disable=protected-access
+            results = await gather(*(chunk._json(fields, disable_date_parsing) for chunk in chunks))
+            return [row for rows in results for row in rows]
+        plan = None
+        if self._cache and self._cache.covidcast_ranges:
+            plan = await _in_thread(CovidcastRangePlan.create, self, self._cache)
+        if plan:
+            return await self._range_cached_json(plan, fields, disable_date_parsing)
         response = await self._call(EpiDataFormatType.json, fields)
         response.raise_for_status()
-        return [
-            self._parse_row(row, disable_date_parsing)
-            for row in cast(List[Mapping[str, Union[str, int, float, None]]], await response.json())
-        ]
+        parse_row = self._row_parser(disable_date_parsing)
+        return [parse_row(row) for row in cast(List[Mapping[str, Union[str, int, float, None]]], await response.json())]
+
+    async def _range_cached_json(
+        self, plan: CovidcastRangePlan, fields: Optional[Iterable[str]], disable_date_parsing: Optional[bool]
+    ) -> List[Mapping[str, Union[str, int, float, date, None]]]:
+        """Fetch only the time ranges missing in the cache and stitch them with the cached rows"""
+        for gap, params in plan.gap_params(self):
+            rows = await self._with_params(params).with_cache(None).json(disable_date_parsing=True)
+            await _in_thread(plan.store, gap, rows)
+        pred = fields_to_predicate(fields)
+        parse_row = self._row_parser(disable_date_parsing)
+        return [parse_row({k: v for k, v in row.items() if pred(k)}) for row in await _in_thread(plan.rows)]
 
     async def df(
-        self, fields: Optional[Iterable[str]] = None, disable_date_parsing: Optional[bool] = False
+        self,
+        fields: Optional[Iterable[str]] = None,
+        disable_date_parsing: Optional[bool] = False,
+        use_csv: bool = False,
+    ) -> DataFrame:
+        """Request and parse epidata as a pandas data frame
+
+        with `use_csv` the data is requested in CSV format and read directly into the data frame
+        without creating intermediate rows, unless the covidcast range cache is used
+        """
+        if self._single_flight:
+            url, params = self.request_arguments(EpiDataFormatType.csv if use_csv else None, fields)
+            key = ("df", url, *sorted(params.items()), disable_date_parsing)
+            # shallow copies, such that adding or replacing columns does not affect the other callers
+            df = await self._single_flight.do_async(key, lambda: self._df(fields, disable_date_parsing, use_csv))
+            return df.copy(deep=False)
+        return await self._df(fields, disable_date_parsing, use_csv)
+
+    async def _df(
+        self,
+        fields: Optional[Iterable[str]] = None,
+        disable_date_parsing: Optional[bool] = False,
+        use_csv: bool = False,
     ) -> DataFrame:
-        """Request and parse epidata as a pandas data frame"""
         self._verify_parameters()
         if self.only_supports_classic:
             raise OnlySupportsClassicFormatException()
-        r = await self.json(fields, disable_date_parsing=disable_date_parsing)
+        if use_csv and not (self._cache and self._cache.covidcast_ranges):
+            chunks = self._split_calls()
+            if len(chunks) > 1:
+                # pylint: disable=protected-access
+                dfs = await gather(*(chunk._df(fields, disable_date_parsing, use_csv=True) for chunk in chunks))
+                return concat(dfs, ignore_index=True)
+            response = await self._call(EpiDataFormatType.csv, fields)
+            response.raise_for_status()
+            return self._csv_as_df(await response.read(), fields, disable_date_parsing=disable_date_parsing)
+        # dates are converted column-wise when building the data frame
+        r = await self._json(fields, disable_date_parsing=True)
         return self._as_df(r, fields, disable_date_parsing)
 
+    async def arrow(
+        self,
+        fields: Optional[Iterable[str]] = None,
+        disable_date_parsing: Optional[bool] = False,
+    ) -> "pyarrow.Table":
+        """Request epidata in CSV format and read it directly into an Arrow table
+
+        the schema is derived from the field infos, requires pyarrow
+        """
+        self._verify_parameters()
+        if self.only_supports_classic:
+            raise OnlySupportsClassicFormatException()
+        chunks = self._split_calls()
+        if len(chunks) > 1:
+            tables = await gather(*(chunk.arrow(fields, disable_date_parsing) for chunk in chunks))
+            return concat_arrow(tables)
+        response = await self._call(EpiDataFormatType.csv, fields)
+        response.raise_for_status()
+        return csv_as_arrow(await response.read(), self.meta, fields, disable_date_parsing)
+
+    async def to_parquet(
+        self,
+        path: Union[str, Path],
+        fields: Optional[Iterable[str]] = None,
+        disable_date_parsing: Optional[bool] = False,
+    ) -> None:
+        """Request epidata and write it as a Parquet file, requires pyarrow"""
+        table = await self.arrow(fields, disable_date_parsing)
+        write_parquet(table, path)
+
     async def csv(self, fields: Optional[Iterable[str]] = None) -> str:
         """Request and parse epidata in CSV format"""
         self._verify_parameters()
@@ -144,10 +477,52 @@ class EpiDataAsyncCall(AEpiDataCall):
         self._verify_parameters()
         if self.only_supports_classic:
             raise OnlySupportsClassicFormatException()
+        chunks = self._split_calls()
+        if len(chunks) > 1:
+            for chunk in chunks:
+                async for row in chunk.iter(fields, disable_date_parsing=disable_date_parsing):
+                    yield row
+            return
         response = await self._call(EpiDataFormatType.jsonl, fields)
         response.raise_for_status()
+        parse_row = self._row_parser(disable_date_parsing)
         async for line in response.content:
-            yield self._parse_row(loads(line), disable_date_parsing=disable_date_parsing)
+            yield parse_row(loads(line))
+
+    async def iter_batches(
+        self,
+        fields: Optional[Iterable[str]] = None,
+        disable_date_parsing: Optional[bool] = False,
+        batch_rows: int = DEFAULT_BATCH_ROWS,
+    ) -> AsyncGenerator[DataFrame, None]:
+        """Request and streams epidata as typed data frames of at most `batch_rows` rows
+
+        each batch is parsed at once and converted column-wise, such that large requests
+        can be processed in constant memory
+        """
+        self._verify_parameters()
+        if self.only_supports_classic:
+            raise OnlySupportsClassicFormatException()
+        chunks = self._split_calls()
+        if len(chunks) > 1:
+            for chunk in chunks:
+                async for df in chunk.iter_batches(fields, disable_date_parsing, batch_rows):
+                    yield df
+            return
+        response = await self._call(EpiDataFormatType.jsonl, fields)
+        response.raise_for_status()
+        batch: List[bytes] = []
+        pending = b""
+        async for data in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+            *lines, pending = (pending + data).split(b"\n")
+            batch.extend(line for line in lines if line.strip())
+            while len(batch) >= batch_rows:
+                yield self._jsonl_as_df(batch[:batch_rows], fields, disable_date_parsing)
+                batch = batch[batch_rows:]
+        if pending.strip():
+            batch.append(pending)
+        if batch:
+            yield self._jsonl_as_df(batch, fields, disable_date_parsing)
 
     async def __(self) -> AsyncGenerator[Mapping[str, Union[str, int, float, date, None]], None]:
         return self.iter()
@@ -160,17 +535,106 @@ class EpiDataAsyncContext(AEpiDataEndpoints[EpiDataAsyncCall]):
 
     _base_url: Final[str]
     _session: Final[Optional[ClientSession]]
+    _cache: Final[Optional[EpiDataCache]]
+    _max_rows: Final[Optional[int]]
+    _covidcast_meta: Final[Optional[CovidcastMetaIndex]]
+    _retry_policy: Final[RetryPolicy]
+    _rate_limiter: Final[Optional[RateLimiter]]
+    _single_flight: Final[Optional[SingleFlight]]
+    _max_url_length: Final[int]
+    _prune: Final[bool]
 
-    def __init__(self, base_url: str = BASE_URL, session: Optional[ClientSession] = None) -> None:
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        session: Optional[ClientSession] = None,
+        cache: Optional[EpiDataCache] = None,
+        max_rows: Optional[int] = None,
+        covidcast_meta: Optional[CovidcastMetaIndex] = None,
+        retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+        rate_limiter: Optional[RateLimiter] = None,
+        single_flight: Optional[SingleFlight] = None,
+        max_url_length: int = MAX_URL_LENGTH,
+        prune: bool = False,
+    ) -> None:
         super().__init__()
         self._base_url = base_url
         self._session = session
+        self._cache = cache
+        self._max_rows = max_rows
+        self._covidcast_meta = covidcast_meta
+        self._retry_policy = retry_policy
+        self._rate_limiter = rate_limiter
+        self._single_flight = single_flight
+        self._max_url_length = max_url_length
+        self._prune = prune
+
+    def _replace(self, **changes: Any) -> "EpiDataAsyncContext":
+        args: Dict[str, Any] = dict(
+            base_url=self._base_url,
+            session=self._session,
+            cache=self._cache,
+            max_rows=self._max_rows,
+            covidcast_meta=self._covidcast_meta,
+            retry_policy=self._retry_policy,
+            rate_limiter=self._rate_limiter,
+            single_flight=self._single_flight,
+            max_url_length=self._max_url_length,
+            prune=self._prune,
+        )
+        args.update(changes)
+        return EpiDataAsyncContext(**args)
 
     def with_base_url(self, base_url: str) -> "EpiDataAsyncContext":
-        return EpiDataAsyncContext(base_url, self._session)
+        return self._replace(base_url=base_url)
 
     def with_session(self, session: ClientSession) -> "EpiDataAsyncContext":
-        return EpiDataAsyncContext(self._base_url, session)
+        return self._replace(session=session)
+
+    def with_cache(self, cache: Optional[EpiDataCache]) -> "EpiDataAsyncContext":
+        return self._replace(cache=cache)
+
+    def with_retry_policy(self, retry_policy: RetryPolicy) -> "EpiDataAsyncContext":
+        """
+        retries transient failures of the requests according to the given policy, use `NO_RETRY` to disable retries
+        """
+        return self._replace(retry_policy=retry_policy)
+
+    def with_rate_limiter(self, rate_limiter: Optional[RateLimiter]) -> "EpiDataAsyncContext":
+        """
+        passes every request through the given rate limiter, which may be shared with other contexts
+        """
+        return self._replace(rate_limiter=rate_limiter)
+
+    def with_single_flight(self, single_flight: Optional[SingleFlight]) -> "EpiDataAsyncContext":
+        """
+        coalesces identical concurrent requests of all calls sharing the given single flight into one
+        """
+        return self._replace(single_flight=single_flight)
+
+    def with_max_url_length(self, max_url_length: int) -> "EpiDataAsyncContext":
+        """
+        sends requests whose encoded URL would exceed the given length as POST with the parameters in the body
+        """
+        return self._replace(max_url_length=max_url_length)
+
+    def with_max_rows(
+        self, max_rows: Optional[int], covidcast_meta: Optional[CovidcastMetaIndex] = None
+    ) -> "EpiDataAsyncContext":
+        """
+        splits calls estimated to return more than `max_rows` rows into multiple requests,
+        using the number of locations from the given `covidcast_meta` rows for `*` geo values
+        """
+        return self._replace(max_rows=max_rows, covidcast_meta=covidcast_meta or self._covidcast_meta)
+
+    def with_pruning(
+        self, prune: bool = True, covidcast_meta: Optional[CovidcastMetaIndex] = None
+    ) -> "EpiDataAsyncContext":
+        """
+        restricts covidcast calls to the signals available at their geo type and to the time range with data
+        according to the given `covidcast_meta` rows, calls with nothing left return an empty result right away
+        """
+        return self._replace(prune=prune, covidcast_meta=covidcast_meta or self._covidcast_meta)
 
     def _create_call(
         self,
@@ -179,84 +643,217 @@ class EpiDataAsyncContext(AEpiDataEndpoints[EpiDataAsyncCall]):
         meta: Optional[Sequence[EpidataFieldInfo]] = None,
         only_supports_classic: bool = False,
     ) -> EpiDataAsyncCall:
-        return EpiDataAsyncCall(self._base_url, self._session, endpoint, params, meta, only_supports_classic)
+        return EpiDataAsyncCall(
+            self._base_url,
+            self._session,
+            endpoint,
+            params,
+            meta,
+            only_supports_classic,
+            self._cache,
+            self._max_rows,
+            self._covidcast_meta,
+            self._retry_policy,
+            self._rate_limiter,
+            self._single_flight,
+            self._max_url_length,
+            self._prune,
+        )
 
     @staticmethod
-    def all(
+    async def stream(
+        calls: Iterable[EpiDataAsyncCall],
+        call_api: Callable[[EpiDataAsyncCall, ClientSession], Awaitable[T]],
+        batch_size: int = 50,
+    ) -> AsyncGenerator[Tuple[int, Union[T, Exception]], None]:
+        """
+        runs the given calls with at most `batch_size` of them in flight and yields (index, result) as they complete
+
+        calls are consumed lazily from the given iterable and a failing call yields its exception instead of a result
+        """
+
+        async def run_call(index: int, call: EpiDataAsyncCall) -> Tuple[int, Union[T, Exception]]:
+            try:
+                return index, await call_api(call, session)
+            except Exception as e:  # pylint: disable=broad-except
+                return index, e
+
+        async with ClientSession(connector=TCPConnector(limit=batch_size)) as session:
+            pending: Set["Future[Tuple[int, Union[T, Exception]]]"] = set()
+            try:
+                for index, call in enumerate(calls):
+                    if len(pending) >= batch_size:
+                        done, pending = await wait(pending, return_when=FIRST_COMPLETED)
+                        for task in done:
+                            yield task.result()
+                    pending.add(ensure_future(run_call(index, call)))
+                while pending:
+                    done, pending = await wait(pending, return_when=FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+            finally:
+                for task in pending:
+                    task.cancel()
+                # wait for the cancelled calls to release their connections before the session is closed
+                await gather(*pending, return_exceptions=True)
+
+    @staticmethod
+    async def all_async(
         calls: Iterable[EpiDataAsyncCall],
-        call_api: Callable[[EpiDataAsyncCall, ClientSession], Coroutine],
+        call_api: Callable[[EpiDataAsyncCall, ClientSession], Awaitable[T]],
         batch_size: int = 50,
-    ) -> List:
-        loop = get_event_loop()
+        return_exceptions: bool = False,
+    ) -> List[Union[T, Exception]]:
+        """
+        runs the given calls with at most `batch_size` of them in flight and returns their results in order
+
+        the first failing call raises its exception, unless `return_exceptions` is set, in which case it is returned
+        in place of the result
+        """
+        results: Dict[int, Union[T, Exception]] = {}
+        streamed = EpiDataAsyncContext.stream(calls, call_api, batch_size)
+        try:
+            async for index, result in streamed:
+                if isinstance(result, Exception) and not return_exceptions:
+                    raise result
+                results[index] = result
+        finally:
+            # cancels the calls still in flight
+            await streamed.aclose()
+        return [results[i] for i in range(len(results))]
 
-        async def impl() -> List:
-            tasks: List[Coroutine] = []
-            connector = TCPConnector(limit=batch_size)
-            async with ClientSession(connector=connector) as session:
-                for call in calls:
-                    co_routine = call_api(call, session)
-                    tasks.append(co_routine)
-                return list(await gather(*tasks))
+    @staticmethod
+    def all(
+        calls: Iterable[EpiDataAsyncCall],
+        call_api: Callable[[EpiDataAsyncCall, ClientSession], Awaitable[T]],
+        batch_size: int = 50,
+        return_exceptions: bool = False,
+    ) -> List[Union[T, Exception]]:
+        """
+        runs the given calls in a new event loop and returns their results in order
 
-        future = impl()
-        return loop.run_until_complete(future)
+        the first failing call raises its exception, unless `return_exceptions` is set, in which case it is returned
+        in place of the result. Within a running event loop use `all_async` instead.
+        """
+        try:
+            get_running_loop()
+        except RuntimeError:
+            return run(EpiDataAsyncContext.all_async(calls, call_api, batch_size, return_exceptions))
+        raise RuntimeError("all cannot be called from a running event loop, await all_async instead")
 
     def all_classic(
         self,
         calls: Iterable[EpiDataAsyncCall],
         fields: Optional[Iterable[str]] = None,
         batch_size: int = 50,
-    ) -> List[EpiDataResponse]:
+        return_exceptions: bool = False,
+    ) -> List[Union[EpiDataResponse, Exception]]:
         """
         runs the given calls in a batch asynchronously and return their responses
         """
 
-        def call_api(call: EpiDataAsyncCall, session: ClientSession) -> Coroutine:
+        def call_api(call: EpiDataAsyncCall, session: ClientSession) -> Awaitable[EpiDataResponse]:
             return call.with_session(session).classic(fields)
 
-        return self.all(calls, call_api, batch_size)
+        return self.all(calls, call_api, batch_size, return_exceptions)
 
     def all_json(
         self,
         calls: Iterable[EpiDataAsyncCall],
         fields: Optional[Iterable[str]] = None,
         batch_size: int = 50,
-    ) -> List[List[Dict]]:
+        merge_signals: bool = False,
+        return_exceptions: bool = False,
+    ) -> List[Union[List[Dict[str, Any]], Exception]]:
         """
         runs the given calls in a batch asynchronously and return their responses
+
+        with `merge_signals` covidcast calls that only differ in their signals are fetched by a single request
         """
+        if not merge_signals:
 
-        def call_api(call: EpiDataAsyncCall, session: ClientSession) -> Coroutine:
-            return call.with_session(session).json(fields)
+            async def call_api(call: EpiDataAsyncCall, session: ClientSession) -> List[Dict[str, Any]]:
+                return cast(List[Dict[str, Any]], await call.with_session(session).json(fields))
 
-        return self.all(calls, call_api, batch_size)
+            return self.all(calls, call_api, batch_size, return_exceptions)
+        merged, picks = merge_covidcast_calls(list(calls))
+        results = self.all_json(merged, fields_with_signal(fields), batch_size, return_exceptions=return_exceptions)
+        picked: List[Union[List[Dict[str, Any]], Exception]] = []
+        for i, signals in picks:
+            result = results[i]
+            picked.append(result if isinstance(result, Exception) else pick_covidcast_rows(result, signals, fields))
+        return picked
+
+    def all_df(
+        self,
+        calls: Iterable[EpiDataAsyncCall],
+        fields: Optional[Iterable[str]] = None,
+        batch_size: int = 50,
+        merge_signals: bool = False,
+        return_exceptions: bool = False,
+    ) -> List[Union[DataFrame, Exception]]:
+        """
+        runs the given calls in a batch asynchronously and return their responses
+
+        with `merge_signals` covidcast calls that only differ in their signals are fetched by a single request
+        """
+        if not merge_signals:
+
+            def call_api(call: EpiDataAsyncCall, session: ClientSession) -> Awaitable[DataFrame]:
+                return call.with_session(session).df(fields)
+
+            return self.all(calls, call_api, batch_size, return_exceptions)
+        merged, picks = merge_covidcast_calls(list(calls))
+        results = self.all_df(merged, fields_with_signal(fields), batch_size, return_exceptions=return_exceptions)
+        return [
+            results[i] if isinstance(results[i], Exception) else pick_covidcast_df(results[i], signals, fields)
+            for i, signals in picks
+        ]
 
     def all_csv(
         self,
         calls: Iterable[EpiDataAsyncCall],
         fields: Optional[Iterable[str]] = None,
         batch_size: int = 50,
-    ) -> List[str]:
+        return_exceptions: bool = False,
+    ) -> List[Union[str, Exception]]:
         """
         runs the given calls in a batch asynchronously and return their responses
         """
 
-        def call_api(call: EpiDataAsyncCall, session: ClientSession) -> Coroutine:
+        def call_api(call: EpiDataAsyncCall, session: ClientSession) -> Awaitable[str]:
             return call.with_session(session).csv(fields)
 
-        return self.all(calls, call_api, batch_size)
+        return self.all(calls, call_api, batch_size, return_exceptions)
 
 
 Epidata = EpiDataAsyncContext()
 
 
+async def _fetch_covidcast_meta(url: str, session: Optional[ClientSession], cache: Optional[EpiDataCache]) -> bytes:
+    """
+    fetches the covidcast meta document, reusing the cached one while fresh or not modified
+    """
+    cached = await _in_thread(cache.get_meta, url) if cache else None
+    if cache and cached and cached.is_fresh(cache.meta_ttl):
+        return cached.body
+    res = await _async_request(url, {}, session, headers=cached.revalidation_headers() if cached else None)
+    if cache and cached and res.status == 304:
+        res.release()
+        await _in_thread(cache.refresh_meta, url)
+        return cached.body
+    res.raise_for_status()
+    body = await res.read()
+    if cache and reports_success(body):
+        await _in_thread(cache.put_meta, url, body, res.headers.get("ETag"), res.headers.get("Last-Modified"))
+    return body
+
+
 async def CovidcastEpidata(
-    base_url: str = BASE_URL, session: Optional[ClientSession] = None
+    base_url: str = BASE_URL, session: Optional[ClientSession] = None, cache: Optional[EpiDataCache] = None
 ) -> CovidcastDataSources[EpiDataAsyncCall]:
     url = add_endpoint_to_url(base_url, "covidcast/meta")
-    meta_data_res = await _async_request(url, {}, session)
-    meta_data_res.raise_for_status()
-    meta_data = await meta_data_res.json()
+    meta_data = loads(await _fetch_covidcast_meta(url, session, cache))
 
     def create_call(params: Mapping[str, Union[None, EpiRangeLike, Iterable[EpiRangeLike]]]) -> EpiDataAsyncCall:
         return EpiDataAsyncCall(base_url, session, "covidcast", params, define_covidcast_fields())
@@ -264,4 +861,15 @@ async def CovidcastEpidata(
     return CovidcastDataSources.create(meta_data, create_call)
 
 
-__all__ = ["Epidata", "EpiDataAsyncCall", "EpiDataAsyncContext", "EpiRange", "CovidcastEpidata"]
+__all__ = [
+    "Epidata",
+    "EpiDataAsyncCall",
+    "EpiDataAsyncContext",
+    "EpiRange",
+    "CovidcastEpidata",
+    "EpiDataCache",
+    "RetryPolicy",
+    "NO_RETRY",
+    "RateLimiter",
+    "SingleFlight",
+]
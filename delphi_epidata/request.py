@@ -1,10 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
-from typing import Final, Generator, Sequence, cast, Iterable, Mapping, Optional, Union, List
+from pathlib import Path
+from types import TracebackType
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Final,
+    Generator,
+    Sequence,
+    Type,
+    TypeVar,
+    cast,
+    Iterable,
+    Mapping,
+    Optional,
+    Union,
+    List,
+)
 from json import loads
 
 from requests import Response, Session
-from tenacity import retry, stop_after_attempt
-from pandas import DataFrame
+from requests.exceptions import ChunkedEncodingError, ConnectionError as RequestsConnectionError, Timeout
+from requests.adapters import HTTPAdapter
+from pandas import DataFrame, concat
 
 from ._model import (
     EpiRangeLike,
@@ -15,29 +35,112 @@ from ._model import (
     EpidataFieldInfo,
     OnlySupportsClassicFormatException,
     add_endpoint_to_url,
+    empty_response_body,
+    is_url_too_long,
 )
+from ._arrow import concat_arrow, csv_as_arrow, write_parquet
+from ._cache import CovidcastRangePlan, EpiDataCache, reports_success
+from ._rate_limit import RateLimiter
+from ._single_flight import SingleFlight
+from ._retry import DEFAULT_RETRY_POLICY, NO_RETRY, RetryPolicy
 from ._endpoints import AEpiDataEndpoints
-from ._constants import HTTP_HEADERS, BASE_URL
-from ._covidcast import CovidcastDataSources, define_covidcast_fields
+from ._constants import (
+    HTTP_HEADERS,
+    BASE_URL,
+    DEFAULT_BATCH_ROWS,
+    DEFAULT_POOL_SIZE,
+    MAX_URL_LENGTH,
+    STREAM_CHUNK_SIZE,
+)
+from ._parse import fields_to_predicate
+from ._covidcast import (
+    CovidcastDataSources,
+    CovidcastMetaIndex,
+    covidcast_num_locations,
+    define_covidcast_fields,
+    fields_with_signal,
+    merge_covidcast_calls,
+    pick_covidcast_df,
+    pick_covidcast_rows,
+    prune_covidcast_params,
+)
+
+if TYPE_CHECKING:
+    import pyarrow
+
+T = TypeVar("T")
+U = TypeVar("U")
+
+# errors of a request that are worth retrying
+_TRANSIENT_ERRORS: Final = (RequestsConnectionError, ChunkedEncodingError, Timeout)
+
+
+def _create_session(pool_size: int = DEFAULT_POOL_SIZE) -> Session:
+    """Create a session whose keep-alive connections are pooled and reused across requests."""
+    session = Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
 
-@retry(reraise=True, stop=stop_after_attempt(2))
 def _request_with_retry(
-    url: str, params: Mapping[str, str], session: Optional[Session] = None, stream: bool = False
+    url: str,
+    params: Mapping[str, str],
+    session: Optional[Session] = None,
+    stream: bool = False,
+    retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+    rate_limiter: Optional[RateLimiter] = None,
+    max_url_length: int = MAX_URL_LENGTH,
+    headers: Optional[Mapping[str, str]] = None,
 ) -> Response:
-    """Make request with a retry if an exception is thrown."""
+    """Make request, retrying transient failures according to the retry policy.
 
-    def call_impl(s: Session) -> Response:
-        res = s.get(url, params=params, headers=HTTP_HEADERS, stream=stream)
+    Requests with too long URLs are sent as POST with the parameters in the body."""
+    post = is_url_too_long(url, params, max_url_length)
+    all_headers = {**HTTP_HEADERS, **headers} if headers else HTTP_HEADERS
+
+    def send(s: Session) -> Response:
+        if post:
+            return s.post(url, data=params, headers=all_headers, stream=stream)
+        res = s.get(url, params=params, headers=all_headers, stream=stream)
         if res.status_code == 414:
-            return s.post(url, params=params, headers=HTTP_HEADERS, stream=stream)
+            res.close()
+            return s.post(url, data=params, headers=all_headers, stream=stream)
         return res
 
-    if session:
-        return call_impl(session)
+    def call_impl(s: Session) -> Response:
+        if rate_limiter is None:
+            return send(s)
+        with rate_limiter.limit(url) as permit:
+            res = send(s)
+            permit.status = res.status_code
+            return res
+
+    def request() -> Response:
+        if session:
+            return call_impl(session)
+        with Session() as s:
+            return call_impl(s)
+
+    return retry_policy.retrying(_TRANSIENT_ERRORS)(request)
+
+
+def _map_concurrently(fn: Callable[[T], U], items: Sequence[T]) -> List[U]:
+    """Apply the function to the items using a thread pool of the default connection pool size."""
+    with ThreadPoolExecutor(max_workers=min(len(items), DEFAULT_POOL_SIZE)) as pool:
+        return list(pool.map(fn, items))
 
-    with Session() as s:
-        return call_impl(s)
+
+def _cached_response(url: str, body: bytes) -> Response:
+    """Wrap a cached body as a successful response."""
+    res = Response()
+    res.status_code = 200
+    res.url = url
+    res.encoding = "utf-8"
+    res._content = body  # pylint: disable=protected-access
+    res._content_consumed = True  # pylint: disable=protected-access
+    return res
 
 
 class EpiDataCall(AEpiDataCall):
@@ -46,6 +149,14 @@ class EpiDataCall(AEpiDataCall):
     """
 
     _session: Final[Optional[Session]]
+    _cache: Final[Optional[EpiDataCache]]
+    _max_rows: Final[Optional[int]]
+    _covidcast_meta: Final[Optional[CovidcastMetaIndex]]
+    _retry_policy: Final[RetryPolicy]
+    _rate_limiter: Final[Optional[RateLimiter]]
+    _single_flight: Final[Optional[SingleFlight]]
+    _max_url_length: Final[int]
+    _prune: Final[bool]
 
     def __init__(
         self,
@@ -55,15 +166,102 @@ class EpiDataCall(AEpiDataCall):
         params: Mapping[str, Union[None, EpiRangeLike, Iterable[EpiRangeLike]]],
         meta: Optional[Sequence[EpidataFieldInfo]] = None,
         only_supports_classic: bool = False,
+        cache: Optional[EpiDataCache] = None,
+        max_rows: Optional[int] = None,
+        covidcast_meta: Optional[CovidcastMetaIndex] = None,
+        retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+        rate_limiter: Optional[RateLimiter] = None,
+        single_flight: Optional[SingleFlight] = None,
+        max_url_length: int = MAX_URL_LENGTH,
+        prune: bool = False,
     ) -> None:
         super().__init__(base_url, endpoint, params, meta, only_supports_classic)
         self._session = session
+        self._cache = cache
+        self._max_rows = max_rows
+        self._covidcast_meta = covidcast_meta
+        self._retry_policy = retry_policy
+        self._rate_limiter = rate_limiter
+        self._single_flight = single_flight
+        self._max_url_length = max_url_length
+        self._prune = prune
+
+    def _replace(self, **changes: Any) -> "EpiDataCall":
+        args: Dict[str, Any] = dict(
+            base_url=self._base_url,
+            session=self._session,
+            endpoint=self._endpoint,
+            params=self._params,
+            meta=self.meta,
+            only_supports_classic=self.only_supports_classic,
+            cache=self._cache,
+            max_rows=self._max_rows,
+            covidcast_meta=self._covidcast_meta,
+            retry_policy=self._retry_policy,
+            rate_limiter=self._rate_limiter,
+            single_flight=self._single_flight,
+            max_url_length=self._max_url_length,
+            prune=self._prune,
+        )
+        args.update(changes)
+        return EpiDataCall(**args)
 
     def with_base_url(self, base_url: str) -> "EpiDataCall":
-        return EpiDataCall(base_url, self._session, self._endpoint, self._params)
+        return self._replace(base_url=base_url)
 
     def with_session(self, session: Session) -> "EpiDataCall":
-        return EpiDataCall(self._base_url, session, self._endpoint, self._params)
+        return self._replace(session=session)
+
+    def with_cache(self, cache: Optional[EpiDataCache]) -> "EpiDataCall":
+        return self._replace(cache=cache)
+
+    def with_retry_policy(self, retry_policy: RetryPolicy) -> "EpiDataCall":
+        return self._replace(retry_policy=retry_policy)
+
+    def with_rate_limiter(self, rate_limiter: Optional[RateLimiter]) -> "EpiDataCall":
+        return self._replace(rate_limiter=rate_limiter)
+
+    def with_single_flight(self, single_flight: Optional[SingleFlight]) -> "EpiDataCall":
+        return self._replace(single_flight=single_flight)
+
+    def with_max_url_length(self, max_url_length: int) -> "EpiDataCall":
+        return self._replace(max_url_length=max_url_length)
+
+    def with_max_rows(
+        self, max_rows: Optional[int], covidcast_meta: Optional[CovidcastMetaIndex] = None
+    ) -> "EpiDataCall":
+        return self._replace(max_rows=max_rows, covidcast_meta=covidcast_meta or self._covidcast_meta)
+
+    def with_pruning(self, prune: bool = True, covidcast_meta: Optional[CovidcastMetaIndex] = None) -> "EpiDataCall":
+        return self._replace(prune=prune, covidcast_meta=covidcast_meta or self._covidcast_meta)
+
+    def _with_params(self, params: Mapping[str, Union[None, EpiRangeLike, Iterable[EpiRangeLike]]]) -> "EpiDataCall":
+        return self._replace(params=params)
+
+    def _pruned(self) -> Optional["EpiDataCall"]:
+        """
+        this call restricted to what the covidcast metadata says is available, None if nothing is
+        """
+        if not self._prune or not self._covidcast_meta or self._endpoint.strip("/") != "covidcast":
+            return self
+        params = prune_covidcast_params(self._params, self._covidcast_meta)
+        if params is None or params is self._params:
+            return None if params is None else self
+        return self._with_params(params)
+
+    def _split_calls(self) -> List["EpiDataCall"]:
+        call = self._pruned()
+        if not self._max_rows or call is None:
+            # a call with nothing left to request is answered by `_call` without a request
+            return [self]
+        # pylint: disable=protected-access
+        num_locations = covidcast_num_locations(call._formatted_paramters(), self._covidcast_meta)
+        return call.split(self._max_rows, num_locations)
+
+    def _request(self, url: str, params: Mapping[str, str], stream: bool = False) -> Response:
+        return _request_with_retry(
+            url, params, self._session, stream, self._retry_policy, self._rate_limiter, self._max_url_length
+        )
 
     def _call(
         self,
@@ -71,8 +269,29 @@ class EpiDataCall(AEpiDataCall):
         fields: Optional[Iterable[str]] = None,
         stream: bool = False,
     ) -> Response:
-        url, params = self.request_arguments(format_type, fields)
-        return _request_with_retry(url, params, self._session, stream)
+        call = self._pruned()
+        if call is None:
+            # according to the covidcast metadata there is nothing to request
+            return _cached_response(self._full_url(), empty_response_body(format_type))
+        url, params = call.request_arguments(format_type, fields)
+        if stream:
+            # streamed responses are consumed line by line and can neither be cached nor shared
+            return self._request(url, params, stream)
+        if self._single_flight:
+            return self._single_flight.do((url, *sorted(params.items())), lambda: self._fetch(url, params))
+        return self._fetch(url, params)
+
+    def _fetch(self, url: str, params: Mapping[str, str]) -> Response:
+        if not self._cache:
+            return self._request(url, params)
+        key = self._cache.key(url, params)
+        body = self._cache.get(key)
+        if body is not None:
+            return _cached_response(url, body)
+        res = self._request(url, params)
+        if res.status_code == 200 and reports_success(res.content):
+            self._cache.put(key, res.content, self.is_immutable())
+        return res
 
     def classic(
         self, fields: Optional[Iterable[str]] = None, disable_date_parsing: Optional[bool] = False
@@ -84,7 +303,8 @@ class EpiDataCall(AEpiDataCall):
             r = cast(EpiDataResponse, response.json())
             epidata = r.get("epidata")
             if epidata and isinstance(epidata, list) and len(epidata) > 0 and isinstance(epidata[0], dict):
-                r["epidata"] = [self._parse_row(row, disable_date_parsing=disable_date_parsing) for row in epidata]
+                parse_row = self._row_parser(disable_date_parsing)
+                r["epidata"] = [parse_row(row) for row in epidata]
             return r
         except Exception as e:  # pylint: disable=broad-except
             return {"result": 0, "message": f"error: {e}", "epidata": []}
@@ -99,24 +319,113 @@ class EpiDataCall(AEpiDataCall):
         self, fields: Optional[Iterable[str]] = None, disable_date_parsing: Optional[bool] = False
     ) -> List[Mapping[str, Union[str, int, float, date, None]]]:
         """Request and parse epidata in JSON format"""
+        if self._single_flight:
+            url, params = self.request_arguments(EpiDataFormatType.json, fields)
+            key = ("json", url, *sorted(params.items()), disable_date_parsing)
+            rows = self._single_flight.do(key, lambda: self._json(fields, disable_date_parsing))
+            # copies of the shared rows, whose values are immutable
+            return [dict(row) for row in rows]
+        return self._json(fields, disable_date_parsing)
+
+    def _json(
+        self, fields: Optional[Iterable[str]] = None, disable_date_parsing: Optional[bool] = False
+    ) -> List[Mapping[str, Union[str, int, float, date, None]]]:
         if self.only_supports_classic:
             raise OnlySupportsClassicFormatException()
         self._verify_parameters()
+        chunks = self._split_calls()
+        if len(chunks) > 1:
+            # pylint: disable=protected-access
+            results = _map_concurrently(lambda c: c._json(fields, disable_date_parsing), chunks)
+            return [row for rows in results for row in rows]
+        plan = CovidcastRangePlan.create(self, self._cache) if self._cache and self._cache.covidcast_ranges else None
+        if plan:
+            return self._range_cached_json(plan, fields, disable_date_parsing)
         response = self._call(EpiDataFormatType.json, fields)
         response.raise_for_status()
-        return [
-            self._parse_row(row, disable_date_parsing=disable_date_parsing)
-            for row in cast(List[Mapping[str, Union[str, int, float, None]]], response.json())
-        ]
+        parse_row = self._row_parser(disable_date_parsing)
+        return [parse_row(row) for row in cast(List[Mapping[str, Union[str, int, float, None]]], response.json())]
 
-    def df(self, fields: Optional[Iterable[str]] = None, disable_date_parsing: Optional[bool] = False) -> DataFrame:
-        """Request and parse epidata as a pandas data frame"""
+    def _range_cached_json(
+        self, plan: CovidcastRangePlan, fields: Optional[Iterable[str]], disable_date_parsing: Optional[bool]
+    ) -> List[Mapping[str, Union[str, int, float, date, None]]]:
+        """Fetch only the time ranges missing in the cache and stitch them with the cached rows"""
+        for gap, params in plan.gap_params(self):
+            plan.store(gap, self._with_params(params).with_cache(None).json(disable_date_parsing=True))
+        pred = fields_to_predicate(fields)
+        parse_row = self._row_parser(disable_date_parsing)
+        return [parse_row({k: v for k, v in row.items() if pred(k)}) for row in plan.rows()]
+
+    def df(
+        self,
+        fields: Optional[Iterable[str]] = None,
+        disable_date_parsing: Optional[bool] = False,
+        use_csv: bool = False,
+    ) -> DataFrame:
+        """Request and parse epidata as a pandas data frame
+
+        with `use_csv` the data is requested in CSV format and read directly into the data frame
+        without creating intermediate rows, unless the covidcast range cache is used
+        """
+        if self._single_flight:
+            url, params = self.request_arguments(EpiDataFormatType.csv if use_csv else None, fields)
+            key = ("df", url, *sorted(params.items()), disable_date_parsing)
+            # shallow copies, such that adding or replacing columns does not affect the other callers
+            return self._single_flight.do(key, lambda: self._df(fields, disable_date_parsing, use_csv)).copy(deep=False)
+        return self._df(fields, disable_date_parsing, use_csv)
+
+    def _df(
+        self,
+        fields: Optional[Iterable[str]] = None,
+        disable_date_parsing: Optional[bool] = False,
+        use_csv: bool = False,
+    ) -> DataFrame:
         if self.only_supports_classic:
             raise OnlySupportsClassicFormatException()
         self._verify_parameters()
-        r = self.json(fields, disable_date_parsing=disable_date_parsing)
+        if use_csv and not (self._cache and self._cache.covidcast_ranges):
+            chunks = self._split_calls()
+            if len(chunks) > 1:
+                # pylint: disable=protected-access
+                dfs = _map_concurrently(lambda c: c._df(fields, disable_date_parsing, use_csv=True), chunks)
+                return concat(dfs, ignore_index=True)
+            response = self._call(EpiDataFormatType.csv, fields)
+            response.raise_for_status()
+            return self._csv_as_df(response.content, fields, disable_date_parsing=disable_date_parsing)
+        # dates are converted column-wise when building the data frame
+        r = self._json(fields, disable_date_parsing=True)
         return self._as_df(r, fields, disable_date_parsing=disable_date_parsing)
 
+    def arrow(
+        self,
+        fields: Optional[Iterable[str]] = None,
+        disable_date_parsing: Optional[bool] = False,
+    ) -> "pyarrow.Table":
+        """Request epidata in CSV format and read it directly into an Arrow table
+
+        the schema is derived from the field infos, requires pyarrow
+        """
+        if self.only_supports_classic:
+            raise OnlySupportsClassicFormatException()
+        self._verify_parameters()
+        chunks = self._split_calls()
+        if len(chunks) > 1:
+            tables = _map_concurrently(lambda c: c.arrow(fields, disable_date_parsing), chunks)
+            return concat_arrow(tables)
+        response = self._call(EpiDataFormatType.csv, fields)
+        response.raise_for_status()
+        return csv_as_arrow(response.content, self.meta, fields, disable_date_parsing)
+
+    def to_parquet(
+        self,
+        path: Union[str, Path],
+        fields: Optional[Iterable[str]] = None,
+        disable_date_parsing: Optional[bool] = False,
+    ) -> None:
+        """Request epidata and write it as a Parquet file, requires pyarrow"""
+        table = self.arrow(fields, disable_date_parsing)
+        write_parquet(table, path)
+
     def csv(self, fields: Optional[Iterable[str]] = None) -> str:
         """Request and parse epidata in CSV format"""
         if self.only_supports_classic:
@@ -133,10 +442,51 @@ class EpiDataCall(AEpiDataCall):
         if self.only_supports_classic:
             raise OnlySupportsClassicFormatException()
         self._verify_parameters()
+        chunks = self._split_calls()
+        if len(chunks) > 1:
+            response: Optional[Response] = None
+            for chunk in chunks:
+                response = yield from chunk.iter(fields, disable_date_parsing=disable_date_parsing)
+            return response
         response = self._call(EpiDataFormatType.jsonl, fields, stream=True)
         response.raise_for_status()
+        parse_row = self._row_parser(disable_date_parsing)
         for line in response.iter_lines():
-            yield self._parse_row(loads(line), disable_date_parsing=disable_date_parsing)
+            yield parse_row(loads(line))
+        return response
+
+    def iter_batches(
+        self,
+        fields: Optional[Iterable[str]] = None,
+        disable_date_parsing: Optional[bool] = False,
+        batch_rows: int = DEFAULT_BATCH_ROWS,
+    ) -> Generator[DataFrame, None, Response]:
+        """Request and streams epidata as typed data frames of at most `batch_rows` rows
+
+        each batch is parsed at once and converted column-wise, such that large requests
+        can be processed in constant memory
+        """
+        if self.only_supports_classic:
+            raise OnlySupportsClassicFormatException()
+        self._verify_parameters()
+        chunks = self._split_calls()
+        if len(chunks) > 1:
+            response: Optional[Response] = None
+            for chunk in chunks:
+                response = yield from chunk.iter_batches(fields, disable_date_parsing, batch_rows)
+            return response
+        response = self._call(EpiDataFormatType.jsonl, fields, stream=True)
+        response.raise_for_status()
+        batch: List[bytes] = []
+        for line in response.iter_lines(chunk_size=STREAM_CHUNK_SIZE):
+            if not line:
+                continue
+            batch.append(line)
+            if len(batch) >= batch_rows:
+                yield self._jsonl_as_df(batch, fields, disable_date_parsing)
+                batch = []
+        if batch:
+            yield self._jsonl_as_df(batch, fields, disable_date_parsing)
         return response
 
     def __iter__(self) -> Generator[Mapping[str, Union[str, int, float, date, None]], None, Response]:
@@ -146,21 +496,132 @@ class EpiDataCall(AEpiDataCall):
 class EpiDataContext(AEpiDataEndpoints[EpiDataCall]):
     """
     sync epidata call class
+
+    unless a session is given, the context owns a pooled keep-alive session that is shared by all calls
+    created from it and released by `close()` or when used as a context manager
     """
 
     _base_url: Final[str]
-    _session: Final[Optional[Session]]
+    _session: Final[Session]
+    _owns_session: Final[bool]
+    _cache: Final[Optional[EpiDataCache]]
+    _max_rows: Final[Optional[int]]
+    _covidcast_meta: Final[Optional[CovidcastMetaIndex]]
+    _retry_policy: Final[RetryPolicy]
+    _rate_limiter: Final[Optional[RateLimiter]]
+    _single_flight: Final[Optional[SingleFlight]]
+    _max_url_length: Final[int]
+    _prune: Final[bool]
 
-    def __init__(self, base_url: str = BASE_URL, session: Optional[Session] = None) -> None:
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        session: Optional[Session] = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        cache: Optional[EpiDataCache] = None,
+        max_rows: Optional[int] = None,
+        covidcast_meta: Optional[CovidcastMetaIndex] = None,
+        retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+        rate_limiter: Optional[RateLimiter] = None,
+        single_flight: Optional[SingleFlight] = None,
+        max_url_length: int = MAX_URL_LENGTH,
+        prune: bool = False,
+    ) -> None:
         super().__init__()
         self._base_url = base_url
-        self._session = session
+        self._owns_session = session is None
+        self._session = session or _create_session(pool_size)
+        self._cache = cache
+        self._max_rows = max_rows
+        self._covidcast_meta = covidcast_meta
+        self._retry_policy = retry_policy
+        self._rate_limiter = rate_limiter
+        self._single_flight = single_flight
+        self._max_url_length = max_url_length
+        self._prune = prune
+
+    def _replace(self, **changes: Any) -> "EpiDataContext":
+        args: Dict[str, Any] = dict(
+            base_url=self._base_url,
+            session=self._session,
+            cache=self._cache,
+            max_rows=self._max_rows,
+            covidcast_meta=self._covidcast_meta,
+            retry_policy=self._retry_policy,
+            rate_limiter=self._rate_limiter,
+            single_flight=self._single_flight,
+            max_url_length=self._max_url_length,
+            prune=self._prune,
+        )
+        args.update(changes)
+        return EpiDataContext(**args)
 
     def with_base_url(self, base_url: str) -> "EpiDataContext":
-        return EpiDataContext(base_url, self._session)
+        return self._replace(base_url=base_url)
 
     def with_session(self, session: Session) -> "EpiDataContext":
-        return EpiDataContext(self._base_url, session)
+        return self._replace(session=session)
+
+    def with_cache(self, cache: Optional[EpiDataCache]) -> "EpiDataContext":
+        return self._replace(cache=cache)
+
+    def with_retry_policy(self, retry_policy: RetryPolicy) -> "EpiDataContext":
+        """
+        retries transient failures of the requests according to the given policy, use `NO_RETRY` to disable retries
+        """
+        return self._replace(retry_policy=retry_policy)
+
+    def with_rate_limiter(self, rate_limiter: Optional[RateLimiter]) -> "EpiDataContext":
+        """
+        passes every request through the given rate limiter, which may be shared with other contexts
+        """
+        return self._replace(rate_limiter=rate_limiter)
+
+    def with_single_flight(self, single_flight: Optional[SingleFlight]) -> "EpiDataContext":
+        """
+        coalesces identical concurrent requests of all calls sharing the given single flight into one
+        """
+        return self._replace(single_flight=single_flight)
+
+    def with_max_url_length(self, max_url_length: int) -> "EpiDataContext":
+        """
+        sends requests whose encoded URL would exceed the given length as POST with the parameters in the body
+        """
+        return self._replace(max_url_length=max_url_length)
+
+    def with_max_rows(
+        self, max_rows: Optional[int], covidcast_meta: Optional[CovidcastMetaIndex] = None
+    ) -> "EpiDataContext":
+        """
+        splits calls estimated to return more than `max_rows` rows into multiple requests,
+        using the number of locations from the given `covidcast_meta` rows for `*` geo values
+        """
+        return self._replace(max_rows=max_rows, covidcast_meta=covidcast_meta or self._covidcast_meta)
+
+    def with_pruning(self, prune: bool = True, covidcast_meta: Optional[CovidcastMetaIndex] = None) -> "EpiDataContext":
+        """
+        restricts covidcast calls to the signals available at their geo type and to the time range with data
+        according to the given `covidcast_meta` rows, calls with nothing left return an empty result right away
+        """
+        return self._replace(prune=prune, covidcast_meta=covidcast_meta or self._covidcast_meta)
+
+    def close(self) -> None:
+        """
+        closes the pooled connections if the session is owned by this context
+        """
+        if self._owns_session:
+            self._session.close()
+
+    def __enter__(self) -> "EpiDataContext":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
 
     def _create_call(
         self,
@@ -169,17 +630,153 @@ class EpiDataContext(AEpiDataEndpoints[EpiDataCall]):
         meta: Optional[Sequence[EpidataFieldInfo]] = None,
         only_supports_classic: bool = False,
     ) -> EpiDataCall:
-        return EpiDataCall(self._base_url, self._session, endpoint, params, meta, only_supports_classic)
+        return EpiDataCall(
+            self._base_url,
+            self._session,
+            endpoint,
+            params,
+            meta,
+            only_supports_classic,
+            self._cache,
+            self._max_rows,
+            self._covidcast_meta,
+            self._retry_policy,
+            self._rate_limiter,
+            self._single_flight,
+            self._max_url_length,
+            self._prune,
+        )
+
+    def all(
+        self,
+        calls: Iterable[EpiDataCall],
+        call_api: Callable[[EpiDataCall, Session], T],
+        batch_size: int = 50,
+    ) -> List[Union[T, Exception]]:
+        """
+        runs the given calls in a bounded thread pool using the session of this context
+
+        results are returned in the order of the given calls, a failing call yields its exception instead of a result.
+        The session keeps up to `pool_size` connections per host alive, create the context with a `pool_size` of at
+        least `batch_size` to reuse all of them.
+        """
+        with ThreadPoolExecutor(max_workers=batch_size) as pool:
+            futures = [pool.submit(call_api, call, self._session) for call in calls]
+            results: List[Union[T, Exception]] = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:  # pylint: disable=broad-except
+                    results.append(e)
+            return results
+
+    def all_classic(
+        self,
+        calls: Iterable[EpiDataCall],
+        fields: Optional[Iterable[str]] = None,
+        batch_size: int = 50,
+    ) -> List[Union[EpiDataResponse, Exception]]:
+        """
+        runs the given calls in a batch using a thread pool and return their responses
+        """
+
+        def call_api(call: EpiDataCall, session: Session) -> EpiDataResponse:
+            return call.with_session(session).classic(fields)
+
+        return self.all(calls, call_api, batch_size)
+
+    def all_json(
+        self,
+        calls: Iterable[EpiDataCall],
+        fields: Optional[Iterable[str]] = None,
+        batch_size: int = 50,
+        merge_signals: bool = False,
+    ) -> List[Union[List[Dict[str, Any]], Exception]]:
+        """
+        runs the given calls in a batch using a thread pool and return their responses
+
+        with `merge_signals` covidcast calls that only differ in their signals are fetched by a single request
+        """
+        if not merge_signals:
+
+            def call_api(call: EpiDataCall, session: Session) -> List[Dict[str, Any]]:
+                return cast(List[Dict[str, Any]], call.with_session(session).json(fields))
+
+            return self.all(calls, call_api, batch_size)
+        merged, picks = merge_covidcast_calls(list(calls))
+        results = self.all_json(merged, fields_with_signal(fields), batch_size)
+        picked: List[Union[List[Dict[str, Any]], Exception]] = []
+        for i, signals in picks:
+            result = results[i]
+            picked.append(result if isinstance(result, Exception) else pick_covidcast_rows(result, signals, fields))
+        return picked
+
+    def all_df(
+        self,
+        calls: Iterable[EpiDataCall],
+        fields: Optional[Iterable[str]] = None,
+        batch_size: int = 50,
+        merge_signals: bool = False,
+    ) -> List[Union[DataFrame, Exception]]:
+        """
+        runs the given calls in a batch using a thread pool and return their responses
+
+        with `merge_signals` covidcast calls that only differ in their signals are fetched by a single request
+        """
+        if not merge_signals:
+
+            def call_api(call: EpiDataCall, session: Session) -> DataFrame:
+                return call.with_session(session).df(fields)
+
+            return self.all(calls, call_api, batch_size)
+        merged, picks = merge_covidcast_calls(list(calls))
+        results = self.all_df(merged, fields_with_signal(fields), batch_size)
+        return [
+            results[i] if isinstance(results[i], Exception) else pick_covidcast_df(results[i], signals, fields)
+            for i, signals in picks
+        ]
+
+    def all_csv(
+        self,
+        calls: Iterable[EpiDataCall],
+        fields: Optional[Iterable[str]] = None,
+        batch_size: int = 50,
+    ) -> List[Union[str, Exception]]:
+        """
+        runs the given calls in a batch using a thread pool and return their responses
+        """
+
+        def call_api(call: EpiDataCall, session: Session) -> str:
+            return call.with_session(session).csv(fields)
+
+        return self.all(calls, call_api, batch_size)
 
 
 Epidata = EpiDataContext()
 
 
-def CovidcastEpidata(base_url: str = BASE_URL, session: Optional[Session] = None) -> CovidcastDataSources[EpiDataCall]:
+def _fetch_covidcast_meta(url: str, session: Session, cache: Optional[EpiDataCache]) -> bytes:
+    """Fetch the covidcast meta document, reusing the cached one while fresh or not modified."""
+    cached = cache.get_meta(url) if cache else None
+    if cache and cached and cached.is_fresh(cache.meta_ttl):
+        return cached.body
+    res = _request_with_retry(url, {}, session, False, headers=cached.revalidation_headers() if cached else None)
+    if cache and cached and res.status_code == 304:
+        cache.refresh_meta(url)
+        return cached.body
+    res.raise_for_status()
+    if cache and reports_success(res.content):
+        cache.put_meta(url, res.content, res.headers.get("ETag"), res.headers.get("Last-Modified"))
+    return res.content
+
+
+def CovidcastEpidata(
+    base_url: str = BASE_URL, session: Optional[Session] = None, cache: Optional[EpiDataCache] = None
+) -> CovidcastDataSources[EpiDataCall]:
+    # fall back to the pooled session owned by the default context rather than one nobody closes
+    session = session or Epidata._session  # pylint: disable=protected-access
     url = add_endpoint_to_url(base_url, "covidcast/meta")
-    meta_data_res = _request_with_retry(url, {}, session, False)
-    meta_data_res.raise_for_status()
-    meta_data = meta_data_res.json()
+    meta_data = loads(_fetch_covidcast_meta(url, session, cache))
 
     def create_call(params: Mapping[str, Union[None, EpiRangeLike, Iterable[EpiRangeLike]]]) -> EpiDataCall:
         return EpiDataCall(base_url, session, "covidcast", params, define_covidcast_fields())
@@ -187,4 +784,15 @@ def CovidcastEpidata(base_url: str = BASE_URL, session: Optional[Session] = None
     return CovidcastDataSources.create(meta_data, create_call)
 
 
-__all__ = ["Epidata", "EpiDataCall", "EpiDataContext", "EpiRange", "CovidcastEpidata"]
+__all__ = [
+    "Epidata",
+    "EpiDataCall",
+    "EpiDataContext",
+    "EpiRange",
+    "CovidcastEpidata",
+    "EpiDataCache",
+    "RetryPolicy",
+    "NO_RETRY",
+    "RateLimiter",
+    "SingleFlight",
+]
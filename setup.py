@@ -22,5 +22,6 @@ setuptools.setup(
     ],
     python_requires='>=3.6',
     install_requires=[f.strip() for f in pathlib.Path('requirements.txt').read_text().split('\n') if f],
+    extras_require={'arrow': ['pyarrow']},
     # package_data={'delphi_epidata': []}
 )
@@ -17,6 +17,7 @@ Path().expanduser()
 ROOT_DIR = Path(__file__).parent
 SETUP_FILE = ROOT_DIR.joinpath("setup.py")
 TEST_DIR = ROOT_DIR.joinpath("tests")
+BENCHMARK_DIR = ROOT_DIR.joinpath("benchmarks")
 SOURCE_DIR = ROOT_DIR.joinpath("delphi_epidata")
 TOX_DIR = ROOT_DIR.joinpath(".tox")
 COVERAGE_FILE = ROOT_DIR.joinpath(".coverage")
@@ -25,7 +26,7 @@ COVERAGE_REPORT = COVERAGE_DIR.joinpath("index.html")
 DOCS_DIR = ROOT_DIR.joinpath("docs")
 DOCS_BUILD_DIR = DOCS_DIR.joinpath("_build")
 DOCS_INDEX = DOCS_BUILD_DIR.joinpath("index.html")
-PYTHON_DIRS = [str(d) for d in [SOURCE_DIR, TEST_DIR]]
+PYTHON_DIRS = [str(d) for d in [SOURCE_DIR, TEST_DIR, BENCHMARK_DIR]]
 JOINED_PYTHON_DIRS = " ".join(PYTHON_DIRS)
 
 
@@ -78,6 +79,44 @@ def test(c):
     c.run("pytest {}".format(TEST_DIR))
 
 
+@task(
+    help={
+        "compare": "Saved benchmark run to compare with or 'latest' for the most recent one, "
+        + "fails if the mean time regressed by more than 20%"
+    }
+)
+def benchmark(c, compare=None):
+    """
+    Run the offline benchmarks against the local mock server
+    """
+    options = "--benchmark-autosave --benchmark-json=benchmark.json"
+    if compare:
+        run = "" if compare == "latest" else "={}".format(compare)
+        options += " --benchmark-compare{} --benchmark-compare-fail=mean:20%".format(run)
+    c.run("pytest {} {}".format(BENCHMARK_DIR, options))
+
+
+@task(
+    help={
+        "baseline": "Results of a previous run to compare with, fails on a regression beyond 20%",
+        "save": "File to write the results to",
+        "rows": "Number of rows of the fixtures",
+    }
+)
+def micro_benchmark(c, baseline=None, save=None, rows=None):
+    """
+    Run the micro-benchmarks of the parsing hot paths
+    """
+    options = ""
+    if baseline:
+        options += " --baseline {}".format(baseline)
+    if save:
+        options += " --save {}".format(save)
+    if rows:
+        options += " --rows {}".format(rows)
+    c.run("python -m benchmarks.micro{}".format(options))
+
+
 @task(help={"publish": "Publish the result via coveralls"})
 def coverage(c, publish=False):
     """
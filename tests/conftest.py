@@ -0,0 +1,81 @@
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Tuple
+from urllib.parse import parse_qsl, urlparse
+
+import pytest
+
+
+@dataclass
+class StubRequest:
+    """
+    request received by the stub server, with the parameters of either the query string or the form body
+    """
+
+    method: str
+    path: str
+    params: Dict[str, str]
+    body: bytes
+    headers: Mapping[str, str]
+    client_port: int
+
+
+# status, headers, and body of a response
+StubResponse = Tuple[int, Dict[str, str], bytes]
+
+
+@dataclass
+class StubServer:
+    """
+    local HTTP server recording the requests it receives and answering them with `respond`, as JSON unless
+    the response sets another Content-Type
+    """
+
+    url: str = ""
+    requests: List[StubRequest] = field(default_factory=list)
+    respond: Callable[[StubRequest], StubResponse] = lambda _: (200, {}, b"[]")
+
+
+@pytest.fixture
+def stub_server() -> Iterator[StubServer]:
+    stub = StubServer()
+
+    class Handler(BaseHTTPRequestHandler):
+        """
+        records every request and answers it with the response of the stub
+        """
+
+        protocol_version = "HTTP/1.1"
+
+        def _handle(self) -> None:
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            url = urlparse(self.path)
+            query = body.decode("utf-8") if self.command == "POST" else url.query
+            request = StubRequest(
+                self.command, url.path, dict(parse_qsl(query)), body, dict(self.headers), self.client_address[1]
+            )
+            stub.requests.append(request)
+            status, headers, content = stub.respond(request)
+            self.send_response(status)
+            for name, value in {"Content-Type": "application/json", **headers}.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        do_GET = _handle
+        do_POST = _handle
+
+        def log_message(self, *args: Any) -> None:  # pylint: disable=arguments-differ
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+    stub.url = f"http://127.0.0.1:{server.server_address[1]}/"
+    try:
+        yield stub
+    finally:
+        server.shutdown()
+        server.server_close()
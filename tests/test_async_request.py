@@ -0,0 +1,116 @@
+from asyncio import run, sleep
+from typing import List, Tuple, Union
+
+import pytest
+from aiohttp import ClientResponse, ClientSession
+from delphi_epidata.async_request import EpiDataAsyncCall, EpiDataAsyncContext
+
+from .conftest import StubRequest, StubResponse, StubServer
+
+
+def test_stream_bounds_in_flight_calls() -> None:
+    ctx = EpiDataAsyncContext()
+    calls = [ctx.covidcast_meta().with_base_url(f"http://localhost/{i}/") for i in range(10)]
+    in_flight: List[int] = [0, 0]
+
+    async def call_api(call: EpiDataAsyncCall, _: ClientSession) -> str:
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight)
+        await sleep(0.01 if "/0/" in call.request_url() else 0)
+        in_flight[0] -= 1
+        if "/3/" in call.request_url():
+            raise ValueError("failed")
+        return call.request_url()
+
+    async def consume() -> List[Tuple[int, Union[str, Exception]]]:
+        return [r async for r in ctx.stream(calls, call_api, batch_size=3)]
+
+    streamed = run(consume())
+    assert in_flight[1] == 3
+    assert streamed[-1][0] == 0
+    assert sorted(i for i, _ in streamed) == list(range(10))
+
+    results = ctx.all(calls, call_api, batch_size=3, return_exceptions=True)
+    assert results[0] == "http://localhost/0/covidcast_meta/"
+    assert isinstance(results[3], ValueError)
+    with pytest.raises(ValueError):
+        ctx.all(calls, call_api, batch_size=3)
+
+
+def test_failure_cancels_calls_in_flight() -> None:
+    ctx = EpiDataAsyncContext()
+    calls = [ctx.covidcast_meta().with_base_url(f"http://localhost/{i}/") for i in range(3)]
+    cancelled: List[str] = []
+
+    async def call_api(call: EpiDataAsyncCall, _: ClientSession) -> str:
+        if "/0/" in call.request_url():
+            raise ValueError("failed")
+        try:
+            await sleep(10)
+        finally:
+            # cleaning up, e.g. releasing the connection, takes a while
+            await sleep(0.01)
+            cancelled.append(call.request_url())
+        return call.request_url()
+
+    async def fail() -> List[str]:
+        with pytest.raises(ValueError):
+            await ctx.all_async(calls, call_api, batch_size=3)
+        return list(cancelled)
+
+    # the calls still in flight finished their cancellation before all_async returned
+    assert sorted(run(fail())) == [c.request_url() for c in calls[1:]]
+
+
+def test_all_in_running_loop() -> None:
+    ctx = EpiDataAsyncContext()
+
+    async def call_api(call: EpiDataAsyncCall, _: ClientSession) -> str:
+        return call.request_url()
+
+    async def nested() -> None:
+        with pytest.raises(RuntimeError):
+            ctx.all([ctx.covidcast_meta()], call_api)
+        assert await ctx.all_async([ctx.covidcast_meta()], call_api) == [ctx.covidcast_meta().request_url()]
+
+    run(nested())
+
+
+def test_long_url_is_posted(stub_server: StubServer) -> None:
+    geo_values = [f"{i:05d}" for i in range(1000)]
+
+    async def fetch() -> str:
+        async with ClientSession() as session:
+            call = EpiDataAsyncContext(stub_server.url, session).covidcast(
+                "src", "sig", "day", "county", 20210101, geo_values
+            )
+            return await call.csv()
+
+    assert run(fetch()) == "[]"
+    assert [r.method for r in stub_server.requests] == ["POST"]
+    assert stub_server.requests[0].params["geo_values"] == ",".join(geo_values)
+
+
+def test_414_is_retried_as_post(stub_server: StubServer, monkeypatch: pytest.MonkeyPatch) -> None:
+    def respond(request: StubRequest) -> StubResponse:
+        return (414, {}, b"URI Too Long") if request.method == "GET" else (200, {}, b"[]")
+
+    released: List[int] = []
+    release = ClientResponse.release
+
+    def record_release(res: ClientResponse) -> None:
+        released.append(res.status)
+        release(res)
+
+    monkeypatch.setattr(ClientResponse, "release", record_release)
+
+    async def fetch() -> str:
+        async with ClientSession() as session:
+            call = EpiDataAsyncContext(stub_server.url, session).covidcast("src", "sig", "day", "state", 20210101, "ca")
+            return await call.csv()
+
+    stub_server.respond = respond
+    assert run(fetch()) == "[]"
+    assert [r.method for r in stub_server.requests] == ["GET", "POST"]
+    assert stub_server.requests[1].params == stub_server.requests[0].params
+    assert 414 in released
@@ -0,0 +1,158 @@
+from asyncio import run
+from datetime import timedelta
+from json import dumps
+from pathlib import Path
+from typing import Any, Dict, List
+
+from aiohttp import ClientSession
+
+from delphi_epidata._cache import EpiDataCache, reports_success
+from delphi_epidata._weeks import date_range
+from delphi_epidata.async_request import EpiDataAsyncContext
+from delphi_epidata.request import EpiDataContext, EpiRange
+
+from .conftest import StubRequest, StubResponse, StubServer
+
+
+def test_key_is_order_independent() -> None:
+    a = EpiDataCache.key("https://x/covidcast/", {"a": "1", "b": "2"})
+    b = EpiDataCache.key("https://x/covidcast/", {"b": "2", "a": "1"})
+    assert a == b
+    assert a != EpiDataCache.key("https://x/covidcast/", {"a": "1", "b": "3"})
+
+
+def test_put_get(tmp_path: Path) -> None:
+    cache = EpiDataCache(tmp_path)
+    assert cache.get("k") is None
+    cache.put("k", b"[1,2,3]")
+    assert cache.get("k") == b"[1,2,3]"
+    cache.clear()
+    assert cache.get("k") is None
+
+
+def test_ttl(tmp_path: Path) -> None:
+    cache = EpiDataCache(tmp_path, ttl=timedelta(seconds=-1))
+    cache.put("k", b"data")
+    assert cache.get("k") is None
+
+
+def test_lru_eviction(tmp_path: Path) -> None:
+    cache = EpiDataCache(tmp_path, max_size=100)
+    cache.put("a", bytes(range(60)))
+    cache.put("b", bytes(range(60)))
+    assert cache.get("a") is None
+    assert cache.get("b") == bytes(range(60))
+
+
+def test_immutable_never_expires(tmp_path: Path) -> None:
+    cache = EpiDataCache(tmp_path, ttl=timedelta(seconds=-1))
+    cache.put("k", b"data", immutable=True)
+    assert cache.get("k") == b"data"
+
+
+def test_evicts_mutable_first(tmp_path: Path) -> None:
+    cache = EpiDataCache(tmp_path, max_size=100)
+    cache.put("a", bytes(range(60)), immutable=True)
+    cache.put("b", bytes(range(60)))
+    assert cache.get("a") == bytes(range(60))
+    assert cache.get("b") is None
+
+
+def test_meta(tmp_path: Path) -> None:
+    cache = EpiDataCache(tmp_path, meta_ttl=timedelta(hours=1))
+    assert cache.get_meta("https://x/covidcast/meta/") is None
+    cache.put_meta("https://x/covidcast/meta/", b"[]", '"abc"', "Tue, 01 Jun 2021 00:00:00 GMT")
+    meta = cache.get_meta("https://x/covidcast/meta/")
+    assert meta is not None and meta.body == b"[]"
+    assert meta.is_fresh(cache.meta_ttl)
+    assert not meta.is_fresh(timedelta(seconds=-1))
+    assert not meta.is_fresh(None)
+    assert meta.revalidation_headers() == {
+        "If-None-Match": '"abc"',
+        "If-Modified-Since": "Tue, 01 Jun 2021 00:00:00 GMT",
+    }
+    cache.clear()
+    assert cache.get_meta("https://x/covidcast/meta/") is None
+
+
+def test_reports_success() -> None:
+    assert reports_success(b'{"result": 1, "message": "success", "epidata": []}')
+    assert not reports_success(b'{"result": -2, "message": "no results", "epidata": []}')
+    assert not reports_success(b' {"result": -1, "message": "error"}')
+    assert reports_success(b"[]")
+    assert reports_success(b'{"a": 1}\n{"a": 2}')
+    assert reports_success(b"a,b\n1,2")
+
+
+def test_errors_are_not_cached(tmp_path: Path, stub_server: StubServer) -> None:
+    stub_server.respond = lambda _: (200, {}, b'{"result": -1, "message": "database error"}')
+    cache = EpiDataCache(tmp_path)
+    with EpiDataContext(stub_server.url, cache=cache) as ctx:
+        # pinned to the past, such that a cached response would never expire
+        call = ctx.fluview("nat", 202001, issues=202005)
+        assert call.classic()["result"] == -1
+        assert call.classic()["result"] == -1
+        assert len(stub_server.requests) == 2
+        stub_server.respond = lambda _: (200, {}, b'{"result": 1, "message": "success", "epidata": []}')
+        assert call.classic()["result"] == 1
+        assert call.classic()["result"] == 1
+        assert len(stub_server.requests) == 3
+
+    async def classic_twice() -> List[int]:
+        async with ClientSession() as session:
+            call = EpiDataAsyncContext(stub_server.url, session, cache).fluview("nat", 202002, issues=202005)
+            return [(await call.classic())["result"] for _ in range(2)]
+
+    stub_server.respond = lambda _: (200, {}, b'{"result": -1, "message": "database error"}')
+    assert run(classic_twice()) == [-1, -1]
+    assert len(stub_server.requests) == 5
+
+
+def _covidcast_rows(request: StubRequest) -> StubResponse:
+    days: List[int] = []
+    for value in request.params["time_values"].split(","):
+        start, _, end = value.partition("-")
+        days.extend(int(d) for d in date_range(int(start), int(end or start)))
+    rows: List[Dict[str, Any]] = [
+        {"signal": signal, "geo_value": geo, "time_value": day, "issue": day, "value": day % 100 + i}
+        for signal in request.params["signals"].split(",")
+        for i, geo in enumerate(request.params["geo_values"].split(","))
+        for day in days
+    ]
+    return 200, {}, dumps(rows).encode()
+
+
+def test_covidcast_ranges_fetch_only_gaps(tmp_path: Path, stub_server: StubServer) -> None:
+    stub_server.respond = _covidcast_rows
+    cache = EpiDataCache(tmp_path, covidcast_ranges=True)
+    with EpiDataContext(stub_server.url, cache=cache) as ctx:
+
+        def fetch(geo_values: List[str], start: int, end: int) -> List[Any]:
+            call = ctx.covidcast("src", "sig", "day", "state", EpiRange(start, end), geo_values)
+            return call.json(disable_date_parsing=True)
+
+        assert len(fetch(["ca", "ny", "tx"], 20210101, 20210110)) == 30
+        assert len(fetch(["ca"], 20210111, 20210115)) == 5
+        assert len(stub_server.requests) == 2
+
+        rows = fetch(["ca", "ny", "tx"], 20210105, 20210120)
+        # ny and tx miss the same days and are fetched together, ca only misses the days after the 15th
+        gaps = {(r.params["geo_values"], r.params["time_values"]) for r in stub_server.requests[2:]}
+        assert gaps == {("ca", "20210116-20210120"), ("ny,tx", "20210111-20210120")}
+        assert [(r["time_value"], r["geo_value"]) for r in rows] == [
+            (int(day), geo) for day in date_range(20210105, 20210120) for geo in ("ca", "ny", "tx")
+        ]
+        assert all(r["value"] == r["time_value"] % 100 for r in rows if r["geo_value"] == "ca")
+
+        # everything is cached now
+        assert len(fetch(["ny", "ca"], 20210101, 20210120)) == 40
+
+        async def fetch_async() -> List[Any]:
+            async with ClientSession() as session:
+                call = EpiDataAsyncContext(stub_server.url, session, cache).covidcast(
+                    "src", "sig", "day", "state", EpiRange(20210101, 20210120), ["tx"]
+                )
+                return await call.json()
+
+        assert len(run(fetch_async())) == 20
+        assert len(stub_server.requests) == 4
@@ -0,0 +1,161 @@
+# pylint: disable=protected-access
+from asyncio import run
+from datetime import timedelta
+from json import dumps
+from pathlib import Path
+from typing import Any, Dict, List, Mapping
+
+from aiohttp import ClientSession
+
+from delphi_epidata import async_request
+from delphi_epidata._covidcast import CovidcastDataSources, CovidcastMetaIndex, DataSignal, prune_covidcast_params
+from delphi_epidata.request import NO_RETRY, CovidcastEpidata, Epidata, EpiDataCache, EpiDataContext, EpiRange
+
+from .conftest import StubRequest, StubResponse, StubServer
+
+
+def _meta() -> List[Dict[str, Any]]:
+    return [
+        {
+            "source": source,
+            "db_source": source,
+            "name": source.upper(),
+            "description": "",
+            "reference_signal": "sig0",
+            "link": [{"alt": "docs", "href": "https://example.com"}],
+            "signals": [
+                {
+                    "source": source,
+                    "signal": f"sig{i}",
+                    "signal_basename": f"sig{i}",
+                    "name": f"Signal {i}",
+                    "active": True,
+                    "short_description": "",
+                    "description": "",
+                    "time_label": "Date",
+                    "value_label": "Value",
+                    "geo_types": {"state": {"min": 0, "max": 1, "mean": 0.5, "stdev": 0.1}},
+                }
+                for i in range(3)
+            ],
+        }
+        for source in ("src1", "src2")
+    ]
+
+
+def _create_call(params: Mapping[str, Any]) -> Mapping[str, Any]:
+    return params
+
+
+def test_signals_are_created_on_lookup() -> None:
+    sources = CovidcastDataSources.create(_meta(), _create_call)
+    src1 = sources["src1"]
+    assert list(sources.signal_names) == [(s, f"sig{i}") for s in ("src1", "src2") for i in range(3)]
+    assert src1.signal_keys == [("src1", "sig0"), ("src1", "sig1"), ("src1", "sig2")]
+    assert all(not isinstance(e, DataSignal) for e in src1.signals._entries)  # type: ignore
+
+    signal = sources["src1", "sig1"]
+    assert signal is src1.get_signal("sig1") is src1.signals[1]
+    assert signal.geo_types["state"].mean == 0.5
+    assert signal("state", "ca", 20210101)["signals"] == "sig1"
+    assert sum(isinstance(e, DataSignal) for e in src1.signals._entries) == 1  # type: ignore
+
+    assert src1.get_signal("missing") is None
+    assert sources.get_signal("src2", "sig0") is not None
+    assert len(list(sources.signals)) == 6
+    assert list(sources.source_df["signals"]) == ["sig0,sig1,sig2"] * 2
+
+
+def test_sources_and_signals_use_slots() -> None:
+    sources = CovidcastDataSources.create(_meta(), _create_call)
+    src1 = sources["src1"]
+    signal = sources["src1", "sig0"]
+    assert not hasattr(src1, "__dict__") and not hasattr(signal, "__dict__")
+    assert src1.link[0].href == "https://example.com" and signal.format == "raw" and signal.time_type == "day"
+    signal_df = src1.signal_df
+    assert src1.signal_df is signal_df
+    assert list(signal_df.index) == [("src1", f"sig{i}") for i in range(3)]
+
+
+def test_signal_df_of_all_sources() -> None:
+    signal_df = CovidcastDataSources.create(_meta(), _create_call).signal_df
+    assert list(signal_df.index) == [(s, f"sig{i}") for s in ("src1", "src2") for i in range(3)]
+    assert list(signal_df["geo_types"]) == ["state"] * 6
+    assert list(signal_df["name"]) == [f"Signal {i}" for i in range(3)] * 2
+
+
+def test_default_session_is_owned_by_the_default_context(stub_server: StubServer) -> None:
+    stub_server.respond = lambda _: (200, {}, dumps(_meta()).encode())
+    first = CovidcastEpidata(stub_server.url)
+    second = CovidcastEpidata(stub_server.url)
+    assert first["src1", "sig0"].call("state", "ca", 20210101)._session is Epidata._session
+    assert second["src2", "sig1"].call("state", "ca", 20210101)._session is Epidata._session
+
+
+def test_meta_is_revalidated(tmp_path: Path, stub_server: StubServer) -> None:
+    def respond(request: StubRequest) -> StubResponse:
+        if request.headers.get("If-None-Match") == '"v1"':
+            return 304, {"ETag": '"v1"'}, b""
+        return 200, {"ETag": '"v1"', "Last-Modified": "Tue, 01 Jun 2021 00:00:00 GMT"}, dumps(_meta()).encode()
+
+    stub_server.respond = respond
+    # a stale entry is revalidated on every use
+    cache = EpiDataCache(tmp_path, meta_ttl=timedelta(seconds=-1))
+    first = CovidcastEpidata(stub_server.url, cache=cache)
+    second = CovidcastEpidata(stub_server.url, cache=cache)
+
+    async def create_async() -> CovidcastDataSources[async_request.EpiDataAsyncCall]:
+        async with ClientSession() as session:
+            return await async_request.CovidcastEpidata(stub_server.url, session, cache)
+
+    third = run(create_async())
+    assert [r.headers.get("If-None-Match") for r in stub_server.requests] == [None, '"v1"', '"v1"']
+    assert stub_server.requests[2].headers.get("If-Modified-Since") == "Tue, 01 Jun 2021 00:00:00 GMT"
+    assert list(first.signal_names) == list(second.signal_names) == list(third.signal_names)
+    # the cache is only used for the meta data
+    assert first["src1", "sig0"].call("state", "ca", 20210101)._cache is None
+    assert third["src1", "sig0"].call("state", "ca", 20210101)._cache is None
+
+
+def _meta_index() -> CovidcastMetaIndex:
+    return CovidcastMetaIndex(
+        [
+            dict(
+                data_source="src", signal="a", time_type="day", geo_type="state", min_time=20210110, max_time=20210120
+            ),
+            dict(
+                data_source="src", signal="b", time_type="day", geo_type="state", min_time=20210101, max_time=20210105
+            ),
+            dict(
+                data_source="src", signal="b", time_type="day", geo_type="county", min_time=20210101, max_time=20210131
+            ),
+        ]
+    )
+
+
+def test_prune_covidcast_params() -> None:
+    meta = _meta_index()
+    params: Dict[str, Any] = dict(
+        data_source="src", signals=["a", "b"], time_type="day", geo_type="county", geo_values="*"
+    )
+    pruned = prune_covidcast_params({**params, "time_values": EpiRange(20201201, 20210110)}, meta)
+    assert pruned is not None
+    assert pruned["signals"] == ["b"]
+    assert pruned["time_values"] == [EpiRange(20210101, 20210110)]
+    assert prune_covidcast_params({**params, "time_values": EpiRange(20210201, 20210210)}, meta) is None
+    # signals missing in the metadata are kept as they are
+    unknown = {**params, "signals": ["a", "new"], "time_values": 20210201}
+    pruned = prune_covidcast_params(unknown, meta)
+    assert pruned is not None and pruned["signals"] == ["new"] and pruned["time_values"] == 20210201
+    wildcard = {**params, "time_values": "*"}
+    assert prune_covidcast_params(wildcard, meta) == {**wildcard, "signals": ["b"]}
+
+
+def test_pruned_call_is_not_sent() -> None:
+    ctx = EpiDataContext("http://localhost:1/", retry_policy=NO_RETRY).with_pruning(covidcast_meta=_meta_index())
+    call = ctx.covidcast("src", "a", "day", "state", EpiRange(20210201, 20210210), "ca")
+    assert call.json() == []
+    assert call.csv() == ""
+    assert not list(call.iter())
+    assert call.df().empty
+    assert call.classic()["result"] == -2
@@ -1,4 +1,20 @@
-from delphi_epidata._model import EpiRange, format_item, format_list
+from datetime import date
+from typing import Mapping, Tuple, Union
+
+from delphi_epidata._model import (
+    EpiRange,
+    EpidataFieldType,
+    compile_row_parser,
+    format_item,
+    format_list,
+    format_range_list,
+    from_intervals,
+    is_past,
+    is_url_too_long,
+    merge_intervals,
+    subtract_intervals,
+    to_intervals,
+)
 
 
 def test_epirange() -> None:
@@ -28,3 +44,64 @@ def test_format_list() -> None:
     assert format_list(["a", "b"]) == "a,b"
     assert format_list(("a", "b")) == "a,b"
     assert format_list(["a", 1]) == "a,1"
+
+
+def test_is_past() -> None:
+    today = date(2021, 6, 1)
+    assert is_past(20210101, today)
+    assert is_past(EpiRange(20210101, 20210531), today)
+    assert is_past([202101, {"from": 20200101, "to": 20200301}], today)
+    assert not is_past(20210601, today)
+    assert not is_past(EpiRange(20210101, 20210601), today)
+    assert not is_past("*", today)
+    assert not is_past([], today)
+
+
+def test_interval_arithmetic() -> None:
+    requested = to_intervals(EpiRange(20210101, 20210415))
+    cached = to_intervals([EpiRange(20210101, 20210331), 20210410])
+    missing = subtract_intervals(requested, cached)
+    assert [str(r) for r in from_intervals(missing)] == ["20210401-20210409", "20210411-20210415"]
+    assert merge_intervals([(5, 6), (1, 2), (3, 3)]) == [(1, 3), (5, 6)]
+    assert to_intervals("*") is None
+
+
+def test_week_intervals() -> None:
+    weeks = to_intervals([202052, 202053, 202101, "202102-202104"], "week")
+    assert [str(r) for r in from_intervals(weeks, "week")] == ["202052-202104"]
+
+
+def test_is_url_too_long() -> None:
+    url = "https://delphi.cmu.edu/epidata/covidcast/"
+    assert not is_url_too_long(url, {"geo_values": "ca,ny"}, 2048)
+    assert is_url_too_long(url, {"geo_values": ",".join(f"{i:05d}" for i in range(1000))}, 2048)
+
+
+def test_format_range_list() -> None:
+    assert format_range_list([20210103, 20210101, 20210102, 20210102, 20210110]) == "20210101-20210103,20210110"
+    assert format_range_list(["20210101-20210105", EpiRange(20210106, 20210110), date(2021, 1, 12)]) == (
+        "20210101-20210110,20210112"
+    )
+    # across the epiweek year boundary of a year with 53 weeks
+    assert format_range_list([202051, 202052, 202053, 202101, 202103]) == "202051-202101,202103"
+    assert format_range_list("*") == "*"
+    assert format_range_list([20210101, 202101]) == "20210101,202101"
+    # invalid dates and epiweeks are sent as given instead of rolling over into valid ones
+    assert format_range_list([20210231]) == "20210231"
+    assert format_range_list([20211301, 20211302]) == "20211301,20211302"
+    assert format_range_list([202054]) == "202054"
+    assert format_range_list([202152, 202153]) == "202152,202153"
+
+
+def test_compile_row_parser() -> None:
+    schema: Tuple[Tuple[str, EpidataFieldType], ...] = (
+        ("time_value", EpidataFieldType.date),
+        ("flag", EpidataFieldType.bool),
+        ("value", EpidataFieldType.float),
+    )
+    parse_row = compile_row_parser(schema)
+    assert compile_row_parser(schema) is parse_row
+    row: Mapping[str, Union[str, float, int, None]] = {"time_value": 20210102, "flag": 1, "value": 1.5, "other": "x"}
+    assert parse_row(row) == {"time_value": date(2021, 1, 2), "flag": True, "value": 1.5, "other": "x"}
+    assert compile_row_parser(schema, True)(row)["time_value"] == 20210102
+    assert parse_row({"time_value": None}) == {"time_value": None}
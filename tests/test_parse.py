@@ -0,0 +1,57 @@
+from datetime import date
+from typing import Any, Callable, List, Union
+
+import numpy as np
+import pytest
+
+from delphi_epidata._parse import (
+    parse_api_date,
+    parse_api_dates,
+    parse_api_dates_or_weeks,
+    parse_api_week,
+    parse_api_weeks,
+)
+
+
+def test_parse_api_dates() -> None:
+    values: List[Union[str, int, None]] = [20210101, "20200229", 20211231, None]
+    r = parse_api_dates(values)
+    assert r.dtype == np.dtype("datetime64[D]")
+    assert list(r[:3].astype(date)) == [parse_api_date(v) for v in values[:3]]
+    assert np.isnat(r[3])
+
+
+def test_parse_api_weeks() -> None:
+    values = [202001, 202053, 202101, 201552, 201601, 202252]
+    assert list(parse_api_weeks(values).astype(date)) == [parse_api_week(v) for v in values]
+
+
+def test_parse_api_dates_or_weeks() -> None:
+    r = parse_api_dates_or_weeks([20210101, 202101, None])
+    assert list(r[:2].astype(date)) == [date(2021, 1, 1), date(2021, 1, 3)]
+    assert np.isnat(r[2])
+
+
+@pytest.mark.parametrize(
+    "parse, value",
+    [
+        (parse_api_dates, 20210231),
+        (parse_api_dates, 20211301),
+        (parse_api_dates, "abc"),
+        (parse_api_weeks, 202054),
+        (parse_api_weeks, 202153),
+        (parse_api_dates_or_weeks, 20210231),
+        (parse_api_dates_or_weeks, 202153),
+    ],
+)
+def test_parse_invalid_values(parse: Callable[[List[Any]], np.ndarray], value: Any) -> None:
+    # like the per value parsers, missing values are fine but invalid ones raise
+    with pytest.raises(ValueError):
+        parse([20210101 if parse is parse_api_dates else 202101, value, None])
+
+
+def test_parse_api_date_is_memoized() -> None:
+    parse_api_date.cache_clear()
+    assert parse_api_date(20210102) == parse_api_date(20210102) == date(2021, 1, 2)
+    assert parse_api_date.cache_info().hits == 1
+    assert parse_api_week(202101) == date(2021, 1, 3)
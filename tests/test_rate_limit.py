@@ -0,0 +1,75 @@
+# pylint: disable=protected-access
+from asyncio import gather, run, sleep
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import sleep as thread_sleep
+
+import pytest
+from delphi_epidata._rate_limit import RateLimiter
+
+URL = "https://delphi.cmu.edu/epidata/covidcast/"
+
+
+def test_rate() -> None:
+    now = [0.0]
+    limiter = RateLimiter(rate=50, burst=2, clock=lambda: now[0])
+    assert limiter._try_acquire("delphi.cmu.edu") == 0
+    assert limiter._try_acquire("delphi.cmu.edu") == 0
+    # the burst is used up, the next token is available after 1 / 50 seconds
+    assert limiter._try_acquire("delphi.cmu.edu") == pytest.approx(0.02)
+    now[0] += 0.01
+    assert limiter._try_acquire("delphi.cmu.edu") == pytest.approx(0.01)
+    now[0] += 0.01
+    assert limiter._try_acquire("delphi.cmu.edu") == 0
+    # other hosts have their own bucket
+    assert limiter._try_acquire("localhost") == 0
+    with limiter.limit("http://localhost/"):
+        pass
+
+
+def test_max_concurrent() -> None:
+    limiter = RateLimiter(rate=1000, max_concurrent=2)
+    in_flight = [0, 0]
+
+    async def request() -> None:
+        async with limiter.limit_async(URL):
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+            await sleep(0.01)
+            in_flight[0] -= 1
+
+    async def run_all() -> None:
+        await gather(*(request() for _ in range(6)))
+
+    run(run_all())
+    assert in_flight[1] == 2
+
+    lock = Lock()
+    in_flight = [0, 0]
+
+    def request_sync() -> None:
+        with limiter.limit(URL):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            thread_sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        list(pool.map(lambda _: request_sync(), range(6)))
+    assert in_flight[1] == 2
+
+
+def test_adaptive() -> None:
+    limiter = RateLimiter(rate=1000, adaptive=True, min_rate=100)
+    with limiter.limit(URL) as permit:
+        permit.status = 429
+    assert limiter.current_rate(URL) == 500
+    for _ in range(5):
+        with limiter.limit(URL) as permit:
+            permit.status = 429
+    assert limiter.current_rate(URL) == 100
+    with limiter.limit(URL) as permit:
+        permit.status = 200
+    assert 100 < limiter.current_rate(URL) < 1000
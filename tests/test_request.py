@@ -0,0 +1,177 @@
+# pylint: disable=protected-access
+from datetime import date
+from typing import List
+
+import pytest
+from requests import Response, Session
+from requests.adapters import HTTPAdapter
+from delphi_epidata._arrow import csv_as_arrow
+from delphi_epidata._covidcast import fields_with_signal, merge_covidcast_calls, pick_covidcast_rows
+from delphi_epidata.request import EpiDataCall, EpiDataContext, EpiRange
+
+from .conftest import StubRequest, StubResponse, StubServer
+
+
+def test_context_shares_session() -> None:
+    with EpiDataContext() as ctx:
+        call = ctx.covidcast_meta()
+        assert call._session is ctx._session
+        assert ctx.with_base_url("http://localhost/")._session is ctx._session
+
+
+def test_context_pool_size() -> None:
+    with EpiDataContext(pool_size=3) as ctx:
+        adapter = ctx._session.get_adapter("https://delphi.cmu.edu/epidata/")
+        assert isinstance(adapter, HTTPAdapter) and adapter._pool_maxsize == 3
+
+
+def test_all_keeps_order_and_failures() -> None:
+    ctx = EpiDataContext()
+    calls = [ctx.covidcast_meta().with_base_url(f"http://localhost/{i}/") for i in range(5)]
+
+    def call_api(call: EpiDataCall, session: Session) -> str:
+        assert call.with_session(session)._session is session
+        if "/3/" in call._base_url:
+            raise ValueError("failed")
+        return call._base_url
+
+    r = ctx.all(calls, call_api, batch_size=2)
+    assert r[:3] == ["http://localhost/0/", "http://localhost/1/", "http://localhost/2/"]
+    assert isinstance(r[3], ValueError)
+    assert r[4] == "http://localhost/4/"
+
+
+def test_all_uses_context_session() -> None:
+    session = Session()
+    session.headers["Authorization"] = "Bearer token"
+    closed = []
+    session.close = lambda: closed.append(True)  # type: ignore
+    ctx = EpiDataContext(session=session)
+    calls = [ctx.covidcast_meta() for _ in range(4)]
+    r = ctx.all(calls, lambda call, s: call.with_session(s)._session, batch_size=2)
+    assert all(s is session for s in r)
+    assert not closed
+
+
+def test_long_url_is_posted(stub_server: StubServer) -> None:
+    geo_values = [f"{i:05d}" for i in range(1000)]
+    with EpiDataContext(stub_server.url) as ctx:
+        assert ctx.covidcast("src", "sig", "day", "county", 20210101, geo_values).csv() == "[]"
+    assert [r.method for r in stub_server.requests] == ["POST"]
+    assert stub_server.requests[0].params["geo_values"] == ",".join(geo_values)
+    assert stub_server.requests[0].params["format"] == "csv"
+
+
+def test_414_is_retried_as_post(stub_server: StubServer, monkeypatch: pytest.MonkeyPatch) -> None:
+    def respond(request: StubRequest) -> StubResponse:
+        return (414, {}, b"URI Too Long") if request.method == "GET" else (200, {}, b"[]")
+
+    closed: List[int] = []
+    close = Response.close
+
+    def record_close(res: Response) -> None:
+        closed.append(res.status_code)
+        close(res)
+
+    monkeypatch.setattr(Response, "close", record_close)
+    stub_server.respond = respond
+    with EpiDataContext(stub_server.url) as ctx:
+        assert ctx.covidcast("src", "sig", "day", "state", 20210101, "ca").csv() == "[]"
+    assert [r.method for r in stub_server.requests] == ["GET", "POST"]
+    assert stub_server.requests[1].params == stub_server.requests[0].params
+    assert stub_server.requests[1].params["geo_values"] == "ca"
+    assert 414 in closed
+
+
+def test_is_immutable() -> None:
+    ctx = EpiDataContext()
+    assert ctx.covidcast("src", "sig", "day", "state", 20210101, "ca", as_of=20210105).is_immutable()
+    assert ctx.fluview("nat", EpiRange(202001, 202010), issues=EpiRange(202001, 202010)).is_immutable()
+    assert not ctx.covidcast("src", "sig", "day", "state", 20210101, "ca").is_immutable()
+    assert not ctx.covidcast("src", "sig", "day", "state", 20210101, "ca", issues="*").is_immutable()
+
+
+def test_split() -> None:
+    ctx = EpiDataContext()
+    call = ctx.covidcast("src", ["a", "b"], "day", "state", EpiRange(20210101, 20210331), ["ca", "ny", "tx"])
+    assert call.estimate_rows() == 2 * 3 * 90
+    assert call.split(1000) == [call]
+    chunks = call.split(100)
+    assert len(chunks) == 6
+    assert sum(c.estimate_rows() or 0 for c in chunks) == 2 * 3 * 90
+    assert all((c.estimate_rows() or 0) <= 100 for c in chunks)
+
+    wide = ctx.covidcast("src", "a", "day", "county", 20210101, [str(i) for i in range(250)])
+    assert [c.estimate_rows() for c in wide.split(100)] == [100, 100, 50]
+    assert ctx.covidcast("src", "a", "day", "county", 20210101, "*").estimate_rows() is None
+    assert ctx.covidcast("src", "a", "day", "county", 20210101, "*").estimate_rows(3000) == 3000
+
+    weekly = ctx.covidcast("src", "a", "week", "state", EpiRange(202001, 202010), "ca", issues=[202005, 202006])
+    assert weekly.estimate_rows() == 10 * 2
+    assert [c.estimate_rows() for c in weekly.split(8)] == [8, 8, 4]
+    assert ctx.covidcast("src", "a", "day", "state", 20210101, "ca", issues=20210231).estimate_rows() is None
+
+
+def test_csv_as_df() -> None:
+    call = EpiDataContext().covidcast("src", "sig", "day", "county", 20210101, "01001")
+    content = (
+        b"geo_value,signal,time_value,issue,lag,value,geo_type,time_type\n"
+        + b"01001,sig,20210101,20210103,2,1.5,county,day\n"
+        + b"01003,sig,20210102,20210103,1,,county,day\n"
+    )
+    df = call._csv_as_df(content, fields=["geo_value", "time_value", "lag", "value", "geo_type"])
+    assert list(df.columns) == ["geo_type", "geo_value", "time_value", "lag", "value"]
+    assert list(df["geo_value"]) == ["01001", "01003"]
+    assert str(df["time_value"].dtype) == "datetime64[ns]"
+    assert str(df["lag"].dtype) == "int64"
+    assert df["geo_type"].dtype == "category"
+    assert call._csv_as_df(b"").empty
+
+
+def test_csv_as_arrow() -> None:
+    pa = pytest.importorskip("pyarrow")
+    call = EpiDataContext().covidcast("src", "sig", "day", "county", 20210101, "01001")
+    content = (
+        b"geo_value,signal,time_value,issue,lag,value,geo_type,time_type\n"
+        + b"01001,sig,20210101,20210103,2,1.5,county,day\n"
+        + b"01003,sig,20210102,20210103,,,county,day\n"
+    )
+    table = csv_as_arrow(content, call.meta, fields=["geo_value", "time_value", "lag", "value", "geo_type"])
+    assert table.column_names == ["geo_type", "geo_value", "time_value", "lag", "value"]
+    assert table.schema.field("geo_type").type == pa.dictionary(pa.int32(), pa.string())
+    assert table.schema.field("time_value").type == pa.date32()
+    assert table.column("geo_value").to_pylist() == ["01001", "01003"]
+    assert table.column("time_value").to_pylist() == [date(2021, 1, 1), date(2021, 1, 2)]
+    assert table.column("lag").to_pylist() == [2, None]
+    assert csv_as_arrow(b"", call.meta).num_rows == 0
+
+
+def test_jsonl_as_df() -> None:
+    call = EpiDataContext().covidcast("src", "sig", "day", "county", 20210101, "01001")
+    lines = [
+        b'{"geo_value": "01001", "time_value": 20210101, "lag": 2, "value": 1.5}',
+        b'{"geo_value": "01003", "time_value": 20210102, "lag": 1, "value": null}',
+    ]
+    df = call._jsonl_as_df(lines, fields=["geo_value", "time_value", "lag", "value"])
+    assert list(df["geo_value"]) == ["01001", "01003"]
+    assert str(df["time_value"].dtype) == "datetime64[ns]"
+    assert str(df["lag"].dtype) == "int64"
+
+
+def test_merge_covidcast_calls() -> None:
+    ctx = EpiDataContext()
+    calls = [
+        ctx.covidcast("src", "a", "day", "state", EpiRange(20210101, 20210103), ["ca", "ny"]),
+        ctx.covidcast("src", ["b", "a"], "day", "state", EpiRange(20210101, 20210103), ["ca", "ny"]),
+        ctx.covidcast("src", "c", "day", "county", EpiRange(20210101, 20210103), ["ca", "ny"]),
+        ctx.covidcast("src", "*", "day", "state", EpiRange(20210101, 20210103), ["ca", "ny"]),
+    ]
+    merged, picks = merge_covidcast_calls(calls)
+    assert len(merged) == 3
+    assert merged[0]._formatted_paramters()["signals"] == "a,b"
+    assert picks == [(0, frozenset(["a"])), (0, frozenset(["a", "b"])), (1, frozenset(["c"])), (2, None)]
+
+    rows = [{"signal": "a", "value": 1}, {"signal": "b", "value": 2}]
+    assert pick_covidcast_rows(rows, frozenset(["b"]), ["value"]) == [{"value": 2}]
+    assert fields_with_signal(["value"]) == ["value", "signal"]
+    assert fields_with_signal(["-signal", "-value"]) == ["-value"]
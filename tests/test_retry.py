@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import pytest
+from delphi_epidata._retry import RetryPolicy, parse_retry_after
+
+
+class FakeResponse:
+    """
+    minimal response with a status code and headers
+    """
+
+    def __init__(self, status_code: int, headers: Dict[str, str]) -> None:
+        self.status_code = status_code
+        self.headers = headers
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def test_parse_retry_after() -> None:
+    now = datetime(2021, 1, 1, tzinfo=timezone.utc)
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Fri, 01 Jan 2021 00:00:10 GMT", now) == 10.0
+    assert parse_retry_after("Thu, 31 Dec 2020 00:00:00 GMT", now) == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+
+
+def test_retry_policy() -> None:
+    policy = RetryPolicy(max_attempts=3, backoff=0, max_wait=0)
+    responses: List[FakeResponse] = [FakeResponse(503, {"Retry-After": "0"}), FakeResponse(200, {})]
+    attempts: List[FakeResponse] = []
+
+    def request() -> FakeResponse:
+        attempts.append(responses[len(attempts)])
+        return attempts[-1]
+
+    assert policy.retrying((ConnectionError,))(request).status_code == 200
+    assert attempts[0].closed
+
+    # the last response is returned once all attempts are used up
+    assert policy.retrying((ConnectionError,))(lambda: FakeResponse(429, {})).status_code == 429
+
+    def fail() -> FakeResponse:
+        raise ConnectionError()
+
+    with pytest.raises(ConnectionError):
+        policy.retrying((ConnectionError,))(fail)
+    with pytest.raises(ValueError):
+        policy.retrying((ConnectionError,))(lambda: int("x"))
@@ -0,0 +1,125 @@
+# pylint: disable=protected-access
+from asyncio import CancelledError, create_task, gather, run, sleep as async_sleep
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from threading import Event
+from time import sleep
+from typing import List
+
+import pytest
+from delphi_epidata._model import AEpiDataCall, RowParser
+from delphi_epidata._single_flight import SingleFlight
+from delphi_epidata.request import EpiDataContext
+
+from .conftest import StubRequest, StubResponse, StubServer
+
+
+def test_do_shares_result() -> None:
+    single_flight = SingleFlight()
+    started = Event()
+    release = Event()
+    runs: List[int] = []
+
+    def fetch() -> List[int]:
+        runs.append(1)
+        started.set()
+        release.wait(5)
+        return [42]
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        leader = pool.submit(single_flight.do, "key", fetch)
+        started.wait(5)
+        followers = [pool.submit(single_flight.do, "key", fetch) for _ in range(3)]
+        sleep(0.05)
+        release.set()
+        results = [leader.result(), *(f.result() for f in followers)]
+    assert runs == [1]
+    assert all(r is results[0] for r in results)
+    # nothing is kept once the call finished
+    assert single_flight.do("key", lambda: [1]) == [1]
+
+
+def test_do_async_shares_result_and_error() -> None:
+    single_flight = SingleFlight()
+    runs: List[str] = []
+
+    async def fetch(key: str) -> str:
+        runs.append(key)
+        await async_sleep(0.01)
+        if key == "fail":
+            raise ValueError(key)
+        return key
+
+    async def run_all() -> List[str]:
+        return list(await gather(*(single_flight.do_async(k, partial(fetch, k)) for k in ["a", "a", "b", "a"])))
+
+    assert run(run_all()) == ["a", "a", "b", "a"]
+    assert runs == ["a", "b"]
+
+    async def fail() -> None:
+        await gather(
+            single_flight.do_async("fail", lambda: fetch("fail")), single_flight.do_async("fail", lambda: fetch("fail"))
+        )
+
+    with pytest.raises(ValueError):
+        run(fail())
+    assert runs == ["a", "b", "fail"]
+
+
+def test_do_async_survives_cancelled_leader() -> None:
+    single_flight = SingleFlight()
+    runs: List[int] = []
+
+    async def fetch() -> int:
+        runs.append(1)
+        await async_sleep(0.05)
+        return len(runs)
+
+    async def run_all() -> List[int]:
+        leader = create_task(single_flight.do_async("key", fetch))
+        await async_sleep(0.01)
+        followers = [create_task(single_flight.do_async("key", fetch)) for _ in range(3)]
+        await async_sleep(0.01)
+        leader.cancel()
+        with pytest.raises(CancelledError):
+            await leader
+        return list(await gather(*followers))
+
+    # one follower takes over and shares its result with the others
+    assert run(run_all()) == [2, 2, 2]
+    assert runs == [1, 1]
+
+
+def test_json_is_parsed_once(stub_server: StubServer, monkeypatch: pytest.MonkeyPatch) -> None:
+    started = Event()
+    release = Event()
+
+    def respond(_: StubRequest) -> StubResponse:
+        started.set()
+        release.wait(5)
+        return 200, {}, b'[{"geo_value": "ca", "time_value": 20210101, "value": 1.5}]'
+
+    parsers: List[bool] = []
+    row_parser = AEpiDataCall._row_parser
+
+    def count_parser(call: AEpiDataCall, disable_date_parsing: bool = False) -> RowParser:
+        parsers.append(disable_date_parsing)
+        return row_parser(call, disable_date_parsing)
+
+    monkeypatch.setattr(AEpiDataCall, "_row_parser", count_parser)
+    stub_server.respond = respond
+    with EpiDataContext(stub_server.url, single_flight=SingleFlight()) as ctx:
+        call = ctx.covidcast("src", "sig", "day", "state", 20210101, "ca")
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            leader = pool.submit(call.json)
+            started.wait(5)
+            followers = [pool.submit(call.json) for _ in range(3)]
+            sleep(0.05)
+            release.set()
+            results = [leader.result(), *(f.result() for f in followers)]
+    assert len(stub_server.requests) == 1
+    assert len(parsers) == 1
+    assert all(r == results[0] for r in results)
+    # every caller gets its own rows
+    results[0][0]["value"] = 2.5  # type: ignore
+    assert results[1][0]["value"] == 1.5
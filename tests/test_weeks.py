@@ -0,0 +1,45 @@
+from datetime import date, timedelta
+
+import numpy as np
+from epiweeks import Week, Year
+
+from delphi_epidata._weeks import (
+    date_range,
+    dates_to_epiweeks,
+    dates_to_yyyymmdd,
+    epiweek_range,
+    epiweeks_to_dates,
+    from_ordinals,
+    to_ordinals,
+    yyyymmdd_to_dates,
+)
+
+
+def test_epiweeks_round_trip() -> None:
+    weeks = [int(w.cdcformat()) for year in range(1995, 2030) for w in Year(year).iterweeks()]
+    dates = epiweeks_to_dates(weeks)
+    assert list(dates.astype(date)) == [Week.fromstring(str(w)).startdate() for w in weeks]
+    # any day of the week maps to its epiweek
+    assert list(dates_to_epiweeks(dates + np.timedelta64(6, "D"))) == weeks
+
+
+def test_dates_round_trip() -> None:
+    days = [date(2019, 12, 25) + timedelta(days=i) for i in range(800)]
+    values = [int(d.strftime("%Y%m%d")) for d in days]
+    dates = yyyymmdd_to_dates(values)
+    assert list(dates.astype(date)) == days
+    assert list(dates_to_yyyymmdd(dates)) == values
+    assert list(to_ordinals(dates)) == [d.toordinal() for d in days]
+    assert list(from_ordinals(to_ordinals(dates))) == list(dates)
+
+
+def test_ranges() -> None:
+    assert list(epiweek_range(202051, 202102)) == [202051, 202052, 202053, 202101, 202102]
+    assert list(date_range(20200227, 20200302)) == [20200227, 20200228, 20200229, 20200301, 20200302]
+
+
+def test_invalid_values() -> None:
+    # February 31, month 13, week 54 and week 53 of a year with 52 weeks must not roll over
+    assert np.isnat(yyyymmdd_to_dates([20210231, 20211301, 20210100])).all()
+    assert np.isnat(epiweeks_to_dates([202054, 202153, 202100])).all()
+    assert not np.isnat(epiweeks_to_dates([202053, 202152])).any()